@@ -0,0 +1,22 @@
+'''
+Utilities shared by the benchmark scripts
+'''
+
+import os
+
+def get_example_paths(names=None):
+    'get the paths to the example python files (which define run_hylaa()), optionally filtered by name'
+
+    examples_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'examples')
+    rv = []
+
+    for dirpath, _, filenames in sorted(os.walk(examples_dir)):
+        for filename in sorted(filenames):
+            name, ext = os.path.splitext(filename)
+
+            if ext != '.py' or dirpath == examples_dir or (names and name not in names):
+                continue
+
+            rv.append(os.path.realpath(os.path.join(dirpath, filename)))
+
+    return rv
@@ -0,0 +1,109 @@
+'''
+Benchmark comparing the lp backends (GLPK and HiGHS) on the lp workloads of the Hylaa examples
+
+Each example is run with plotting disabled, once with each backend. The total runtime, the time spent solving lps
+(in LpInstance.minimize()), and the number of lps solved are printed, along with the faster backend and whether the
+verification results agree.
+
+Usage: python3 lp_backends.py [example_name ...] (default: all examples, names are like 'gearbox' or 'building')
+'''
+
+import importlib.util
+import os
+import sys
+import time
+
+from benchmark_util import get_example_paths
+
+from hylaa.core import Core
+from hylaa.settings import HylaaSettings, PlotSettings
+
+BACKENDS = [('glpk', HylaaSettings.LP_GLPK), ('highs', HylaaSettings.LP_HIGHS)]
+
+class BenchmarkRun():
+    'measurements for all the Core.run() calls of one example using one lp backend'
+
+    def __init__(self):
+        self.secs = 0
+        self.lp_secs = 0 # None if the timers were disabled in any Core.run() call
+        self.num_lps = 0
+        self.verdicts = [] # list of (has_aggregated_error, has_concrete_error), one for each Core.run() call
+
+def run_example(path, lp_backend):
+    'run the example at the given path with the given lp backend, returning a BenchmarkRun'
+
+    rv = BenchmarkRun()
+    orig_run = Core.run
+
+    def benchmark_run(core, init_state_list):
+        'wrapper for Core.run() which disables plots and output, and records the result'
+
+        core.settings.plot.plot_mode = PlotSettings.PLOT_NONE
+        core.settings.plot.store_plot_result = False
+        core.settings.stdout = HylaaSettings.STDOUT_NONE
+        core.settings.lp_backend = lp_backend
+
+        start = time.perf_counter()
+        result = orig_run(core, init_state_list)
+        rv.secs += time.perf_counter() - start
+
+        # the lp time is not available if the example disables the timers (settings.timers = False)
+        if result.top_level_timer is None:
+            rv.lp_secs = rv.num_lps = None
+        elif rv.num_lps is not None:
+            # nested minimize timers are lp retries, which are included in their parent timer
+            for timer in result.top_level_timer.get_children_recursive('minimize'):
+                if timer.parent.name != 'minimize':
+                    rv.lp_secs += timer.total_secs
+                    rv.num_lps += timer.num_calls
+
+        rv.verdicts.append((result.has_aggregated_error, result.has_concrete_error))
+
+        return result
+
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(path))
+    Core.run = benchmark_run
+
+    try:
+        spec.loader.exec_module(module)
+        module.run_hylaa()
+    finally:
+        Core.run = orig_run
+        os.chdir(cwd)
+
+    return rv
+
+def main():
+    'main entry point'
+
+    paths = get_example_paths(sys.argv[1:])
+
+    print("{:<28} {:>7} {:>10} {:>10} {:>10} {:>10}  {:<6} {}".format(
+        'example', 'backend', 'total (s)', 'lp (s)', 'num lps', 'ms / lp', 'faster', 'same result'))
+
+    for path in paths:
+        runs = {name: run_example(path, backend) for name, backend in BACKENDS}
+
+        timed_runs = [(name, run) for name, run in runs.items() if run.lp_secs is not None]
+        faster = min(timed_runs, key=lambda item: item[1].lp_secs)[0] if timed_runs else 'n/a'
+        same_result = runs['glpk'].verdicts == runs['highs'].verdicts
+
+        for i, (name, _) in enumerate(BACKENDS):
+            run = runs[name]
+            example = os.path.basename(path) if i == 0 else ''
+            summary = '{:<6} {}'.format(faster, same_result) if i == 0 else ''
+
+            if run.lp_secs is None:
+                lp_str = "{:>10} {:>10} {:>10}".format('n/a', 'n/a', 'n/a')
+            else:
+                ms_per_lp = 1000 * run.lp_secs / run.num_lps if run.num_lps > 0 else 0
+                lp_str = "{:>10.2f} {:>10} {:>10.3f}".format(run.lp_secs, run.num_lps, ms_per_lp)
+
+            print("{:<28} {:>7} {:>10.2f} {}  {}".format(example, name, run.secs, lp_str, summary))
+
+if __name__ == '__main__':
+    main()
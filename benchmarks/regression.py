@@ -0,0 +1,253 @@
+'''
+Benchmark harness for the Hylaa examples, with performance regression checks against a stored baseline
+
+Each example is run with plotting disabled in its own process (so memory use and global state are isolated), and the
+wall time, peak memory (RSS), timer breakdown, number of lps solved, simplex iterations and verification result of
+all its Core.run() calls are recorded. The results are written to a json report, and optionally compared with a
+baseline report (from an earlier version of Hylaa), where a slowdown, memory increase or lp count increase beyond the
+tolerances, or any change in the verification result, is reported as a regression (exit code 1).
+
+Usage: python3 regression.py [options] [example_name ...] (default: all examples, names are like 'gearbox')
+
+The baseline is not checked in, since the times and memory use depend on the machine. To make one, run this
+script (from the current checkout) on the same machine with PYTHONPATH set to a checkout of the version to compare
+against, so the examples import that version of hylaa. For example, for the master branch:
+
+    git worktree add /tmp/hylaa_base master
+    PYTHONPATH=/tmp/hylaa_base python3 benchmarks/regression.py --repeat 3 --output /tmp/baseline.json
+    PYTHONPATH=. python3 benchmarks/regression.py --repeat 3 --baseline /tmp/baseline.json
+
+Versions of hylaa without timer counters record 0 lps solved, so the number of lps is only compared when both
+reports have it.
+
+Options:
+    --output FILE           write the json report to FILE (default: benchmark_report.json)
+    --baseline FILE         compare with the baseline report in FILE
+    --repeat N              run each example N times, using the fastest run (default: 1)
+    --timeout SECS          time limit for each run of an example (default: 3600)
+    --time-tolerance F      allowed relative slowdown, for example 0.2 for 20% (default: 0.25)
+    --min-secs SECS         slowdowns smaller than this are ignored as noise (default: 0.1)
+    --rss-tolerance F       allowed relative peak memory increase (default: 0.25)
+    --lp-tolerance F        allowed relative increase in the number of lps solved (default: 0.1)
+'''
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_util import get_example_paths
+
+TIMER_DEPTH = 3 # timers at most this deep in the timer tree are included in the report
+
+def add_timers(timer_secs, td, depth=1):
+    'add the total seconds of td and its descendants (up to TIMER_DEPTH) to timer_secs, full name -> secs'
+
+    name = td.full_name()
+    timer_secs[name] = timer_secs.get(name, 0) + td.total_secs
+
+    if depth < TIMER_DEPTH:
+        for child in td.children:
+            add_timers(timer_secs, child, depth + 1)
+
+def run_worker(path, output_filename):
+    '''run the example at the given path in this process, and write the measurements as json to output_filename
+
+    this is called in the child process started by run_example()
+    '''
+
+    # imported here, so hylaa is only loaded in the worker processes
+    from hylaa.core import Core
+    from hylaa.settings import HylaaSettings, PlotSettings
+
+    rv = {'verdicts': [], 'run_secs': 0, 'lp_solves': 0, 'simplex_iterations': 0, 'timers': {}}
+    orig_run = Core.run
+
+    def benchmark_run(core, init_state_list):
+        'wrapper for Core.run() which disables plots and output, and records the result'
+
+        core.settings.plot.plot_mode = PlotSettings.PLOT_NONE
+        core.settings.plot.store_plot_result = False
+        core.settings.stdout = HylaaSettings.STDOUT_NONE
+
+        start = time.perf_counter()
+        result = orig_run(core, init_state_list)
+        rv['run_secs'] += time.perf_counter() - start
+
+        # the counters and timers are empty if an example disables them (settings.timers = False)
+        counters = getattr(result, 'timer_counters', None) or {}
+        top_level_timer = getattr(result, 'top_level_timer', None)
+
+        rv['verdicts'].append([result.has_aggregated_error, result.has_concrete_error])
+        rv['lp_solves'] += counters.get('lp solves', 0)
+        rv['simplex_iterations'] += counters.get('simplex iterations', 0)
+
+        if top_level_timer is not None:
+            add_timers(rv['timers'], top_level_timer)
+
+        return result
+
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+
+    os.chdir(os.path.dirname(path))
+    Core.run = benchmark_run
+    Core.simulate = lambda *args, **kwargs: None # simulations are not part of the benchmark
+
+    start = time.perf_counter()
+    spec.loader.exec_module(module)
+    module.run_hylaa()
+    rv['wall_secs'] = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on linux, bytes on mac
+    scale = 1 if sys.platform == 'darwin' else 1024
+    rv['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1024 / 1024
+
+    with open(output_filename, 'w', encoding='utf-8') as f:
+        json.dump(rv, f)
+
+def run_example(path, timeout):
+    'run an example in a new process, returns the measurements dict, or a dict with an error message'
+
+    fd, output_filename = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+
+    try:
+        proc = subprocess.run([sys.executable, os.path.realpath(__file__), '--worker', path, output_filename],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout, check=False,
+                              universal_newlines=True)
+
+        if proc.returncode != 0:
+            lines = proc.stderr.strip().splitlines()
+            rv = {'error': f"exit code {proc.returncode}: {lines[-1] if lines else ''}"}
+        else:
+            with open(output_filename, encoding='utf-8') as f:
+                rv = json.load(f)
+    except subprocess.TimeoutExpired:
+        rv = {'error': f'timeout after {timeout} sec'}
+    finally:
+        os.remove(output_filename)
+
+    return rv
+
+def get_example_name(path):
+    'get the name of an example in the report (the path relative to the examples directory)'
+
+    return os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+
+def compare(cur, base, args):
+    'compare the measurements of an example with its baseline, returns a list of (is_regression, message)'
+
+    rv = []
+
+    if 'error' in cur or 'error' in base:
+        if 'error' in cur:
+            rv.append((True, f"failed: {cur['error']}"))
+
+        return rv
+
+    if cur['verdicts'] != base['verdicts']:
+        rv.append((True, f"verification result changed from {base['verdicts']} to {cur['verdicts']}"))
+
+    ratio = cur['wall_secs'] / max(base['wall_secs'], 1e-9)
+    diff = cur['wall_secs'] - base['wall_secs']
+
+    if ratio > 1 + args.time_tolerance and diff > args.min_secs:
+        rv.append((True, f"{100 * (ratio - 1):.0f}% slower ({base['wall_secs']:.2f} -> {cur['wall_secs']:.2f} sec)"))
+    elif ratio < 1 - args.time_tolerance and -diff > args.min_secs:
+        rv.append((False, f"{100 * (1 - ratio):.0f}% faster ({base['wall_secs']:.2f} -> {cur['wall_secs']:.2f} sec)"))
+
+    if cur['peak_rss_mb'] > base['peak_rss_mb'] * (1 + args.rss_tolerance):
+        rv.append((True, f"peak memory increased ({base['peak_rss_mb']:.0f} -> {cur['peak_rss_mb']:.0f} MB)"))
+
+    # a baseline from a version of hylaa without timer counters has no lp count
+    if base.get('lp_solves') and cur['lp_solves'] > base['lp_solves'] * (1 + args.lp_tolerance):
+        rv.append((True, f"more lps solved ({base['lp_solves']} -> {cur['lp_solves']})"))
+
+    return rv
+
+def make_report(results):
+    'make the json report dict from the example results, name -> measurements'
+
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'examples': results}
+
+def parse_args():
+    'parse the command-line arguments'
+
+    parser = argparse.ArgumentParser(description='Hylaa examples benchmark with regression checks')
+    parser.add_argument('names', nargs='*', help="example names, like 'gearbox' (default: all examples)")
+    parser.add_argument('--output', default='benchmark_report.json', help='json report filename')
+    parser.add_argument('--baseline', help='baseline json report to compare with')
+    parser.add_argument('--repeat', type=int, default=1, help='runs of each example, the fastest is used')
+    parser.add_argument('--timeout', type=float, default=3600, help='time limit for each run in seconds')
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help='allowed relative slowdown')
+    parser.add_argument('--min-secs', type=float, default=0.1, help='slowdowns below this are ignored')
+    parser.add_argument('--rss-tolerance', type=float, default=0.25, help='allowed relative peak memory increase')
+    parser.add_argument('--lp-tolerance', type=float, default=0.1, help='allowed relative increase in lps solved')
+    parser.add_argument('--worker', nargs=2, metavar=('PATH', 'OUTPUT'), help=argparse.SUPPRESS)
+
+    return parser.parse_args()
+
+def main():
+    'main entry point'
+
+    args = parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    baseline = None
+
+    if args.baseline is not None:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['examples']
+
+    results = {}
+    num_regressions = 0
+
+    print("{:<40} {:>9} {:>9} {:>9} {:>10}  {}".format('example', 'wall (s)', 'rss (MB)', 'num lps', 'iterations',
+                                                        'result'))
+
+    for path in get_example_paths(args.names):
+        name = get_example_name(path)
+        runs = [run_example(path, args.timeout) for _ in range(args.repeat)]
+        ok_runs = [run for run in runs if 'error' not in run]
+        cur = min(ok_runs, key=lambda run: run['wall_secs']) if ok_runs else runs[0]
+        results[name] = cur
+
+        if 'error' in cur:
+            print("{:<40} {}".format(name, cur['error']))
+        else:
+            print("{:<40} {:>9.2f} {:>9.0f} {:>9} {:>10}  {}".format(name, cur['wall_secs'], cur['peak_rss_mb'],
+                                                                   cur['lp_solves'], cur['simplex_iterations'],
+                                                                   cur['verdicts']))
+
+        if baseline is not None:
+            if name not in baseline:
+                print("    (not in baseline)")
+            else:
+                for is_regression, msg in compare(cur, baseline[name], args):
+                    print("    {}: {}".format('REGRESSION' if is_regression else 'note', msg))
+                    num_regressions += 1 if is_regression else 0
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(make_report(results), f, indent=2)
+
+    print(f"\nWrote report to {args.output}")
+
+    if baseline is not None:
+        print(f"{num_regressions} regression(s) compared with baseline {args.baseline}")
+
+        if num_regressions > 0:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+'''
+Benchmark of pickling lp instances (see LpInstance.__getstate__), for increasing lp sizes
+
+For each number of dimensions, an lp like the ones in a continuous post is created (an initial box, a basis matrix
+and a number of steps of input effects), solved once, and then pickled and unpickled. The pickled size, the time to
+pickle and unpickle, and the number of simplex iterations when re-solving the unpickled lp (zero if it was warm
+started from the pickled basis) are printed for each lp backend.
+
+Usage: python3 serialization.py [max_dims] (default: 400)
+'''
+
+import pickle
+import sys
+import time
+
+import numpy as np
+from scipy.linalg import expm
+
+from hylaa.hybrid_automaton import HybridAutomaton
+from hylaa.lpinstance_highs import HighsLpInstance
+from hylaa import lputil
+
+NUM_INPUT_STEPS = 10 # steps of input effects added to each lp
+NUM_REPEATS = 5 # the fastest of this many round trips is reported
+
+def make_lpi(dims):
+    'make a (glpk) lp instance with the given number of dimensions, an input, and a few steps of input effects'
+
+    np.random.seed(dims)
+    a_mat = np.random.random((dims, dims)) - 0.5
+    b_mat = np.random.random((dims, 1))
+
+    mode = HybridAutomaton().new_mode('mode')
+    mode.set_dynamics(a_mat)
+    mode.set_inputs(b_mat, [[1], [-1]], [1, 1])
+
+    lpi = lputil.from_box([[-1, 1]] * dims, mode)
+    lputil.set_basis_matrix(lpi, expm(a_mat * 0.1))
+
+    for _ in range(NUM_INPUT_STEPS):
+        lputil.add_input_effects_matrix(lpi, b_mat * 0.1, mode)
+
+    return lpi
+
+def round_trip(lpi):
+    'pickle and unpickle the lp several times, returns (num bytes, fastest pickle secs, fastest unpickle secs, lpi)'
+
+    dump_secs = load_secs = np.inf
+    rv = None
+
+    for _ in range(NUM_REPEATS):
+        start = time.perf_counter()
+        data = pickle.dumps(lpi, protocol=pickle.HIGHEST_PROTOCOL)
+        dump_secs = min(dump_secs, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rv = pickle.loads(data)
+        load_secs = min(load_secs, time.perf_counter() - start)
+
+    return len(data), dump_secs, load_secs, rv
+
+def main():
+    'main entry point'
+
+    max_dims = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    dims_list = [d for d in [10, 25, 50, 100, 200, 400, 800, 1600] if d <= max_dims]
+
+    print("{:>6} {:>7} {:>7} {:>7} {:>10} {:>11} {:>11} {:>12}".format(
+        'dims', 'backend', 'rows', 'cols', 'bytes', 'pickle ms', 'unpickle ms', 'resolve its'))
+
+    for dims in dims_list:
+        glpk_lpi = make_lpi(dims)
+
+        for name, lpi in [('glpk', glpk_lpi), ('highs', glpk_lpi.convert(HighsLpInstance))]:
+            direction = np.ones(dims)
+            lpi.minimize(direction)
+
+            num_bytes, dump_secs, load_secs, loaded_lpi = round_trip(lpi)
+
+            start_its = loaded_lpi.get_iterations()
+            loaded_lpi.minimize(direction)
+            resolve_its = loaded_lpi.get_iterations() - start_its
+
+            print("{:>6} {:>7} {:>7} {:>7} {:>10} {:>11.3f} {:>11.3f} {:>12}".format(
+                dims, name, lpi.get_num_rows(), lpi.get_num_cols(), num_bytes, 1000 * dump_secs, 1000 * load_secs,
+                resolve_its))
+
+if __name__ == '__main__':
+    main()
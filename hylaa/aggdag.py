@@ -3,6 +3,8 @@ Stanley Bak
 Aggregation Directed Acyclic Graph (DAG) implementation
 """
 
+import numpy as np
+
 from termcolor import cprint
 
 from graphviz import Digraph
@@ -11,7 +13,8 @@ from hylaa.settings import HylaaSettings
 from hylaa.util import Freezable
 from hylaa.stateset import StateSet
 from hylaa.timerutil import Timers
-from hylaa import lputil, aggregate
+from hylaa.waiting_list import WaitingList
+from hylaa import lputil, lptemplate, aggregate
 from hylaa.deaggregation import DeaggregationManager, OpInvIntersect, OpLeftInvariant, OpTransition
 
 class AggDag(Freezable):
@@ -24,7 +27,8 @@ class AggDag(Freezable):
         self.roots = [] # list of root AggDagNode where the computation begins
         self.cur_node = None # the aggdag_node currently under a continuous post operation
 
-        self.waiting_list = [] # a list of OpTransition (with child_node = None). StateSet is in op.poststate
+        # the OpTransition objects to explore (with child_node = None), StateSet is in op.poststate
+        self.waiting_list = WaitingList(self.get_pop_key)
 
         self.deagg_man = DeaggregationManager(self)
 
@@ -38,6 +42,11 @@ class AggDag(Freezable):
 
         return isinstance(op, OpTransition)
 
+    def get_pop_key(self, op):
+        'get the waiting list key of an op from the aggregation strategy'
+
+        return self.settings.aggstrat.get_pop_key(op)
+
     def get_cur_state(self):
         '''get the current state being propagated
 
@@ -113,6 +122,14 @@ class AggDag(Freezable):
         if not succeeded:
             op = None
         else:
+            # error modes have no dynamics, and their states are only checked for reachability
+            compact = self.settings.compact_transition_lps and t.to_mode.a_csr is not None and \
+                not (is_concrete and self.settings.make_counterexample) and \
+                t_lpi.get_num_cols() >= self.settings.compact_transition_min_cols_per_dim * t_lpi.dims
+
+            # template directions from the constraints before the reset, where the lp has the predecessor's variables
+            reset_dirs = lptemplate.get_reset_template_directions(t_lpi, t.reset_csr) if compact else None
+
             lputil.add_reset_variables(t_lpi, t.to_mode.mode_id, t.transition_index, \
                 reset_csr=t.reset_csr, minkowski_csr=t.reset_minkowski_csr, \
                 minkowski_constraints_csr=t.reset_minkowski_constraints_csr, \
@@ -122,11 +139,57 @@ class AggDag(Freezable):
                 raise RuntimeError("cur_state became infeasible after reset was applied")
 
             op_list = [op]
+            reset_box = state.get_reset_box(t) if self.settings.interval_guard_optimization else None
+
+            if compact:
+                t_lpi, is_concrete = self.compact_transition_lpi(t, t_lpi, is_concrete, reset_dirs)
+
+            depth = parent_node.depth + 1
+            Timers.record_stat(f'transition lp rows (depth {depth})', t_lpi.get_num_rows())
+            Timers.record_stat(f'transition lp cols (depth {depth})', t_lpi.get_num_cols())
+
             state = StateSet(t_lpi, t.to_mode, steps_since_start, op_list, is_concrete)
             op.poststate = state
 
+            if reset_box is not None and state.interval_screen is not None:
+                state.interval_screen.set_init_box(*reset_box)
+
         return op
 
+    def compact_transition_lpi(self, t, t_lpi, is_concrete, reset_dirs):
+        '''replace the lp after a transition by an lp over only the variables of the successor mode (see
+        HylaaSettings.compact_transition_lps)
+
+        reset_dirs are template directions from lptemplate.get_reset_template_directions(), which are used in addition
+        to the directions of settings.compact_transition_template
+
+        returns a pair (lpi, is_concrete), where lpi is t_lpi if the projection failed due to numerical issues
+        '''
+
+        dims = t.to_mode.a_csr.shape[0]
+        template = self.settings.compact_transition_template
+
+        if template == HylaaSettings.COMPRESS_BOX_MODE:
+            template_dirs = t.to_mode.get_template_directions()
+        else:
+            assert template == HylaaSettings.COMPRESS_BOX, f"Unknown compaction template: {template}"
+            template_dirs = np.identity(dims)
+
+        template_dirs = np.concatenate([template_dirs, reset_dirs])
+        res = lptemplate.project_to_template(t_lpi, template_dirs, t.to_mode, self.settings.compact_exact_max_dims)
+
+        if res is not None:
+            Timers.count('compacted transition lps')
+            new_lpi, is_exact = res
+
+            if is_exact:
+                Timers.count('exact transition lp compactions')
+
+            t_lpi = new_lpi
+            is_concrete = is_concrete and is_exact
+
+        return t_lpi, is_concrete
+
     def add_transition_successor(self, t, t_lpi, cur_state=None, cur_node=None):
         '''take the passed-in transition from the current state (add to the waiting list)
 
@@ -167,15 +230,9 @@ class AggDag(Freezable):
     def remove_node_decendants_from_waiting_list(self, node):
         'remove all waiting list states originating from the passed-in node'
 
-        to_remove_ops = self._get_node_leaf_ops(node)
-
-        new_waiting_list = []
-
-        for op in self.waiting_list:
-            if not op in to_remove_ops:
-                new_waiting_list.append(op)
-
-        self.waiting_list = new_waiting_list
+        for op in self._get_node_leaf_ops(node):
+            if op in self.waiting_list:
+                self.waiting_list.remove(op)
 
     def pop_waiting_list(self):
         'pop a state off the waiting list, possibly doing state-set aggregation'
@@ -196,11 +253,10 @@ class AggDag(Freezable):
                 op_list = [op]
                 break
 
-        # remove each element of opr_list from the waiting_list
-        waiting_list_presize = len(self.waiting_list)
-        self.waiting_list = [op for op in self.waiting_list if not op in op_list]
-        assert waiting_list_presize == len(self.waiting_list) + len(op_list), "pop_waiting_list returned " + \
-                                                                            "elements not orignally in waiting_list"
+        # remove each element of op_list from the waiting_list
+        for op in op_list:
+            assert op in self.waiting_list, "pop_waiting_list returned elements not orignally in waiting_list"
+            self.waiting_list.remove(op)
 
         agg_type = None
 
@@ -208,7 +264,9 @@ class AggDag(Freezable):
             agg_type = self.settings.aggstrat.get_agg_type(op_list)
 
         # create a new AggDagNode for the current computation
+        Timers.tic('aggregate')
         self.cur_node = self.make_node(op_list, agg_type, 'full')
+        Timers.toc('aggregate')
 
         return self.cur_node.get_cur_state()
 
@@ -286,6 +344,9 @@ class AggDagNode(Freezable):
         self.parent_ops = parent_op_list
         self.agg_type_from_parents = agg_type
 
+        # number of discrete transitions from a root node (along the longest path)
+        self.depth = 1 + max((-1 if op.parent_node is None else op.parent_node.depth) for op in parent_op_list)
+
         state_list = [op.poststate for op in parent_op_list]
 
         # make the stateset
@@ -367,10 +428,20 @@ class AggDagNode(Freezable):
 
         elif at.is_box or at.is_arnoldi_box:
             rv = aggregate.aggregate_box_arnoldi(agg_list, op_list, at.is_box, at.is_arnoldi_box, at.add_guard,
-                                                 self.aggdag.core.print_debug)
+                                                 self.aggdag.core.print_debug, self.aggdag.settings.aggregation_workers)
         else:
             raise RuntimeError(f"Unsupported aggregation type: {at}")
 
+        # the box hull of the states' interval screens contains both the convex hull and the box aggregation
+        screens = [state.interval_screen for state in agg_list]
+
+        if (at.is_chull or (at.is_box and not at.is_arnoldi_box)) and rv.interval_screen is not None and \
+                all(screen is not None and screen.init_center is not None for screen in screens):
+            lower = np.min([screen.init_center - screen.init_radius for screen in screens], axis=0)
+            upper = np.max([screen.init_center + screen.init_radius for screen in screens], axis=0)
+
+            rv.interval_screen.set_init_box(lower, upper)
+
         return rv
 
     def node_left_invariant(self):
@@ -455,7 +526,8 @@ class AggDagNode(Freezable):
 
         t = op.transition
 
-        t_lpi = t.get_guard_intersection(state.lpi)
+        screen = state.get_screen(self.aggdag.settings.interval_guard_optimization)
+        t_lpi = t.get_guard_intersection(state.lpi, screen)
 
         if t_lpi:
             if t.to_mode.is_error():
@@ -492,7 +564,8 @@ class AggDagNode(Freezable):
 
         lc = state.mode.inv_list[invariant_index]
 
-        has_intersection = lputil.check_intersection(state.lpi, lc.negate())
+        screen = state.get_screen(self.aggdag.settings.interval_guard_optimization)
+        has_intersection = lputil.check_intersection(state.lpi, lc.negate(), star=screen)
 
         if has_intersection is None:
             rv = False # not feasible
@@ -502,17 +575,18 @@ class AggDagNode(Freezable):
             old_row = state.invariant_constraint_rows[invariant_index]
             vec = lc.csr.toarray()[0]
             rhs = lc.rhs
+            ie_projection = state.get_invariant_ie_projection(invariant_index)
 
             if old_row is None:
                 # new constraint
                 row = lputil.add_init_constraint(state.lpi, vec, rhs, state.basis_matrix,
-                                                 state.input_effects_list)
+                                                 input_effects_projection=ie_projection)
                 state.invariant_constraint_rows[invariant_index] = row
                 is_stronger = False
             else:
                 # strengthen existing constraint possibly
                 row, is_stronger = lputil.try_replace_init_constraint(state.lpi, old_row, vec, rhs, \
-                    state.basis_matrix, state.input_effects_list)
+                    state.basis_matrix, input_effects_projection=ie_projection)
                 state.invariant_constraint_rows[invariant_index] = row
 
             # ad the op to the aggdag
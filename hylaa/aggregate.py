@@ -8,11 +8,13 @@ import numpy as np
 from hylaa.stateset import StateSet
 from hylaa import lputil
 
-def aggregate_box_arnoldi(agg_list, op_list, is_box, is_arnoldi, add_guard, print_func):
+def aggregate_box_arnoldi(agg_list, op_list, is_box, is_arnoldi, add_guard, print_func, num_workers=1):
     '''
     perform template-based aggregation on the passed-in list of states
 
     Currently, this can either use box template directions or arnoldi (+box) template directions
+
+    num_workers is the number of processes used to solve the aggregation lps (1 = no process pool)
     '''
 
     assert is_box or is_arnoldi
@@ -87,7 +89,7 @@ def aggregate_box_arnoldi(agg_list, op_list, is_box, is_arnoldi, add_guard, prin
     print_func("agg dir mat:\n{}".format(agg_dir_mat))
     lpi_list = [state.lpi for state in agg_list]
 
-    new_lpi = lputil.aggregate(lpi_list, agg_dir_mat, postmode)
+    new_lpi = lputil.aggregate(lpi_list, agg_dir_mat, postmode, num_workers)
 
     return StateSet(new_lpi, agg_list[0].mode, step_interval, op_list, is_concrete=False)
 
@@ -36,16 +36,25 @@ class AggregationStrategy(Freezable):
 
         pass
 
+    def get_pop_key(self, op):
+        '''get the key of an OpTransition in the waiting list (see WaitingList), computed when it's added
+
+        The op with the smallest key is returned by WaitingList.peek(), ties are broken by insertion order. The default
+        implementation uses only the insertion order (first in, first out).
+        '''
+
+        return 0
+
     def pop_waiting_list(self, waiting_list):
         '''determine which waiting list elements should be aggregated for the next continuous post computation
 
-        waiting_list is a list of OpTransition
+        waiting_list is a WaitingList of OpTransition, which can be queried by pop key, mode and path
 
         this function returns a list of OpTransition. 
         If the list is a single element, no aggregation is performed.
         '''
 
-        return [waiting_list[0]]
+        return [waiting_list.peek()]
 
     def get_deagg_node(self, aggdag):
         '''Called before popping a state off the waiting list. Get the aggdag node to deaggregate (if any).
@@ -53,11 +62,13 @@ class AggregationStrategy(Freezable):
 
         return None
 
-    def pretransition(self, t, t_lpi, op_transition):
-        'event function, called when taking a transition before the reset is applied'
+    def pretransition(self, t, t_lpi, op_transition): # pylint: disable=unused-argument
+        '''event function, called when taking a transition before the reset is applied
 
-        # premode_center = lputil.get_box_center(t_lpi)
-        pass
+        returns False if the transition successor should be skipped (for example, if lp solving fails)
+        '''
+
+        return True
 
     def get_agg_type(self, op_list):
         '''
@@ -96,45 +107,26 @@ class Aggregated(AggregationStrategy):
         Get the states to remove from the waiting list based on a score-based method
         '''
 
-        # use score method to decide which mode to pop
-        to_remove_op = waiting_list[0]
-        to_remove_state = to_remove_op.poststate
-        to_remove_score = self.pop_score(to_remove_state)
-
-        for op in waiting_list:
-            state = op.poststate
-            score = self.pop_score(state)
-
-            if score > to_remove_score or score == to_remove_score and state.mode.name < to_remove_state.mode.name:
-                to_remove_score = score
-                to_remove_state = state
-                to_remove_op = op
+        # the op with the highest score is the first in the waiting list (see get_pop_key())
+        to_remove_op = waiting_list.peek()
+        mode = to_remove_op.poststate.mode
 
         # remove all states for aggregation
-        op_list = []
-
-        for op in waiting_list:
-            state = op.poststate
-            should_add = False
-
-            if state is to_remove_state:
-                should_add = True
-            elif state.mode is to_remove_state.mode:
-                if not self.require_same_path:
-                    should_add = True
-                else: # require same path; paths are the same if the parent node and transitions match
-                    if to_remove_op is None and op is None:
-                        should_add = True
-                    elif to_remove_op and op:
-                        if to_remove_op.transition is op.transition and \
-                                                    to_remove_op.parent_node is op.parent_node:
-                            should_add = True
-
-            if should_add:
-                op_list.append(op)
+        if self.require_same_path: # paths are the same if the parent node and transitions match
+            op_list = [op for op in waiting_list.get_path_ops(to_remove_op.parent_node, to_remove_op.transition)
+                       if op.poststate.mode is mode]
+        else:
+            op_list = waiting_list.get_mode_ops(mode)
 
         return op_list
-    
+
+    def get_pop_key(self, op):
+        'get the key of an op in the waiting list, the highest pop_score() first and ties broken by mode name'
+
+        state = op.poststate
+
+        return (-self.pop_score(state), state.mode.name)
+
     def pop_score(self, state):
         '''
         returns a score used to decide which state to pop off the waiting list. The state with the highest score
@@ -155,6 +147,8 @@ class Aggregated(AggregationStrategy):
     def get_simulation_pop_mode(self, sim_waiting_list):
         '''
         returns the mode to be popped off the simulation waiting list
+
+        sim_waiting_list is a list of (mode, pts, steps), where steps is an array with the steps of each simulation
         '''
 
         # find minimum time mode
@@ -162,6 +156,8 @@ class Aggregated(AggregationStrategy):
         min_time_steps = float('inf')
 
         for mode, _, steps in sim_waiting_list:
+            steps = steps.min()
+
             if mode.name in self.sim_avoid_modes:
                 steps = float('inf')
 
@@ -179,7 +175,8 @@ class Aggregated(AggregationStrategy):
 
         rv = True
 
-        if self.agg_type == Aggregated.AGG_ARNOLDI_BOX:
+        # error mode states are never aggregated (see AggDag.pop_waiting_list), so they don't need the center
+        if self.agg_type == Aggregated.AGG_ARNOLDI_BOX and not t.to_mode.is_error():
             op_transition.premode_center = lputil.get_box_center(t_lpi)
 
             if op_transition.premode_center is None:
@@ -214,37 +211,31 @@ class Aggregated(AggregationStrategy):
         rv = None
 
         if self.deaggregate:
+            waiting_list = aggdag.waiting_list
+            trigger_ops = [] # ops whose parent node should be split (only non-concrete states are split)
 
-            # if nodes have multiple outgoing transitions they will become deaggregated
-            node_to_transition = {}
-
-            for op in aggdag.waiting_list:
-                state = op.poststate
-
-                if state.is_concrete: # only try to split non-concrete states
-                    continue
-
-                # highest deaggregation priority: non-concrete states that reach an error mode
-                if state.mode.is_error():
-                    rv = op.parent_node
-                    #break
+            # highest deaggregation priority: non-concrete states that reach an error mode
+            for mode in waiting_list.get_modes():
+                if mode.is_error():
+                    trigger_ops += [op for op in waiting_list.get_mode_ops(mode) if not op.poststate.is_concrete]
 
-                # other deaggregation condition: different outgoing transitions from the same node
-                if op.parent_node in node_to_transition:
-                    transition = node_to_transition[op.parent_node]
+            # other deaggregation condition: different outgoing transitions from the same node
+            for node in waiting_list.get_branching_nodes():
+                first_transition = None
 
-                    if op.transition is not transition:
-                        rv = op.parent_node
-                else:
-                    node_to_transition[op.parent_node] = op.transition
+                for op in waiting_list.get_node_ops(node):
+                    if op.poststate.is_concrete:
+                        continue
 
-                    assert op.parent_node.node_left_invariant()
+                    if first_transition is None:
+                        assert node.node_left_invariant()
+                        first_transition = op.transition
+                    elif op.transition is not first_transition:
+                        trigger_ops.append(op)
 
-                    # if it's a single state that looks like it reaches the time bound
-                    #if op.parent_node.op_list[-1].reached_time_bound:
-                    #    # both a transition and reached time bound... split it
-                    #    rv = op.parent_node
-                    #    print(f"rv is state with a transition that also reached the time bound")
+            # use the most recently added op
+            if trigger_ops:
+                rv = max(trigger_ops, key=waiting_list.get_insertion_index).parent_node
 
         # split earlier or latest ancestor, depending on settings
         if rv:
@@ -264,7 +255,9 @@ class Aggregated(AggregationStrategy):
                     rv = node
                     break
 
-            assert rv is not None, "didn't find aggregated ancestor?"
+            # if no ancestor was aggregated, the state is non-concrete due to input effects compression and
+            # deaggregation cannot help
+            assert rv is not None or aggdag.settings.compress_inputs_steps > 0, "didn't find aggregated ancestor?"
 
         return rv
 
@@ -0,0 +1,262 @@
+'''
+Checkpoint and resume for long reachability computations
+
+The checkpoint file is an append-only stream of frames. Each lp instance is written in its own frame, and each
+checkpoint appends a state frame with the rest of the computation state (the aggdag, the HylaaResult, the timers and
+the random number generator states), which refers to the lps by key. An lp is only written again if it was modified
+since it was last saved (see LpInstance.model_version), so unchanged lps (for example, of states in the waiting list
+or of finished aggdag nodes) are not serialized at every checkpoint.
+
+When the file grows too large compared to the data in the last checkpoint, a new compacted file is written, which
+replaces the old one once it's complete. On loading, the last complete state frame is used, so a crash while writing
+a checkpoint does not lose the previous one.
+
+Use HylaaSettings.checkpoint_path and checkpoint_interval to enable checkpoints in Core.run(), and Core.resume() to
+continue a computation from a checkpoint.
+'''
+
+import io
+import os
+import pickle
+import random
+import struct
+import time
+import weakref
+
+import numpy as np
+
+from hylaa.lpinstance import LpInstance
+from hylaa.serialize import HylaaPickler, HylaaUnpickler
+from hylaa.timerutil import Timers
+from hylaa.util import Freezable
+
+FRAME_HEADER = struct.Struct('<cQQ') # frame kind (LP_FRAME or STATE_FRAME), lp key, payload length
+LP_FRAME = b'L'
+STATE_FRAME = b'S'
+
+class CheckpointPickler(HylaaPickler):
+    'pickler for the checkpoint state, which saves lp instances by key (writing them to the checkpoint if needed)'
+
+    def __init__(self, file, writer):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.writer = writer
+
+    def persistent_id(self, obj):
+        'get the persistent id for referenced objects, or None for objects that should be pickled normally'
+
+        if isinstance(obj, LpInstance):
+            rv = ('lp', self.writer.save_lpi(obj))
+        else:
+            rv = super().persistent_id(obj)
+
+        return rv
+
+class CheckpointUnpickler(HylaaUnpickler):
+    'unpickler for the checkpoint state, which loads the referenced lp frames'
+
+    def __init__(self, file, core, lp_frames, checkpoint_file):
+        super().__init__(file, core.hybrid_automaton, core.aggdag)
+
+        self.lp_frames = lp_frames # key -> (offset, length)
+        self.checkpoint_file = checkpoint_file
+        self.lpis = {} # key -> loaded LpInstance
+
+    def persistent_load(self, pid):
+        'resolve a persistent id saved by CheckpointPickler.persistent_id()'
+
+        if pid[0] != 'lp':
+            return super().persistent_load(pid)
+
+        key = pid[1]
+        rv = self.lpis.get(key)
+
+        if rv is None:
+            offset, length = self.lp_frames[key]
+            self.checkpoint_file.seek(offset)
+            rv = self.lpis[key] = pickle.loads(self.checkpoint_file.read(length))
+
+        return rv
+
+class CheckpointWriter(Freezable):
+    'periodically writes the state of a Core computation to a checkpoint file'
+
+    # a compacted file is started if the file is this many times larger than the data in the last checkpoint
+    COMPACT_RATIO = 4
+
+    def __init__(self, core, path, interval):
+        self.core = core
+        self.path = path
+        self.interval = interval # wall-clock seconds between checkpoints
+
+        self.file = None # the open checkpoint file, or None if a new (compacted) file should be started
+        self.file_bytes = 0 # bytes written to the current file
+        self.live_bytes = 0 # bytes in the current file used by the last checkpoint
+
+        # lp instance -> (model_version, key, num bytes) for each lp written to the current file
+        self.saved_lps = weakref.WeakKeyDictionary()
+        self.next_key = 0
+        self.used_keys = None # set of lp keys referenced by the checkpoint being written
+
+        self.last_time = time.perf_counter()
+        self.num_checkpoints = 0
+
+        self.freeze_attrs()
+
+    def checkpoint_if_due(self):
+        'write a checkpoint if checkpoint_interval seconds have passed since the last one'
+
+        if time.perf_counter() - self.last_time >= self.interval:
+            self.checkpoint()
+
+    def checkpoint(self):
+        'write a checkpoint of the current computation state'
+
+        Timers.tic('checkpoint')
+
+        if self.file is not None and self.file_bytes > CheckpointWriter.COMPACT_RATIO * self.live_bytes:
+            self.close()
+
+        new_file = self.file is None
+
+        if new_file:
+            # the file is owned by this object and closed in close(), which Core calls at the end of run() / resume()
+            self.file = open(self.path + '.tmp', 'wb') # pylint: disable=consider-using-with
+            self.file_bytes = 0
+            self.saved_lps = weakref.WeakKeyDictionary()
+            self.next_key = 0
+
+        self.used_keys = set()
+        buf = io.BytesIO()
+        CheckpointPickler(buf, self).dump(get_state(self.core))
+
+        state_bytes = buf.getvalue()
+        self._write_frame(STATE_FRAME, 0, state_bytes)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+        if new_file:
+            # the new file is complete, replace the old checkpoint and continue appending to it
+            self.file.close()
+            os.replace(self.path + '.tmp', self.path)
+            self.file = open(self.path, 'ab') # pylint: disable=consider-using-with
+
+        self.live_bytes = len(state_bytes) + sum(num_bytes for _, key, num_bytes in self.saved_lps.values()
+                                                 if key in self.used_keys)
+        self.used_keys = None
+        self.num_checkpoints += 1
+        self.last_time = time.perf_counter()
+
+        Timers.toc('checkpoint')
+
+    def save_lpi(self, lpi):
+        'get the key of an lp instance in the checkpoint file, writing it if it was modified since it was last saved'
+
+        saved = self.saved_lps.get(lpi)
+
+        if saved is not None and saved[0] == lpi.model_version:
+            key = saved[1]
+        else:
+            key = self.next_key
+            self.next_key += 1
+
+            data = pickle.dumps(lpi, protocol=pickle.HIGHEST_PROTOCOL)
+            self._write_frame(LP_FRAME, key, data)
+            self.saved_lps[lpi] = (lpi.model_version, key, len(data))
+
+        self.used_keys.add(key)
+
+        return key
+
+    def _write_frame(self, kind, key, data):
+        'write a frame to the checkpoint file'
+
+        self.file.write(FRAME_HEADER.pack(kind, key, len(data)))
+        self.file.write(data)
+        self.file_bytes += FRAME_HEADER.size + len(data)
+
+    def close(self):
+        'close the checkpoint file, removing it if it is a new checkpoint file that was not completely written'
+
+        if self.file is not None:
+            self.file.close()
+
+            if self.file.name == self.path + '.tmp':
+                os.remove(self.file.name)
+
+            self.file = None
+
+def get_state(core):
+    'get the computation state of core which is saved in a checkpoint'
+
+    aggdag = core.aggdag
+    now_ns = time.perf_counter_ns()
+
+    # elapsed time of the running timers is added to their totals when loading
+    running_timers = [(timer, now_ns - timer.last_start_ns) for timer in Timers.stack]
+    timers = (Timers.top_level_timer, running_timers, Timers.stats, Timers.counters, Timers.histograms)
+
+    return {'aggdag': (aggdag.roots, aggdag.cur_node, aggdag.waiting_list, aggdag.deagg_man, aggdag.viz_count),
+            'core': (core.continuous_steps, core.took_tt_transition, core.max_steps_remaining),
+            'result': core.result,
+            'timers': timers,
+            'random_states': (np.random.get_state(), random.getstate())}
+
+def load_checkpoint(core, path):
+    '''load the computation state from a checkpoint file into core
+
+    the hybrid automaton and settings of core should be the same as in the computation that wrote the checkpoint
+    '''
+
+    with open(path, 'rb') as f:
+        lp_frames = {} # key -> (offset, length)
+        state_frame = None # (offset, length) of the last state frame
+
+        while True:
+            header = f.read(FRAME_HEADER.size)
+
+            if len(header) < FRAME_HEADER.size:
+                break
+
+            kind, key, length = FRAME_HEADER.unpack(header)
+            offset = f.tell()
+
+            if f.seek(length, os.SEEK_CUR) > os.fstat(f.fileno()).st_size:
+                break # incomplete frame at the end of the file (crash while writing)
+
+            if kind == LP_FRAME:
+                lp_frames[key] = (offset, length)
+            elif kind == STATE_FRAME:
+                state_frame = (offset, length)
+            else:
+                raise RuntimeError(f"corrupt checkpoint file '{path}': unknown frame kind {kind}")
+
+        if state_frame is None:
+            raise RuntimeError(f"checkpoint file '{path}' did not contain a complete checkpoint")
+
+        f.seek(state_frame[0])
+        state_bytes = f.read(state_frame[1])
+
+        state = CheckpointUnpickler(io.BytesIO(state_bytes), core, lp_frames, f).load()
+
+    aggdag = core.aggdag
+    aggdag.roots, aggdag.cur_node, aggdag.waiting_list, aggdag.deagg_man, aggdag.viz_count = state['aggdag']
+    core.continuous_steps, core.took_tt_transition, core.max_steps_remaining = state['core']
+    core.result = state['result']
+
+    # the timers that were running when the checkpoint was written are stopped, including their elapsed time
+    top_level_timer, running_timers, stats, counters, histograms = state['timers']
+
+    for timer, elapsed_ns in running_timers:
+        timer.total_ns += elapsed_ns
+        timer.last_start_ns = None
+
+    Timers.top_level_timer = top_level_timer
+    Timers.stack = []
+    Timers.stats = stats
+    Timers.counters = counters
+    Timers.histograms = histograms
+
+    np_state, py_state = state['random_states']
+    np.random.set_state(np_state)
+    random.setstate(py_state)
@@ -15,9 +15,18 @@ from hylaa.stateset import StateSet
 from hylaa.hybrid_automaton import HybridAutomaton, was_tt_taken
 from hylaa.timerutil import Timers
 from hylaa.util import Freezable
-from hylaa.lpinstance import LpInstance
-from hylaa import lputil
+from hylaa.lpinstance import LpInstance, GlpkLpInstance
+from hylaa.lpinstance_highs import HighsLpInstance
+from hylaa import lputil, parallel_explore
+from hylaa.checkpoint import CheckpointWriter, load_checkpoint
 from hylaa.result import PlotData
+from hylaa.simulation import SimBatch, InputSampler
+from hylaa.falsify import Falsifier
+
+# timers recorded in the trace timeline if settings.trace_filename is set
+TRACE_TIMERS = ['setup', 'do_step_pop', 'do_step_pop_parallel', 'explore_batch', 'do_step_continuous_post',
+                'check_guards', 'intersect_invariant', 'aggregate', 'begin deagg replay', 'replay_op', 'checkpoint',
+                'falsify']
 
 class Core(Freezable):
     'main computation object. initialize and call run()'
@@ -43,13 +52,20 @@ class Core(Freezable):
 
         self.continuous_steps = 0
 
+        self.checkpointer = None # CheckpointWriter, assigned in run() if settings.checkpoint_path is set
+        self.timers_were_enabled = True # Timers.enabled before run(), restored at the end (see settings.timers)
+
+        # if not None, printed messages are stored here as (msg, color) instead (used in worker processes)
+        self.message_buffer = None
+
         # simulation
         self.doing_simulation = False
-        self.sim_waiting_list = None # list of (mode, pt, num_step)
-        self.sim_states = None # list of (mode, pt, num_step)
+        self.sim_waiting_list = None # list of (mode, pts, steps), pts is a 2-d array, steps is an array of num steps
+        self.sim_states = None # SimBatch of the simulations in the current mode
         self.sim_basis_matrix = None # one-step basis matrix in current mode
+        self.sim_input_effects_matrix = None # one-step input effects matrix in current mode (None without inputs)
+        self.sim_input_sampler = None # InputSampler for the inputs in current mode (None without inputs)
         self.sim_should_try_guards = None # False for the first step unless urgent_guards is True
-        self.sim_took_transition = None  # list of booleans for each sim
 
         # make random number generation (for example, to find orthogonal directions) deterministic
         np.random.seed(hylaa_settings.random_seed)
@@ -60,23 +76,31 @@ class Core(Freezable):
 
         self.freeze_attrs()
 
+    def _print(self, msg, level):
+        'print a message if the stdout setting is at least the given level'
+
+        if self.settings.stdout >= level:
+            col = self.settings.stdout_colors[level]
+
+            if self.message_buffer is not None:
+                self.message_buffer.append((msg, col))
+            else:
+                cprint(msg, col)
+
     def print_normal(self, msg):
         'print function for STDOUT_NORMAL and above'
 
-        if self.settings.stdout >= HylaaSettings.STDOUT_NORMAL:
-            cprint(msg, self.settings.stdout_colors[HylaaSettings.STDOUT_NORMAL])
+        self._print(msg, HylaaSettings.STDOUT_NORMAL)
 
     def print_verbose(self, msg):
         'print function for STDOUT_VERBOSE and above'
 
-        if self.settings.stdout >= HylaaSettings.STDOUT_VERBOSE:
-            cprint(msg, self.settings.stdout_colors[HylaaSettings.STDOUT_VERBOSE])
+        self._print(msg, HylaaSettings.STDOUT_VERBOSE)
 
     def print_debug(self, msg):
         'print function for STDOUT_DEBUG and above'
 
-        if self.settings.stdout >= HylaaSettings.STDOUT_DEBUG:
-            cprint(msg, self.settings.stdout_colors[HylaaSettings.STDOUT_DEBUG])
+        self._print(msg, HylaaSettings.STDOUT_DEBUG)
 
     def is_finished(self):
         'is the computation finished'
@@ -132,9 +156,10 @@ class Core(Freezable):
         Timers.tic("check_guards")
 
         cur_state = self.aggdag.get_cur_state()
+        screen = cur_state.get_screen(self.settings.interval_guard_optimization)
 
         for t in cur_state.mode.transitions:
-            t_lpi = t.get_guard_intersection(cur_state.lpi)
+            t_lpi = t.get_guard_intersection(cur_state.lpi, screen)
 
             if t_lpi:
                 if t.to_mode.is_error():
@@ -166,23 +191,25 @@ class Core(Freezable):
         Timers.tic("intersect_invariant")
 
         is_feasible = True
+        screen = state.get_screen(self.settings.interval_guard_optimization)
 
         for invariant_index, lc in enumerate(state.mode.inv_list):
-            if lputil.check_intersection(state.lpi, lc.negate()):
+            if lputil.check_intersection(state.lpi, lc.negate(), star=screen):
                 old_row = state.invariant_constraint_rows[invariant_index]
                 vec = lc.csr.toarray()[0]
                 rhs = lc.rhs
+                ie_projection = state.get_invariant_ie_projection(invariant_index)
 
                 if old_row is None:
                     # new constraint
                     row = lputil.add_init_constraint(state.lpi, vec, rhs, state.basis_matrix,
-                                                     state.input_effects_list)
+                                                     input_effects_projection=ie_projection)
                     state.invariant_constraint_rows[invariant_index] = row
                     is_stronger = False
                 else:
                     # strengthen existing constraint possibly
                     row, is_stronger = lputil.try_replace_init_constraint(state.lpi, old_row, vec, rhs, \
-                        state.basis_matrix, state.input_effects_list)
+                        state.basis_matrix, input_effects_projection=ie_projection)
                     state.invariant_constraint_rows[invariant_index] = row
 
                 if add_ops_to_aggdag:
@@ -233,7 +260,24 @@ class Core(Freezable):
                     self.print_normal("State left the invariant after {} steps".format(cur_state.cur_step_in_mode))
                     self.aggdag.cur_state_left_invariant()
                 else:
-                    cur_state.step()
+                    step_in_mode = None # next step
+
+                    if self.settings.skip_event_free_steps:
+                        max_steps = self.settings.num_steps - cur_state.cur_steps_since_start[0]
+                        num_steps = cur_state.get_event_free_steps(max_steps, \
+                                                                   self.settings.interval_guard_optimization)
+
+                        if num_steps > 1:
+                            self.print_verbose("No guards or invariants can become active in the next {} steps; " \
+                                               "skipping ahead".format(num_steps))
+                            step_in_mode = cur_state.cur_step_in_mode + num_steps
+                            Timers.record_stat('skipped event-free steps', num_steps - 1)
+
+                    cur_state.step(step_in_mode)
+
+                    if self.should_compress_inputs(cur_state):
+                        cur_state.compress_input_effects(self.settings.compress_inputs_template)
+
                     self.check_guards() # check guards here, before doing an invariant intersection
 
                     # if the current mode has zero dynamics, remove it here
@@ -242,11 +286,54 @@ class Core(Freezable):
                             cur_state.mode.name))
                         self.aggdag.cur_state_left_invariant()
 
-        if self.is_finished():
-            self.print_normal("Computation finished after {} continuous-post steps.".format(self.continuous_steps))
-
         Timers.toc('do_step_continuous_post')
 
+    def do_continuous_post(self, state_func=None):
+        '''compute the rest of the continuous post of the current state, doing continuous-post steps until it leaves the
+        invariant, reaches the time bound, or the computation finishes. This is used to explore a state in a worker
+        process (see parallel_explore), rather than doing one step at a time with do_step().
+
+        state_func, if passed in, is called with the current state before each step (and after the last one)
+
+        returns the number of continuous-post steps done
+        '''
+
+        rv = 0
+        state = self.aggdag.get_cur_state()
+
+        while state is not None:
+            if state_func is not None:
+                state_func(state)
+
+            if self.is_finished():
+                break
+
+            self.do_step_continuous_post()
+            rv += 1
+
+            state = self.aggdag.get_cur_state()
+
+        return rv
+
+    def should_compress_inputs(self, state):
+        '''should the input effects of the passed-in state be compressed now (see HylaaSettings.compress_inputs_steps)?
+
+        Compression makes the state an overapproximation, which cannot produce a concrete error or a counterexample.
+        So it's skipped for concrete states that may still reach an error mode, until a concrete error is found (if
+        stop_on_concrete_error or make_counterexample is set).
+        '''
+
+        rv = 0 < self.settings.compress_inputs_steps <= state.uncompressed_input_steps
+
+        if rv and state.is_concrete and not self.result.has_concrete_error and \
+                (self.settings.stop_on_concrete_error or self.settings.make_counterexample):
+            rv = not state.mode.can_reach_error()
+
+            if not rv:
+                Timers.count('skipped input effects compressions')
+
+        return rv
+
     def do_step_pop(self):
         'do a step where we pop from the waiting list'
 
@@ -283,6 +370,43 @@ class Core(Freezable):
 
         Timers.toc('do_step_pop')
 
+    def do_step_pop_parallel(self):
+        '''pop several states off the waiting list and compute their continuous posts in worker processes (used if
+        settings.waiting_list_workers > 1)
+
+        if only a single state can be popped, it becomes the current state and is explored in this process
+        '''
+
+        Timers.tic('do_step_pop_parallel')
+
+        batch = [] # list of (AggDagNode, took_tt_transition)
+
+        while self.aggdag.waiting_list and len(batch) < self.settings.waiting_list_workers and not self.is_finished():
+            # successors of a state in the batch (from urgent guards) are explored in a later batch
+            batch_nodes = [node for node, _ in batch]
+
+            if any(self.aggdag.waiting_list.has_parent_node(node) for node in batch_nodes):
+                break
+
+            self.do_step_pop()
+
+            if self.settings.process_urgent_guards and self.aggdag.get_cur_state() is not None:
+                self.check_guards()
+
+            if self.aggdag.get_cur_state() is not None:
+                batch.append((self.aggdag.cur_node, self.took_tt_transition))
+
+                self.aggdag.cur_node = None
+                self.took_tt_transition = False
+
+        if len(batch) == 1:
+            self.aggdag.cur_node, self.took_tt_transition = batch[0]
+        elif batch:
+            self.print_verbose("Exploring {} states in parallel".format(len(batch)))
+            parallel_explore.explore_batch(self, batch)
+
+        Timers.toc('do_step_pop_parallel')
+
     def do_step(self):
         'do a single step of the computation'
 
@@ -294,11 +418,19 @@ class Core(Freezable):
     def do_step_reach(self):
         'do a single reach step of the computation'
 
+        if self.checkpointer is not None:
+            self.checkpointer.checkpoint_if_due()
+
         Timers.tic('do_step')
 
         if not self.is_finished():
             if self.aggdag.get_cur_state():
                 self.do_step_continuous_post()
+
+                if self.is_finished():
+                    self.print_normal("Computation finished after {} continuous-post steps.".format( \
+                        self.continuous_steps))
+
                 self.continuous_steps += 1
             elif self.aggdag.deagg_man.doing_replay():
                 # in the middle of a deaggregation replay
@@ -314,20 +446,29 @@ class Core(Freezable):
                     #print(".core popping, calling aggdag.save_viz()")
                     #self.aggdag.save_viz()
             
-                    # pop state off waiting list
-                    self.do_step_pop()
+                    if self.settings.waiting_list_workers > 1 and \
+                            self.settings.plot.plot_mode == PlotSettings.PLOT_NONE:
+                        # pop several states and explore them in parallel
+                        self.do_step_pop_parallel()
+
+                        if self.is_finished():
+                            self.print_normal("Computation finished after {} continuous-post steps.".format( \
+                                self.continuous_steps))
+                    else:
+                        # pop state off waiting list
+                        self.do_step_pop()
 
-                    if self.settings.process_urgent_guards and self.aggdag.get_cur_state() is not None:
-                        self.check_guards()
+                        if self.settings.process_urgent_guards and self.aggdag.get_cur_state() is not None:
+                            self.check_guards()
 
         Timers.toc('do_step')
 
     def setup_ha(self, ha):
         'setup hybrid automata for computation / simulation; a substep of setup()'
 
-        # initialize time elapse in each mode of the hybrid automaton
-        for mode in ha.modes.values():
-            mode.init_time_elapse(self.settings.step_size)
+        # initialize time elapse in each mode of the hybrid automaton (shared between modes with the same dynamics)
+        num_elapsers = ha.init_time_elapse(self.settings.step_size, self.settings.time_elapse)
+        self.print_debug(f"Initialized {num_elapsers} time elapse objects for {len(ha.modes)} modes")
 
         if self.settings.optimize_tt_transitions:
             ha.detect_tt_transitions(self.settings.step_size, self.settings.num_steps, self.print_debug)
@@ -337,6 +478,74 @@ class Core(Freezable):
 
         ha.check_transitions()
 
+    def setup_output_space(self, ha):
+        '''setup output-space basis matrix computation in each mode; a substep of setup()
+
+        the output directions are the mode's invariants, guards and resets, as well as the plot directions. For modes
+        that share a time elapse object (identical dynamics), the union of their output directions is used.
+        '''
+
+        if self.settings.approx_model != HylaaSettings.APPROX_NONE:
+            self.print_verbose("Not using output-space basis matrices since an approximation model is used")
+            return
+
+        plot = self.settings.plot
+        use_plot_dirs = plot.plot_mode != PlotSettings.PLOT_NONE or plot.store_plot_result
+
+        elapser_dirs = {} # TimeElapser -> (list of modes, list of output direction arrays)
+
+        for mode in ha.modes.values():
+            if mode.is_error():
+                continue
+
+            dims = mode.a_csr.shape[0]
+            modes, dirs = elapser_dirs.setdefault(mode.time_elapse, ([], []))
+            modes.append(mode)
+            dirs.append(mode.get_output_directions())
+
+            if use_plot_dirs:
+                for plot_dir in plot.xdim_dir + plot.ydim_dir:
+                    if isinstance(plot_dir, dict):
+                        plot_dir = plot_dir.get(mode.name)
+
+                    if isinstance(plot_dir, int):
+                        plot_dir = np.array([1.0 if d == plot_dir else 0.0 for d in range(dims)], dtype=float)
+
+                    if plot_dir is not None:
+                        dirs.append(np.array(plot_dir, dtype=float).reshape((1, dims)))
+
+        for time_elapse, (modes, dirs) in elapser_dirs.items():
+            output_dirs = np.concatenate(dirs, axis=0)
+            names = ", ".join(f"'{mode.name}'" for mode in modes)
+
+            if time_elapse.use_output_space(output_dirs):
+                self.print_verbose(f"Using {time_elapse.output_space_mat.shape[1]}-dimensional output space " + \
+                                   f"for basis matrices in mode {names} ({time_elapse.dims} dims)")
+            else:
+                self.print_verbose(f"Using full-space basis matrices in mode {names} (output directions " + \
+                                   "span too many dimensions)")
+
+    def setup_computation(self, ha):
+        'setup the lp backend, hybrid automaton and plot; a substep of setup() and resume()'
+
+        if self.settings.lp_backend == HylaaSettings.LP_HIGHS:
+            LpInstance.backend_class = HighsLpInstance
+
+            if not HighsLpInstance.use_highspy:
+                self.print_normal("Warning: highspy is not installed (or HighsLpInstance.use_highspy is False), " + \
+                                  "so the HiGHS lp backend solves each lp from scratch with " + \
+                                  "scipy.optimize.linprog, which is very slow. Install highspy or use LP_GLPK.")
+        else:
+            assert self.settings.lp_backend == HylaaSettings.LP_GLPK, "unknown lp_backend in settings"
+            LpInstance.backend_class = GlpkLpInstance
+
+        self.setup_ha(ha)
+
+        if self.settings.time_elapse.output_space:
+            self.setup_output_space(ha)
+
+        self.plotman.create_plot()
+
     def setup(self, init_state_list):
         'setup the computation (called by run())'
 
@@ -349,9 +558,11 @@ class Core(Freezable):
 
         self.result = HylaaResult()
 
-        self.setup_ha(init_state_list[0].mode.ha)
-        
-        self.plotman.create_plot()
+        self.setup_computation(init_state_list[0].mode.ha)
+
+        for state in init_state_list:
+            state.convert_lpi(LpInstance.backend_class)
+            state.init_screens() # the modes may now use output-space basis matrices
 
         # populate waiting list
         assert not self.aggdag.waiting_list, "waiting list was not empty"
@@ -394,17 +605,110 @@ class Core(Freezable):
         fixed_dim_list, if used, is a list of dimensions with fixed initial values
         '''
 
+        prev_backend_class = LpInstance.backend_class # assigned in setup_computation(), based on settings.lp_backend
+
+        try:
+            self.reset_timers()
+            Timers.tic("total")
+
+            self.setup(init_state_list)
+
+            if self.settings.falsify_sims > 0:
+                self.falsify(init_state_list)
+
+            rv = self.run_after_setup()
+        finally:
+            self.finish_run(prev_backend_class)
+
+        return rv
+
+    def falsify(self, init_state_list):
+        '''run the simulation-based falsification pre-pass (see settings.falsify_sims), a substep of run()
+
+        if a counter-example is found, the result has a concrete error and the computation will be finished
+        '''
+
+        falsifier = Falsifier(self)
+        counterexample = falsifier.run(init_state_list)
+
+        if counterexample is None:
+            self.print_verbose("Falsification found no counter-example in {} simulations".format(falsifier.num_sims))
+        else:
+            self.result.has_concrete_error = True
+
+            if self.settings.make_counterexample:
+                self.result.counterexample = counterexample
+
+            steps = sum(segment.steps for segment in counterexample)
+            self.print_normal("Unsafe Mode (concrete) Reached by falsification simulation at Step: {} / {}, after {} "
+                              "simulations".format(steps, self.settings.num_steps, falsifier.num_sims))
+
+    def resume(self, checkpoint_path):
+        '''
+        Resume a computation from a checkpoint file, written during run() if settings.checkpoint_path is set
+
+        The Core should be created with the same hybrid automaton and settings as the computation that wrote the
+        checkpoint. Plots drawn before the checkpoint are not restored (except for result.plot_data).
+
+        returns the HylaaResult, like run()
+        '''
+
+        prev_backend_class = LpInstance.backend_class # assigned in setup_computation(), based on settings.lp_backend
+
+        try:
+            self.reset_timers()
+
+            load_checkpoint(self, checkpoint_path)
+
+            Timers.tic("total")
+            Timers.tic('setup')
+            self.setup_computation(self.hybrid_automaton)
+            Timers.toc('setup')
+
+            self.print_normal("Resuming computation from checkpoint '{}' after {} continuous-post steps".format( \
+                checkpoint_path, self.continuous_steps))
+
+            rv = self.run_after_setup()
+        finally:
+            self.finish_run(prev_backend_class)
+
+        return rv
+
+    def finish_run(self, prev_backend_class):
+        '''restore the global state changed by run() and resume(), and close the checkpoint file; this is called even
+        if the computation raises an exception
+        '''
+
+        LpInstance.backend_class = prev_backend_class
+        Timers.set_enabled(self.timers_were_enabled)
+
+        if self.checkpointer is not None:
+            self.checkpointer.close()
+            self.checkpointer = None
+
+    def reset_timers(self):
+        'reset the timers, and disable them if settings.timers is False; a substep of run() and resume()'
+
         Timers.reset()
-        Timers.tic("total")
 
-        self.setup(init_state_list)
+        self.timers_were_enabled = Timers.enabled
+        Timers.set_enabled(Timers.enabled and self.settings.timers)
+
+        if self.settings.trace_filename is not None and Timers.enabled:
+            Timers.start_trace(TRACE_TIMERS)
+
+    def run_after_setup(self):
+        'run the computation after it was set up (or resumed from a checkpoint), a substep of run() and resume()'
+
+        if self.settings.checkpoint_path is not None:
+            self.checkpointer = CheckpointWriter(self, self.settings.checkpoint_path, self.settings.checkpoint_interval)
 
         if self.settings.plot.plot_mode == PlotSettings.PLOT_INTERACTIVE:
             # make sure to store plot result for on_click listener to report on
             self.print_verbose(f"Setting store_plot_result to true since PLOT_INTERACTIVE has click listener")
             self.settings.plot.store_plot_result = True
 
-        if self.settings.plot.store_plot_result:
+        if self.settings.plot.store_plot_result and self.result.plot_data is None:
             self.result.plot_data = PlotData(self.plotman.num_subplots)
 
         if self.settings.plot.plot_mode == PlotSettings.PLOT_NONE:
@@ -425,10 +729,17 @@ class Core(Freezable):
         else:
             self.print_normal("Result: System is safe. Error modes are NOT reachable.\n")
 
-        self.print_normal("Total Runtime: {:.2f} sec".format(Timers.top_level_timer.total_secs))
+        if Timers.top_level_timer is not None:
+            self.print_normal("Total Runtime: {:.2f} sec".format(Timers.top_level_timer.total_secs))
+
+        if Timers.trace is not None:
+            Timers.trace.save(self.settings.trace_filename)
 
         # assign results
         self.result.top_level_timer = Timers.top_level_timer
+        self.result.timer_stats = Timers.stats
+        self.result.timer_counters = Timers.counters
+        self.result.timer_histograms = Timers.histograms
         Timers.reset()
 
         return self.result
@@ -460,17 +771,12 @@ class Core(Freezable):
         assert dims == init_mode.a_csr.shape[0]
 
         self.doing_simulation = True
-        self.sim_waiting_list = []
 
-        for sim_index in range(num_sims[1]):
-            rand_array = np.random.rand(dims)
+        box = np.array(box, dtype=float)
+        rand_pts = np.random.rand(num_sims[1], dims)[num_sims[0]:]
+        pts = box[:, 0] + rand_pts * (box[:, 1] - box[:, 0])
 
-            if sim_index < num_sims[0]:
-                continue
-
-            pt = [box[i][0] + rand_array[i] * (box[i][1] - box[i][0]) for i in range(dims)]
-
-            self.sim_waiting_list.append([init_mode, np.array(pt, dtype=float), 0])
+        self.sim_waiting_list = [[init_mode, pts, np.zeros(pts.shape[0], dtype=int)]]
         
         self.plotman.compute_and_animate()
 
@@ -483,24 +789,32 @@ class Core(Freezable):
 
         # pop all states in the same mode
         new_waiting_list = []
-        self.sim_states = []
+        pts_list = []
+        steps_list = []
 
         for item in self.sim_waiting_list:
-            mode, _, _ = item
+            mode, pts, steps = item
             
             if mode is min_time_mode:
-                self.sim_states.append(item)
+                pts_list.append(pts)
+                steps_list.append(steps)
             else:
                 new_waiting_list.append(item)
 
         self.sim_waiting_list = new_waiting_list
+        self.sim_states = SimBatch(min_time_mode, np.concatenate(pts_list), np.concatenate(steps_list))
 
         assert min_time_mode is not None
         assert min_time_mode.time_elapse is not None, f"time elapse was None for mode {min_time_mode.name}"
-        self.sim_basis_matrix, ie_mat = min_time_mode.time_elapse.get_basis_matrix(1)
-        assert ie_mat is None, "simulation with inputs unimplemented"
+        self.sim_basis_matrix, self.sim_input_effects_matrix = min_time_mode.time_elapse.get_one_step_matrices()
+
+        if self.sim_input_effects_matrix is None:
+            self.sim_input_sampler = None
+        else:
+            self.sim_input_sampler = InputSampler(min_time_mode, self.settings.sim_input_sampling)
 
-        self.print_verbose(f"Popped {len(self.sim_states)} off waiting list ({len(self.sim_waiting_list)} remaining)")
+        num_remaining = sum(len(steps) for _, _, steps in self.sim_waiting_list)
+        self.print_verbose(f"Popped {len(self.sim_states)} off waiting list ({num_remaining} remaining)")
                 
     def do_step_sim(self):
         'do a simulation step'
@@ -511,62 +825,24 @@ class Core(Freezable):
                 self.sim_pop_waiting_list()
 
                 self.sim_should_try_guards = self.settings.process_urgent_guards
-                self.sim_took_transition = [False] * len(self.sim_states)
                 self.plotman.pause()
                 self.print_verbose("Pausing due to sim pop()")
         else:
             # simulate one step for all states in sim_states
-            finished = True
-            for i, obj in enumerate(self.sim_states):
-                if obj is None:
-                    continue
-
-                mode, pt, steps = obj
-
-                if steps == self.settings.num_steps:
-                    self.print_verbose(f'Sim #{i} reached the time bound')
-                    self.sim_states[i] = None
-                    continue
-
-                if self.sim_took_transition[i]:
-                    self.sim_states[i] = None
-                    continue
-
-                # try guards (before advancing)
-                if self.sim_should_try_guards:
-                    for transition in mode.transitions:
-                        if transition.is_guard_true_for_point(pt):
-
-                            #print(f"guard was true for point {pt}, MAT:")
-                            #print(f"{transition.guard_csr.toarray()}\nRHS:\n{transition.guard_rhs}")
-                            
-                            post_pt, post_mode = transition.apply_reset_for_point(pt)
-
-                            if not post_mode.is_error():
-                                self.sim_waiting_list.append([post_mode, post_pt, steps])
-                                
-                            self.sim_took_transition[i] = True
-                            obj[1] = post_pt
-                            self.print_verbose(f'Sim #{i} took transition {transition}')
-                            break
-
-                if self.sim_took_transition[i]:
-                    finished = False
-                    continue
-                        
-                if not mode.point_in_invariant(pt):
-                    self.print_verbose(f'Invariant became False for Sim #{i}')
-                    self.sim_states[i] = None
-                    continue
+            successors, num_advanced = self.sim_states.step(self.sim_basis_matrix, self.settings.num_steps,
+                                                            self.sim_should_try_guards, self.sim_input_effects_matrix,
+                                                            self.sim_input_sampler)
 
+            for transition, post_pts, steps, _ in successors:
+                if not transition.to_mode.is_error():
+                    self.sim_waiting_list.append([transition.to_mode, post_pts, steps])
+
+                self.print_verbose(f'{len(steps)} sims took transition {transition}')
+
+            if num_advanced > 0:
                 self.sim_should_try_guards = True
-                finished = False
-                
-                # advance time
-                pt = np.dot(self.sim_basis_matrix, pt)
 
-                obj[1] = pt
-                obj[2] = steps + 1
+            finished = not successors and num_advanced == 0
 
             if finished:
                 self.plotman.commit_cur_sims()
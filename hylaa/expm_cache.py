@@ -0,0 +1,138 @@
+'''
+Persistent on-disk cache of one-step matrix exponentials and input effects matrices
+
+Each entry is stored as .npy files in the cache directory (TimeElapseSettings.disk_cache_dir), named by a hash of the
+dynamics (A and B matrices) and the step size. Entries are loaded as read-only memory-mapped arrays, so only the
+pages that are used are read from disk. When the files in the directory exceed the size limit, the least-recently
+used entries (by file modification time, which is updated on each load) are deleted.
+'''
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from hylaa.timerutil import Timers
+
+CACHE_VERSION = 1 # part of the hash, change this if the format or computation of the cached matrices changes
+
+EXPM_SUFFIX = '.expm.npy'
+INPUTS_SUFFIX = '.inputs.npy'
+
+def get_key(a_csc, b_csc, step_size):
+    'get the cache key (a hex string) for the passed-in dynamics (csc matrices, b_csc may be None) and step size'
+
+    h = hashlib.sha256()
+    h.update(np.array([CACHE_VERSION, step_size], dtype=float).tobytes())
+
+    for mat in [a_csc, b_csc]:
+        if mat is None:
+            h.update(b'none')
+        else:
+            mat = mat.copy()
+            mat.sum_duplicates() # sorts indices, so equal matrices get the same key
+
+            h.update(np.array(mat.shape, dtype=np.int64).tobytes())
+            h.update(mat.indptr.astype(np.int64).tobytes())
+            h.update(mat.indices.astype(np.int64).tobytes())
+            h.update(mat.data.astype(float).tobytes())
+
+    return h.hexdigest()
+
+def load(cache_dir, key, has_inputs):
+    '''load a cache entry, returns (one_step_matrix_exp, one_step_input_effects_matrix) or None if not in the cache
+
+    the input effects matrix is None if has_inputs is False. The returned arrays are read-only.
+    '''
+
+    Timers.tic('expm_cache load')
+
+    rv = None
+    paths = [os.path.join(cache_dir, key + EXPM_SUFFIX)]
+
+    if has_inputs:
+        paths.append(os.path.join(cache_dir, key + INPUTS_SUFFIX))
+
+    try:
+        mats = [np.asarray(np.load(path, mmap_mode='r')) for path in paths]
+
+        for path in paths:
+            os.utime(path) # mark as recently used for eviction
+    except (OSError, ValueError):
+        pass # not cached, evicted by another process, or an incomplete file
+    else:
+        rv = (mats[0], mats[1] if has_inputs else None)
+
+    Timers.toc('expm_cache load')
+
+    return rv
+
+def store(cache_dir, key, matrix_exp, input_effects_matrix, max_mb):
+    'store a cache entry (input_effects_matrix may be None), then evict old entries if over max_mb'
+
+    Timers.tic('expm_cache store')
+
+    max_bytes = max_mb * 1024 * 1024
+    num_bytes = matrix_exp.nbytes + (0 if input_effects_matrix is None else input_effects_matrix.nbytes)
+
+    if num_bytes <= max_bytes:
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # the expm file is written last, since load() expects the inputs file to exist if it exists
+        if input_effects_matrix is not None:
+            _save_atomic(os.path.join(cache_dir, key + INPUTS_SUFFIX), input_effects_matrix)
+
+        _save_atomic(os.path.join(cache_dir, key + EXPM_SUFFIX), matrix_exp)
+
+        evict(cache_dir, max_bytes)
+
+    Timers.toc('expm_cache store')
+
+def _save_atomic(path, mat):
+    'save an array to a .npy file, using a temporary file so other processes never load a partial file'
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, mat)
+
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def evict(cache_dir, max_bytes):
+    'delete the least-recently used entries in the cache directory until the files use at most max_bytes'
+
+    entries = {} # key -> [last use time, num bytes, paths]
+
+    for name in os.listdir(cache_dir):
+        for suffix in [EXPM_SUFFIX, INPUTS_SUFFIX]:
+            if name.endswith(suffix):
+                path = os.path.join(cache_dir, name)
+
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue # deleted by another process
+
+                entry = entries.setdefault(name[:-len(suffix)], [0, 0, []])
+                entry[0] = max(entry[0], stat.st_mtime)
+                entry[1] += stat.st_size
+                entry[2].append(path)
+
+    total_bytes = sum(entry[1] for entry in entries.values())
+
+    for _, num_bytes, paths in sorted(entries.values()):
+        if total_bytes <= max_bytes:
+            break
+
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass # deleted by another process
+
+        total_bytes -= num_bytes
@@ -0,0 +1,230 @@
+'''
+Simulation-based falsification, run before the reachability computation (see HylaaSettings.falsify_sims)
+
+Points are sampled from each initial state set: the corners (support points of the lp in the +/-1 directions), their
+average (the center, for a box) and random convex combinations of the corners. They are simulated in chunks with the
+vectorized simulation of Core.simulate() (SimBatch), without plotting. Since the sampled points are in the initial set
+and simulations follow the discrete-time semantics of the reachability computation, a simulation which reaches an
+error mode is a concrete counter-example.
+
+To avoid storing the trajectories of all the simulations, the chunk where an error was reached is simulated again
+from the same random number generator state (for the inputs), this time recording the counter-example segments of the
+simulation that reached the error.
+'''
+
+import time
+
+import numpy as np
+
+from hylaa.result import CounterExampleSegment
+from hylaa.simulation import SimBatch, InputSampler
+from hylaa.timerutil import Timers
+from hylaa.util import Freezable
+
+class Falsifier(Freezable):
+    'searches for a counter-example using simulations from the initial states. Initialize and call run()'
+
+    CHUNK_SIMS = 1000 # simulations are run in chunks of at most this many points
+    MAX_CORNERS = 256 # if there are more corners (2^dims), this many random corners are used
+
+    def __init__(self, core):
+        self.core = core
+        self.settings = core.settings
+
+        self.start_time = None
+        self.num_sims = 0 # number of points simulated so far
+
+        self.freeze_attrs()
+
+    def run(self, init_state_list):
+        '''simulate up to settings.falsify_sims points from the (set up) initial states, within the time limit
+
+        returns a counter-example (a list of CounterExampleSegment objects) or None if no error mode was reached
+        '''
+
+        Timers.tic('falsify')
+
+        self.start_time = time.perf_counter()
+        random_state = np.random.get_state() # restored at the end, so the reachability computation is unaffected
+        rv = None
+
+        if any(t.reset_minkowski_csr is not None for t in self.core.hybrid_automaton.transitions):
+            self.core.print_verbose("Skipping falsification: simulating resets with minkowski terms is unimplemented")
+            init_state_list = []
+
+        states = [state for state in init_state_list if not state.mode.is_error()]
+
+        for index, state in enumerate(states):
+            num_sims = (self.settings.falsify_sims - self.num_sims) // (len(states) - index)
+            pts = self.sample_init_points(state, num_sims)
+
+            if pts is None:
+                continue # infeasible initial state
+
+            init_steps = state.cur_steps_since_start[0]
+
+            for start in range(0, pts.shape[0], Falsifier.CHUNK_SIMS):
+                if self.out_of_time():
+                    break
+
+                chunk = pts[start:start + Falsifier.CHUNK_SIMS]
+                chunk_random_state = np.random.get_state()
+                error_index = self.simulate(state.mode, chunk, init_steps)
+                self.num_sims += chunk.shape[0]
+
+                if error_index is not None:
+                    # simulate the chunk again, recording the counter-example
+                    np.random.set_state(chunk_random_state)
+                    rv = self.simulate(state.mode, chunk, init_steps, trace_index=error_index)
+                    break
+
+            if rv is not None or self.out_of_time():
+                break
+
+        np.random.set_state(random_state)
+        Timers.toc('falsify')
+
+        return rv
+
+    def out_of_time(self):
+        'has the time limit (settings.falsify_max_secs) been reached?'
+
+        return time.perf_counter() - self.start_time >= self.settings.falsify_max_secs
+
+    def sample_init_points(self, state, num):
+        '''sample num points from the initial state set: the center, the corners and random convex combinations of them
+
+        the number of lps solved is min(2^dims, MAX_CORNERS), since support points in high dimensions are expensive
+
+        returns a (num x dims) array, or None if the state's lp is infeasible
+        '''
+
+        lpi = state.lpi
+        dims = lpi.dims
+
+        if 2**dims <= Falsifier.MAX_CORNERS:
+            corner_dirs = ((np.arange(2**dims)[:, np.newaxis] >> np.arange(dims)) & 1) * 2.0 - 1
+        else:
+            corner_dirs = np.where(np.random.rand(Falsifier.MAX_CORNERS, dims) < 0.5, -1.0, 1.0)
+
+        columns = list(range(lpi.cur_vars_offset, lpi.cur_vars_offset + dims))
+        res = lpi.support_batch(corner_dirs, columns=columns, fail_on_unsat=False)
+
+        if res is None:
+            return None
+
+        corners = res[1]
+        center = corners.mean(axis=0) # a convex combination, so it's in the set
+        fixed_pts = np.vstack([center, corners])[:num]
+
+        num_random = max(0, num - fixed_pts.shape[0])
+        indices = np.random.randint(corners.shape[0], size=(num_random, 3))
+        weights = np.random.dirichlet(np.ones(3), size=num_random)
+        random_pts = np.einsum('ij,ijk->ik', weights, corners[indices])
+
+        return np.vstack([fixed_pts, random_pts])
+
+    def get_mode_data(self, mode_data, mode):
+        '''get the (basis_matrix, input_effects_matrix, input_sampler) used to simulate one step in the mode, which
+        are stored in the mode_data dict the first time
+        '''
+
+        rv = mode_data.get(mode)
+
+        if rv is None:
+            basis_matrix, input_effects_matrix = mode.time_elapse.get_one_step_matrices()
+            sampler = None if input_effects_matrix is None else \
+                InputSampler(mode, self.settings.sim_input_sampling)
+
+            rv = mode_data[mode] = (basis_matrix, input_effects_matrix, sampler)
+
+        return rv
+
+    def simulate(self, init_mode, pts, init_steps, trace_index=None):
+        '''simulate the points from init_mode until the time bound or until any of them reaches an error mode
+
+        returns the index (into pts) of a simulation that reached an error mode, or None. If trace_index is not None,
+        instead returns the counter-example segments of the simulation from pts[trace_index], which should reach an
+        error mode
+        '''
+
+        num_steps = self.settings.num_steps
+        mode_data = {} # mode -> (basis_matrix, input_effects_matrix, input_sampler)
+        segments = []
+
+        # list of (mode, pts, steps, origins), origins are the indices of the simulations in the passed-in pts
+        waiting_list = [(init_mode, pts, np.full(pts.shape[0], init_steps, dtype=int), np.arange(pts.shape[0]))]
+
+        while waiting_list:
+            # pop all the simulations in the mode with the minimum steps
+            mode = min(waiting_list, key=lambda item: item[2].min())[0]
+            items = [item for item in waiting_list if item[0] is mode]
+            waiting_list = [item for item in waiting_list if item[0] is not mode]
+
+            batch = SimBatch(mode, np.concatenate([item[1] for item in items]),
+                             np.concatenate([item[2] for item in items]))
+            origins = np.concatenate([item[3] for item in items])
+
+            basis_matrix, input_effects_matrix, sampler = self.get_mode_data(mode_data, mode)
+
+            # original row in the batch (see SimBatch.ids) of the simulation being traced, or None
+            trace_row = None
+            segment = None
+            entry_steps = None # batch.steps of the traced simulation when it entered the mode
+            trace_pt = None # point of the traced simulation before the last batch.step()
+
+            if trace_index is not None:
+                rows = np.flatnonzero(origins == trace_index)
+
+                if rows.size > 0:
+                    trace_row = rows[0]
+                    segment = CounterExampleSegment()
+                    segment.mode = mode
+                    segment.start = batch.pts[trace_row].tolist()
+                    segments.append(segment)
+
+                    entry_steps = batch.steps[trace_row]
+
+            try_guards = self.settings.process_urgent_guards
+
+            while True:
+                if trace_index is None and self.out_of_time():
+                    return None
+
+                if trace_row is not None:
+                    index = np.flatnonzero(batch.ids == trace_row)
+                    trace_pt = batch.pts[index[0]].copy() if index.size > 0 else None
+
+                successors, num_advanced = batch.step(basis_matrix, num_steps, try_guards, input_effects_matrix,
+                                                      sampler)
+
+                if num_advanced > 0:
+                    try_guards = True
+
+                    if trace_row is not None and input_effects_matrix is not None:
+                        index = np.flatnonzero(batch.ids == trace_row)
+
+                        if index.size > 0 and batch.steps[index[0]] == entry_steps + len(segment.inputs) + 1:
+                            segment.inputs.append(batch.inputs[index[0]].tolist())
+
+                for transition, post_pts, steps, ids in successors:
+                    if trace_row is not None and trace_row in ids:
+                        segment.end = trace_pt.tolist()
+                        segment.steps = int(steps[np.flatnonzero(ids == trace_row)[0]] - entry_steps)
+                        segment.outgoing_transition = transition
+
+                        if transition.to_mode.is_error():
+                            return segments
+
+                    if transition.to_mode.is_error():
+                        if trace_index is None:
+                            return origins[ids[0]]
+                    else:
+                        waiting_list.append((transition.to_mode, post_pts, steps, origins[ids]))
+
+                if not successors and num_advanced == 0:
+                    break
+
+        assert trace_index is None, "traced simulation did not reach an error mode"
+
+        return None
@@ -104,6 +104,25 @@ class Mode(Freezable):
 
         return self.a_csr is None
 
+    def can_reach_error(self):
+        'is an error mode reachable from this mode, following the transitions of the automaton?'
+
+        visited = {self.name}
+        stack = [self]
+        rv = False
+
+        while stack and not rv:
+            for t in stack.pop().transitions:
+                if t.to_mode.is_error():
+                    rv = True
+                    break
+
+                if t.to_mode.name not in visited:
+                    visited.add(t.to_mode.name)
+                    stack.append(t.to_mode)
+
+        return rv
+
     def point_in_invariant(self, point):
         'is the passed-in point inside the invariant?'
 
@@ -116,6 +135,16 @@ class Mode(Freezable):
 
         return all_true
 
+    def points_in_invariant(self, pts):
+        'get a boolean mask of the points (rows of the passed-in 2-d array) that are inside the invariant'
+
+        rv = np.ones(pts.shape[0], dtype=bool)
+
+        for lc in self.inv_list:
+            rv &= (lc.csr * pts.T).ravel() <= lc.rhs
+
+        return rv
+
     def set_invariant(self, constraints_csr, constraints_rhs):
         'sets the invariant'
 
@@ -244,11 +273,77 @@ class Mode(Freezable):
 
         self.a_csr = a_csr
 
-    def init_time_elapse(self, step_size):
-        'initialize the time elapse object for this mode (called by verification core)'
+    def init_time_elapse(self, step_size, settings=None):
+        '''initialize the time elapse object for this mode (called by verification core)
+
+        settings is an optional TimeElapseSettings object
+        '''
 
         if self.a_csr is not None:
-            self.time_elapse = TimeElapser(self, step_size)
+            self.time_elapse = TimeElapser(self, step_size, settings)
+
+    def get_dynamics_key(self):
+        '''get a hashable key of the dynamics (A and B matrices), which is equal for modes with identical dynamics
+
+        this should not be called on error modes
+        '''
+
+        rv = []
+
+        for mat in [self.a_csr, self.b_csr]:
+            if mat is None:
+                rv.append(None)
+            else:
+                # canonical form: sorted indices, without duplicate entries or explicit zeros
+                mat = mat.copy()
+                mat.sum_duplicates()
+                mat.eliminate_zeros()
+
+                rv.append((mat.shape, mat.indptr.astype(np.int64).tobytes(), mat.indices.astype(np.int64).tobytes(),
+                           mat.data.astype(float).tobytes()))
+
+        return tuple(rv)
+
+    def get_output_directions(self):
+        '''get the directions needed from the state in this mode during reachability, as rows of a 2-d np.array
+
+        these are the invariant conditions, the guards of outgoing transitions, the resets of transitions to non-error
+        modes, and unit directions for the time-triggered and constant variables (used by time-triggered transitions)
+        '''
+
+        assert self.a_csr is not None, "get_output_directions() called on error mode"
+
+        dims = self.a_csr.shape[0]
+        rows = [lc.csr.toarray() for lc in self.inv_list]
+
+        for t in self.transitions:
+            if t.guard_csr.shape[0] > 0:
+                rows.append(t.guard_csr.toarray())
+
+            if not t.to_mode.is_error():
+                rows.append(np.identity(dims) if t.reset_csr is None else t.reset_csr.toarray())
+
+        unit_vars = get_tt_vars(self) + [i for i in range(dims) if self.a_csr[i].getnnz() == 0]
+
+        for var in sorted(set(unit_vars)):
+            rows.append(np.array([[1.0 if d == var else 0.0 for d in range(dims)]], dtype=float))
+
+        return np.concatenate(rows, axis=0) if rows else np.zeros((0, dims), dtype=float)
+
+    def get_template_directions(self, box=True):
+        '''get the (unique) directions of the invariant conditions and the guards of outgoing transitions, as rows of a
+        2-d np.array. If box is True, unit directions for each variable are included as well.
+        '''
+
+        assert self.a_csr is not None, "get_template_directions() called on error mode"
+
+        dims = self.a_csr.shape[0]
+        rows = [np.identity(dims)] if box else []
+        rows += [lc.csr.toarray() for lc in self.inv_list]
+        rows += [t.guard_csr.toarray() for t in self.transitions if t.guard_csr.shape[0] > 0]
+
+        # adding 0.0 converts any -0.0 entries to 0.0, so equal rows are detected as duplicates
+        return np.unique(np.concatenate(rows, axis=0) + 0.0, axis=0) if rows else np.zeros((0, dims), dtype=float)
 
     def __str__(self):
         return '[AutomatonMode with name:{}, a_matrix:{}]'.format(self.name, \
@@ -297,6 +392,13 @@ class Transition(Freezable):
 
         return all_true
 
+    def is_guard_true_for_points(self, pts):
+        'get a boolean mask of the points (rows of the passed-in 2-d array) where the guard condition is true'
+
+        vals = self.guard_csr * pts.T
+
+        return np.all(vals <= self.guard_rhs[:, np.newaxis], axis=0)
+
     def apply_reset_for_point(self, pt):
         '''apply the reset for the passed-in point
 
@@ -314,6 +416,23 @@ class Transition(Freezable):
 
         return new_pt, new_mode
 
+    def apply_reset_for_points(self, pts):
+        '''apply the reset for the points (rows of the passed-in 2-d array)
+
+        returns new_pts, new_mode
+        '''
+
+        assert self.reset_minkowski_csr is None, "resets with minkowski terms are unimplemented"
+
+        new_mode = self.to_mode
+
+        if self.reset_csr is None:
+            new_pts = pts.copy()
+        else:
+            new_pts = (self.reset_csr * pts.T).T
+
+        return new_pts, new_mode
+
     def set_guard_true(self):
         '''sets the guard to be True (always enabled)'''
 
@@ -412,33 +531,40 @@ class Transition(Freezable):
         self.reset_minkowski_constraints_csr = reset_minkowski_constraints_csr
         self.reset_minkowski_constraints_rhs = reset_minkowski_constraints_rhs
 
-    def get_guard_intersection(self, lpi):
+    def get_guard_intersection(self, lpi, star=None):
         '''do an intersection between this guard and the passed-in lpi
         if there is an intersection, return a new lpi that equals the intersection, otherwise return None
+
+        star is an optional stateset.Star or stateset.IntervalScreen for the lpi, used to pre-screen the guard rows
+        without solving LPs
         '''
 
         # optimized version: first check if every constraint is satisfiable, before checking that they're
         # all satisfied at the same time. The first part can be done quickly by only changing the objective function.
         rv = None
         all_sat = True
+        rows = self.guard_csr
+
+        if star is not None and self.guard_csr.shape[0] > 0:
+            # the star minimum is a lower bound on the lp minimum for each row (and equal if the star is exact)
+            # (an IntervalScreen is never exact)
+            if np.any(star.minimize_vals(self.guard_csr) > self.guard_rhs):
+                rows = []
+                all_sat = False
+            elif star.is_exact():
+                rows = []
 
-        for i, row in enumerate(self.guard_csr):
+        for i, row in enumerate(rows):
             # row is csr_matrix of a single row
             
-            lpi.set_minimize_direction(row, is_csr=True)
-
-            columns = [lpi.cur_vars_offset + i for i in row.indices]
-
-            result = lpi.minimize(columns=columns, fail_on_unsat=False)
+            dot_res = lpi.minimize_value(row, is_csr=True, fail_on_unsat=False)
 
             # sometimes, changing the objective function makes lp infeasible (due to numerical precision issues)
             # this happens on gearbox with small time steps. in this case, just return no transition is possible
-            if result is None:
+            if dot_res is None:
                 all_sat = False
                 break
 
-            dot_res = np.dot(result, row.data)
-
             if dot_res > self.guard_rhs[i]:
                 all_sat = False
                 break
@@ -482,6 +608,32 @@ class HybridAutomaton(Freezable):
         self.modes[m.name] = m
         return m
 
+    def init_time_elapse(self, step_size, settings=None):
+        '''initialize the time elapse object of each (non-error) mode
+
+        modes with identical dynamics share the same TimeElapser object, and so the same matrix exponential and
+        basis matrix cache. settings is an optional TimeElapseSettings object.
+
+        returns the number of distinct TimeElapser objects
+        '''
+
+        elapsers = {} # dynamics key -> TimeElapser
+
+        for mode in self.modes.values():
+            if mode.is_error():
+                continue
+
+            key = mode.get_dynamics_key()
+            time_elapse = elapsers.get(key)
+
+            if time_elapse is None:
+                mode.init_time_elapse(step_size, settings)
+                elapsers[key] = mode.time_elapse
+            else:
+                mode.time_elapse = time_elapse
+
+        return len(elapsers)
+
     def new_transition(self, from_mode, to_mode, name=None):
         '''add a transition'''
 
@@ -117,9 +117,12 @@ def _find_init_simplex(dims, supp_point_func):
 
     return init_simplex
 
-def get_verts(dims, supp_point_func, epsilon=1e-7):
+def get_verts(dims, supp_point_func, epsilon=1e-7, supp_points_func=None):
     '''
     get the n-dimensional vertices of the convex set defined through supp_point_func (which may be degenerate)
+
+    supp_points_func is an optional batched version of supp_point_func, which takes a 2-d np.array of directions (one
+    per row) and returns a 2-d np.array of supporting points (one per row)
     '''
 
     init_simplex = _find_init_simplex(dims, supp_point_func)
@@ -127,18 +130,26 @@ def get_verts(dims, supp_point_func, epsilon=1e-7):
     if len(init_simplex) < 3:
         return init_simplex # for 0-d and 1-d sets, the init_simplex corners are the only possible extreme points
     
-    rv, _ = _v_h_rep_given_init_simplex(init_simplex, supp_point_func, epsilon=epsilon)
+    rv, _ = _v_h_rep_given_init_simplex(init_simplex, supp_point_func, epsilon=epsilon,
+                                        supp_points_func=supp_points_func)
 
     return rv
 
-def _v_h_rep_given_init_simplex(init_simplex, supp_point_func, epsilon=1e-7):
+def _v_h_rep_given_init_simplex(init_simplex, supp_point_func, epsilon=1e-7, supp_points_func=None):
     '''get all the vertices and hyperplanes of (an epsilon approximation of) the set, defined through supp_point_func
 
-    This function is provided with an initial simplex which spans the space
+    This function is provided with an initial simplex which spans the space. The supporting points of the new facets
+    in each iteration are computed together using supp_points_func, if it is provided.
 
     this returns verts, equations, where equations is from the Convex Hull's (hull.equations)
     '''
 
+    if supp_points_func is None:
+        def supp_points_func(normals):
+            'get the supporting points of each row of normals using supp_point_func'
+
+            return [supp_point_func(normal) for normal in normals]
+
     new_pts = init_simplex
         
     verts = []
@@ -158,25 +169,16 @@ def _v_h_rep_given_init_simplex(init_simplex, supp_point_func, epsilon=1e-7):
         hull = ConvexHull(verts)
         Timers.toc('ConvexHull')
 
-        for i, simplex in enumerate(hull.simplices):
-            is_new = False
-
-            for index in simplex:
-                if index >= first_new_index:
-                    is_new = True
-                    break
-
-            if not is_new:
-                continue # skip this simplex
+        # the facets with a new vertex
+        is_new = np.any(hull.simplices >= first_new_index, axis=1)
+        normals = hull.equations[is_new, :-1]
+        rhs_list = -1 * hull.equations[is_new, -1]
 
-            # get hyperplane for simplex
-            normal = hull.equations[i, :-1]
-            rhs = -1 * hull.equations[i, -1]
+        Timers.tic('supp_point_func')
+        supporting_pts = supp_points_func(normals) if len(normals) > 0 else []
+        Timers.toc('supp_point_func')
 
-            Timers.tic('supp_point_func')
-            supporting_pt = supp_point_func(normal)
-            Timers.toc('supp_point_func')
-            
+        for normal, rhs, supporting_pt in zip(normals, rhs_list, supporting_pts):
             error = np.dot(supporting_pt, normal) - rhs
             max_error = max(max_error, error)
 
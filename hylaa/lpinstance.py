@@ -4,15 +4,18 @@ May 2018
 GLPK python <-> C++ interface
 '''
 
-from termcolor import colored
+import ctypes
 
 import numpy as np
-from scipy.sparse import csr_matrix, csc_matrix
+from scipy.sparse import csr_matrix
 import swiglpk as glpk
 
-from hylaa.util import Freezable
+# the backend-neutral LpInstance is defined in lpinstance_base, and is imported from here so the default backend is set
+from hylaa.lpinstance_base import LpInstance, UnsatError # pylint: disable=unused-import
 from hylaa.timerutil import Timers
 
+GLP_SIMPLEX_TIMER = Timers.register('glp_simplex')
+
 class StaticSettings(): # pylint: disable=too-few-public-methods
     'Static settings'
 
@@ -20,33 +23,24 @@ class StaticSettings(): # pylint: disable=too-few-public-methods
     # how much memory should we allow to be used before we print a message and quit
     MAX_MEMORY_SWIGLPK_LEAK_GB = 8.0
 
-def simple_print(s):
-    'print using the print function'
-
-    print(s)
-
-class LpInstance(Freezable): # pylint: disable=too-many-public-methods
+class GlpkLpInstance(LpInstance): # pylint: disable=too-many-public-methods
     'Linear programming wrapper using glpk (through swiglpk python interface)'
 
-    print_normal = simple_print # function for printing normal information (reassigned in core)
-    print_verbose = simple_print # function for printing verbose information (reassigned in core)
-    print_debug = simple_print # function for printing debug information (reassigned in core)
+    simplex_params = {} # print_on -> glp_smcp, shared by all instances so they aren't re-created on every solve
+
+    # all column primals are copied at once if at least 1 / BULK_PRIMALS_RATIO of the columns are requested
+    BULK_PRIMALS_RATIO = 8
 
     def __init__(self):
         'initialize the lp instance'
 
-        self.lp = glpk.glp_create_prob() # pylint: disable=invalid-name
+        super().__init__()
 
-        # these are assigned on set_reach_vars()
-        self.dims = None
-        self.basis_mat_pos = None # 2-tuple, row, column (NOT X/Y)
-        self.cur_vars_offset = None
-        self.input_effects_offsets = None # None or 2-tuple, row of input constraints / col of accumulated input effects
+        self.lp = glpk.glp_create_prob() # pylint: disable=invalid-name
 
-        # internal bookkeeping
-        self.obj_cols = [] # columns in the LP with an assigned objective coefficient
-        self.names = [] # column names
         self.bm_indices = None # a list of intArray for each row, assigned on set_reach_vars
+        self.bm_data = None # a list of persistent doubleArray for each row, assigned on set_reach_vars
+        self.bm_data_views = None # numpy views of the memory in each bm_data doubleArray
 
         self.freeze_attrs()
 
@@ -58,237 +52,80 @@ class LpInstance(Freezable): # pylint: disable=too-many-public-methods
     def clone(self):
         'create a copy of this lp instance'
 
-        rv = LpInstance()
+        rv = GlpkLpInstance()
 
         glpk.glp_copy_prob(rv.lp, self.lp, glpk.GLP_ON)
         rv.names = self.names.copy()
 
         rv.set_reach_vars(self.dims, self.basis_mat_pos, self.cur_vars_offset, self.input_effects_offsets)
         rv.obj_cols = self.obj_cols.copy()
+        rv.last_basis_matrix = self.last_basis_matrix
 
         return rv
 
-    def set_reach_vars(self, dims, basis_mat_pos, cur_vars_offset, input_effects_offsets):
-        'set reachability variables'
-
-        num_rows = self.get_num_rows()
-        num_cols = self.get_num_cols()
-
-        assert basis_mat_pos[0] + dims <= num_rows
-        assert basis_mat_pos[1] + 2 * dims <= num_cols  # need >= 2*dims for cur_time vars somewhere to the right of BM
-
-        if input_effects_offsets is not None:
-            assert input_effects_offsets[0] + dims <= num_rows
-            assert input_effects_offsets[1] + dims <= num_cols
-
-        self.dims = dims
-        self.basis_mat_pos = basis_mat_pos
-        self.cur_vars_offset = cur_vars_offset #num_cols - dims # right-most variables
-        self.input_effects_offsets = input_effects_offsets
-
-        self._create_bm_indices()
-
     def _create_bm_indices(self):
-        '''create a cached version the basis matrix indices
+        '''create a cached version the basis matrix indices, as well as persistent data buffers for each row
 
-        This is done for efficiency instead of creating them each time the basis matrix is changed.
+        This is done for efficiency instead of creating them each time the basis matrix is changed. The data
+        buffers are swig doubleArrays owned by this object (so they don't leak), which are filled using numpy views
+        of their memory in set_basis_matrix_bulk().
         '''
 
         # basis matrix rows are as follows:
         # 0 BM 0 -I 0 (I? <- if inputs exist)
 
         self.bm_indices = []
+        self.bm_data = []
+        self.bm_data_views = []
+        self.last_basis_matrix = None
 
-        for row in range(self.dims):
-            cur_row = []
-            
-            for col in range(self.dims):
-                cur_row.append(1 + col + self.basis_mat_pos[1])
-
-            cur_row.append(1 + self.cur_vars_offset + row)
-
-            if self.input_effects_offsets is not None:
-                cur_row.append(1 + row + self.input_effects_offsets[1])
-
-            self.bm_indices.append(SwigArray.as_int_array(cur_row))
-
-    def _column_names_str(self, cur_var_print):
-        'get the line in __str__ for the column names'
-
-        rv = "       "
-
-        for col, name in enumerate(self.names):
-            name = self.names[col]
-            name = "-" if name is None else name
-            
-            if len(name) < 6:
-                name = (" " * (6 - len(name))) + name
-            else:
-                name = name[0:6]
-
-            if self.cur_vars_offset <= col < self.cur_vars_offset + self.dims: 
-                rv += cur_var_print(name) + " "
-            else:
-                rv += name + " "
-
-        rv += "\n"
-        
-        return rv
+        dims = self.dims
+        count = dims + (1 if self.input_effects_offsets is None else 2)
 
-    def _opt_dir_str(self, zero_print):
-        'get the optimization direction line for __str__'
-
-        lp = self.lp
-        cols = self.get_num_cols()
-        rv = "min    "
-
-        for col in range(1, cols + 1):
-            val = glpk.glp_get_obj_coef(lp, col)
-            num = str(val)
-            
-            if len(num) < 6:
-                num = (" " * (6 - len(num))) + num
-            else:
-                num = num[0:6]
-
-            if val == 0:
-                rv += zero_print(num) + " "
-            else:
-                rv += num + " "
+        for row in range(dims):
+            # index 0 of each array is unused by glpk
+            indices = glpk.intArray(count + 1)
+            data = glpk.doubleArray(count + 1)
 
-        rv += "\n"
-        
-        return rv
-
-    def _col_stat_str(self):
-        'get the column statuses line for __str__'
-
-        lp = self.lp
-        cols = self.get_num_cols()
-
-        stat_labels = ["?(0)?", "BS", "NL", "NU", "NF", "NS", "?(6)?"]
-        rv = "   "
-
-        for col in range(1, cols + 1):
-            rv += "{:>6} ".format(stat_labels[glpk.glp_get_col_stat(lp, col)])
-
-        rv += "\n"
-
-        return rv
+            indices_view = np.ctypeslib.as_array((ctypes.c_int * (count + 1)).from_address(int(indices.cast())))
+            data_view = np.ctypeslib.as_array((ctypes.c_double * (count + 1)).from_address(int(data.cast())))
 
-    def _constraints_str(self, bm_print, input_print, zero_print):
-        'get the constraints matrix lines for __str__'
+            indices_view[1:dims + 1] = np.arange(1 + self.basis_mat_pos[1], 1 + self.basis_mat_pos[1] + dims)
+            indices_view[dims + 1] = 1 + self.cur_vars_offset + row
+            data_view[:] = 0
+            data_view[dims + 1] = -1.0
 
-        rv = ""
-        lp = self.lp
-        rows = self.get_num_rows()
-        cols = self.get_num_cols()
-        
-        stat_labels = ["?(0)?", "BS", "NL", "NU", "NF", "NS", "?(6)?"]
-        inds = glpk.intArray(cols + 1)
-        vals = glpk.doubleArray(cols + 1)
-
-        for row in range(1, rows + 1):
-            rv += "{:2}: {} ".format(row-1, stat_labels[glpk.glp_get_row_stat(lp, row)])
-
-            num_inds = glpk.glp_get_mat_row(lp, row, inds, vals)
-
-            for col in range(1, cols + 1):
-                val = 0
-
-                for index in range(1, num_inds+1):
-                    if inds[index] == col:
-                        val = vals[index]
-                        break
-
-                num = str(val)
-                if len(num) < 6:
-                    num = (" " * (6 - len(num))) + num
-                else:
-                    num = num[0:6]
-
-                if self.basis_mat_pos[0] <= row - 1 < self.basis_mat_pos[0] + self.dims and \
-                        self.basis_mat_pos[1] <= col - 1 < self.basis_mat_pos[1] + self.dims:
-                    rv += bm_print(num) + " "
-                elif self.input_effects_offsets is not None and \
-                        self.input_effects_offsets[0] <= row - 1 < self.input_effects_offsets[0] + self.dims and \
-                        self.input_effects_offsets[1] <= col - 1 < self.input_effects_offsets[1] + self.dims:
-                    rv += input_print(num) + " "
-                else:
-                    rv += (zero_print(num) if val == 0 else num) + " "
-
-            row_type = glpk.glp_get_row_type(lp, row)
-
-            if row_type == glpk.GLP_FX:
-                val = glpk.glp_get_row_ub(lp, row)
-                rv += " == "
-            elif row_type == glpk.GLP_UP:
-                val = glpk.glp_get_row_ub(lp, row)
-                rv += " <= "
-            elif row_type == glpk.GLP_LO:
-                val = glpk.glp_get_row_lb(lp, row)
-                rv += " >= "
-            else:
-                rv += " <?> (unknown bounds)"
-                val = '?'
-
-            num = str(val)
-            if len(num) < 6:
-                num = (" " * (6 - len(num))) + num
-            else:
-                num = num[0:6]
-
-            rv += (zero_print(num) if val == 0 else num) + " "
-
-            rv += "\n"
-
-        return rv
-
-    def __str__(self, plain_text=False):
-        'get the LP as string (useful for debugging)'
-
-        if plain_text:
-            cur_var_print = bm_print = input_print = zero_print = lambda x: x
-        else:
-            def cur_var_print(s):
-                'print function for current variables'
-
-                return colored(s, on_color="on_cyan")
-
-            def bm_print(s):
-                'print function for basis matrix'
-
-                return colored(s, on_color="on_red")
-
-            def input_print(s):
-                'print function for input offset'
+            if self.input_effects_offsets is not None:
+                indices_view[dims + 2] = 1 + row + self.input_effects_offsets[1]
+                data_view[dims + 2] = 1.0
 
-                return colored(s, on_color="on_green")
+            self.bm_indices.append(indices)
+            self.bm_data.append(data)
+            self.bm_data_views.append(data_view)
 
-            def zero_print(s):
-                'print function for zeros'
+    def set_basis_matrix_bulk(self, basis_mat):
+        '''set the basis matrix block of the lp from the passed-in 2-d np.array
 
-                return colored(s, 'white', attrs=['dark'])
+        This fills the persistent per-row buffers from the numpy array (no allocation), and only updates the
+        lp rows whose coefficients changed since the last assignment.
+        '''
 
-        rows = self.get_num_rows()
-        cols = self.get_num_cols()
-        rv = "Lp has {} columns (variables) and {} rows (constraints)\n".format(cols, rows)
+        Timers.tic('set_basis_matrix_bulk')
 
-        rv += self._column_names_str(cur_var_print)
+        dims = self.dims
+        changed_rows = self._changed_basis_matrix_rows(basis_mat)
 
-        rv += self._opt_dir_str(zero_print)
+        count = len(self.bm_data_views[0]) - 1 if dims > 0 else 0
+        row_offset = 1 + self.basis_mat_pos[0]
 
-        rv += "subject to:\n"
+        for row in changed_rows:
+            row = int(row)
+            self.bm_data_views[row][1:dims + 1] = basis_mat[row]
 
-        rv += self._col_stat_str()
+            glpk.glp_set_mat_row(self.lp, row_offset + row, count, self.bm_indices[row], self.bm_data[row])
 
-        rv += self._constraints_str(bm_print, input_print, zero_print)
-        
-        rv += "Key: " + bm_print("Basis Matrix") + " " + cur_var_print("Cur Vars") + " " + \
-          input_print("Input Effects Offset") + "\n"
+        Timers.toc('set_basis_matrix_bulk')
 
-        return rv
-    
     def add_cols(self, names):
         'add a certain number of columns to the LP'
 
@@ -304,95 +141,57 @@ class LpInstance(Freezable): # pylint: disable=too-many-public-methods
             for i in range(num_vars):
                 glpk.glp_set_col_bnds(self.lp, num_cols + i + 1, glpk.GLP_FR, 0, 0)  # free variable (-inf, inf)
 
-    def add_rows_with_types(self, types, rhs_vec):
-        '''add rows to the LP with the given types
-
-        types is a vector of types: swiglpk.GLP_FX, swiglpk.GLP_UP, or swiglpk.GLP_LO
-        rhs_vector is the right-hand-side values of the constriants
-        '''
-
-        assert len(types) == len(rhs_vec)
-
-        if isinstance(rhs_vec, list):
-            rhs_vec = np.array(rhs_vec, dtype=float)
-
-        assert isinstance(rhs_vec, np.ndarray) and len(rhs_vec.shape) == 1, "expected 1-d right-hand-side vector"
-
-        if rhs_vec.shape[0] > 0:
-            num_rows = glpk.glp_get_num_rows(self.lp)
-
-            # create new row for each constraint
-            glpk.glp_add_rows(self.lp, len(rhs_vec))
-            
-            for i, pair in enumerate(zip(rhs_vec, types)):
-                rhs, ty = pair
-
-                if ty == glpk.GLP_UP:
-                    glpk.glp_set_row_bnds(self.lp, num_rows + i + 1, glpk.GLP_UP, 0, rhs)  # '<=' constraint
-                elif ty == glpk.GLP_LO:
-                    glpk.glp_set_row_bnds(self.lp, num_rows + i + 1, glpk.GLP_LO, rhs, 0)  # '>=' constraint
-                else:
-                    assert ty == glpk.GLP_FX
-
-                    glpk.glp_set_row_bnds(self.lp, num_rows + i + 1, glpk.GLP_FX, rhs, rhs)  # '>=' constraint
-
-    def add_rows_less_equal(self, rhs_vec):
-        '''add rows to the LP with <= constraints
+            self._model_modified()
 
-        rhs_vector is the right-hand-side values of the constriants
-        '''
+    def _add_rows_with_types(self, types, rhs_vec):
+        'add rows with the given types and (non-empty, 1-d np.array) right-hand sides, see add_rows_with_types()'
 
-        if isinstance(rhs_vec, list):
-            rhs_vec = np.array(rhs_vec, dtype=float)
+        num_rows = glpk.glp_get_num_rows(self.lp)
 
-        assert isinstance(rhs_vec, np.ndarray) and len(rhs_vec.shape) == 1, "expected 1-d right-hand-side vector"
+        # create new row for each constraint
+        glpk.glp_add_rows(self.lp, len(rhs_vec))
 
-        if rhs_vec.shape[0] > 0:
-            num_rows = glpk.glp_get_num_rows(self.lp)
+        for i, pair in enumerate(zip(rhs_vec, types)):
+            rhs, ty = pair
 
-            # create new row for each constraint
-            glpk.glp_add_rows(self.lp, len(rhs_vec))
-
-            for i, rhs in enumerate(rhs_vec):
+            if ty == glpk.GLP_UP:
                 glpk.glp_set_row_bnds(self.lp, num_rows + i + 1, glpk.GLP_UP, 0, rhs)  # '<=' constraint
+            elif ty == glpk.GLP_LO:
+                glpk.glp_set_row_bnds(self.lp, num_rows + i + 1, glpk.GLP_LO, rhs, 0)  # '>=' constraint
+            else:
+                assert ty == glpk.GLP_FX
 
-    def add_rows_equal_zero(self, num):
-        '''add rows to the LP with == 0 constraints'''
+                glpk.glp_set_row_bnds(self.lp, num_rows + i + 1, glpk.GLP_FX, rhs, rhs)  # '>=' constraint
 
-        if num > 0:
-            num_rows = glpk.glp_get_num_rows(self.lp)
+    def del_rows(self, rows):
+        '''delete rows from the LP
 
-            # create new row for each constraint
-            glpk.glp_add_rows(self.lp, num)
+        rows is a list of row indices; the rows after each deleted row get shifted up
+        '''
 
-            for i in range(num):
-                glpk.glp_set_row_bnds(self.lp, num_rows + i + 1, glpk.GLP_FX, 0, 0)  # '== 0' constraints
+        if rows:
+            num = glpk.intArray(len(rows) + 1)
 
-    def set_constraints_csr(self, csr_mat, offset=None):
-        '''set the constrains row by row to be equal to the passed-in csr matrix
+            for i, row in enumerate(rows):
+                num[i + 1] = int(row) + 1
 
-        offset is an optional tuple (num_rows, num_cols) which tells you the top-left offset for the assignment
-        '''
+            glpk.glp_del_rows(self.lp, len(rows), num)
 
-        Timers.tic('set_constraints_csr')
+            self.last_basis_matrix = None
+            self._model_modified()
 
-        assert isinstance(csr_mat, csr_matrix)
-        assert csr_mat.dtype == float
+    def _del_cols(self, cols):
+        'delete columns from the LP, see del_cols() (which also updates the column names)'
 
-        if offset is None:
-            offset = (0, 0)
+        num = glpk.intArray(len(cols) + 1)
 
-        assert len(offset) == 2, "offset should be a 2-tuple (num_rows, num_cols)"
+        for i, col in enumerate(cols):
+            num[i + 1] = int(col) + 1
 
-        # check that the matrix is in bounds
-        lp_rows = self.get_num_rows()
-        lp_cols = self.get_num_cols()
+        glpk.glp_del_cols(self.lp, len(cols), num)
 
-        if offset[0] < 0 or offset[1] < 0 or \
-                            offset[0] + csr_mat.shape[0] > lp_rows or offset[1] + csr_mat.shape[1] > lp_cols:
-            raise RuntimeError("Error: set constraints matrix out of bounds (offset was " + \
-                "{}, matrix size was {}), but lp size was ({}, {})".format(
-                    offset, csr_mat.shape, lp_rows, lp_cols))
+    def _set_constraints_csr(self, csr_mat, offset):
+        'set the constraints row by row from the csr matrix at the (bounds-checked) offset, see set_constraints_csr()'
 
         # actually set the constraints row by row
         indptr = csr_mat.indptr
@@ -411,7 +210,7 @@ class LpInstance(Freezable): # pylint: disable=too-many-public-methods
 
             glpk.glp_set_mat_row(self.lp, offset[0] + row + 1, count, indices_vec, data_vec)
 
-        Timers.toc('set_constraints_csr')
+        self._rows_modified(np.arange(offset[0], offset[0] + csr_mat.shape[0]))
 
     def set_constraints_swigvec_rows(self, data_vec_list, indices_vec_list, count_list, row_offset):
         '''An optimized / lower level way to set row constraints compared with set_constraints_csr
@@ -425,33 +224,12 @@ class LpInstance(Freezable): # pylint: disable=too-many-public-methods
         for row, (data, indices, count) in enumerate(zip(data_vec_list, indices_vec_list, count_list)):
             glpk.glp_set_mat_row(self.lp, 1 + row_offset + row, count, indices, data)
 
-        Timers.toc('set_constraints_swigvec_rows')
+        self._rows_modified(np.arange(row_offset, row_offset + len(data_vec_list)))
 
-    def set_constraints_csc(self, csc_mat, offset=None):
-        '''set the constrains column by column to be equal to the passed-in csc matrix
-
-        offset is an optional tuple (num_rows, num_cols) which tells you the top-left offset for the assignment
-        '''
-
-        Timers.tic('set_constraints_csc')
-
-        assert isinstance(csc_mat, csc_matrix)
-        assert csc_mat.dtype == float
-
-        if offset is None:
-            offset = (0, 0)
-
-        assert len(offset) == 2, "offset should be a 2-tuple (num_rows, num_cols)"
-
-        # check that the matrix is in bounds
-        lp_rows = self.get_num_rows()
-        lp_cols = self.get_num_cols()
+        Timers.toc('set_constraints_swigvec_rows')
 
-        if offset[0] < 0 or offset[1] < 0 or \
-                            offset[0] + csc_mat.shape[0] > lp_rows or offset[1] + csc_mat.shape[1] > lp_cols:
-            raise RuntimeError(("Error: set constraints matrix out of bounds (offset was " + \
-                "{}, matrix size was {}), but lp size was ({}, {})").format(
-                    offset, csc_mat.shape, lp_rows, lp_cols))
+    def _set_constraints_csc(self, csc_mat, offset):
+        'set the constraints col by col from the csc matrix at the (bounds-checked) offset, see set_constraints_csc()'
 
         # actually set the constraints col by col
         indptr = csc_mat.indptr
@@ -470,104 +248,69 @@ class LpInstance(Freezable): # pylint: disable=too-many-public-methods
 
             glpk.glp_set_mat_col(self.lp, offset[1] + col + 1, count, indices_vec, data_vec)
 
-        Timers.toc('set_constraints_csc')
+        self._rows_modified(offset[0] + indices)
 
     def reset_lp(self):
         'reset all the column and row statuses of the LP'
 
         glpk.glp_std_basis(self.lp)
 
-    def is_feasible(self):
-        '''check if the lp is feasible
-        '''
-
-        return self.minimize(columns=[], fail_on_unsat=False) is not None
-
-    def set_minimize_direction(self, direction_vec, is_csr=False, offset=None):
-        '''set the direction for the optimization
-
-        if offset is None, will use cur_vars_offset (direction is in terms of current-time variables)
-        '''
+    def _set_objective(self, cols, vals):
+        '''set the objective coefficients of the passed-in columns (list of indices), and set all other objective
+        coefficients (the ones in self.obj_cols) to zero'''
 
-        Timers.tic("set_minimize_direction")
+        for i in self.obj_cols:
+            glpk.glp_set_obj_coef(self.lp, i + 1, 0)
 
-        if offset is None:
-            offset = self.cur_vars_offset
+        for col, val in zip(cols, vals):
+            glpk.glp_set_obj_coef(self.lp, col + 1, val)
 
-            size = direction_vec.shape[1] if is_csr else len(direction_vec)
+    def _reset_basis(self):
+        'reset the starting basis, called before retrying a failed lp'
 
-            assert size <= self.dims, "len(direction_vec) ({}) > number of cur_vars({})".format(
-                size, self.dims)
-        else:
-            assert direction_vec.shape[1] + offset <= self.get_num_cols()
-
-        # set the previous objective columns to zero
-        for i in self.obj_cols:
-            glpk.glp_set_obj_coef(self.lp, i, 0)
+        glpk.glp_cpx_basis(self.lp) # resets the initial basis
 
-        self.obj_cols = []
+    def _get_objective_value(self):
+        'get the objective value of the last optimal solution found by _minimize()'
 
-        if is_csr:
-            assert isinstance(direction_vec, csr_matrix)
-            assert direction_vec.shape[0] == 1
+        return glpk.glp_get_obj_val(self.lp)
 
-            data, inds, indptr = direction_vec.data, direction_vec.indices, direction_vec.indptr
-            
-            for n in range(indptr[1]):
-                col = int(1 + offset + inds[n])
-                self.obj_cols.append(col)
+    def _get_basis_statuses(self):
+        '''get the basis status of each row and column (backend-specific codes), used for pickling
 
-                if col > len(self.names):
-                    print(self)
-                    
-                assert col <= len(self.names) 
-                glpk.glp_set_obj_coef(self.lp, col, data[n])
+        returns a pair of np.int8 arrays (row statuses, column statuses), or None if there is no basis
+        '''
 
-        else: # non-csr
-            if not isinstance(direction_vec, np.ndarray):
-                direction_vec = np.array(direction_vec, dtype=float)
+        rows = [glpk.glp_get_row_stat(self.lp, row) for row in range(1, self.get_num_rows() + 1)]
+        cols = [glpk.glp_get_col_stat(self.lp, col) for col in range(1, self.get_num_cols() + 1)]
 
-            assert len(direction_vec.shape) == 1
-            assert len(direction_vec) <= self.dims, "dirLen({}) > dims({})".format(len(direction_vec), self.dims)
+        return np.array(rows, dtype=np.int8), np.array(cols, dtype=np.int8)
 
-            for i, direction in enumerate(direction_vec):
-                col = int(1 + offset + i)
-                self.obj_cols.append(col)
-                glpk.glp_set_obj_coef(self.lp, col, float(direction))
+    def _set_basis_statuses(self, row_statuses, col_statuses):
+        'set the starting basis from statuses returned by _get_basis_statuses(), used when unpickling'
 
-        Timers.toc("set_minimize_direction")
+        for row, stat in enumerate(row_statuses.tolist()):
+            glpk.glp_set_row_stat(self.lp, row + 1, stat)
 
-    def minimize(self, direction_vec=None, columns=None, fail_on_unsat=True, print_on=False):
-        '''minimize the lp, returning a list of assigments to each of the variables
+        for col, stat in enumerate(col_statuses.tolist()):
+            glpk.glp_set_col_stat(self.lp, col + 1, stat)
 
-        if direction_vec is not None, this will first assign the optimization direction (note: relative to cur_vars)
-        if columns is not None, will only return the requested columns (default: all columns)
-        if fail_on_unsat is True and the LP is infeasible, an UnsatError is raised
-        unsat (sometimes happens in GLPK due to likely bug, see space station model)
+    def _minimize(self, columns, print_on):
+        '''solve the lp with the current objective
 
-        returns None if UNSAT, otherwise the optimization result. Use columns=[] if you're not interested in the result
+        returns None if UNSAT, otherwise the optimization result with the requested columns (None = all columns)
         '''
 
-        Timers.tic('minimize')
-
-        if direction_vec is not None:
-            self.set_minimize_direction(direction_vec)
-
-        # setup lp params
-        params = glpk.glp_smcp()
-        glpk.glp_init_smcp(params)
-        params.meth = glpk.GLP_DUALP # use dual simplex since we're reoptimizing often
-        params.msg_lev = glpk.GLP_MSG_ALL if print_on else glpk.GLP_MSG_OFF
-        params.tm_lim = 1000 # 1000 ms time limit
+        params = GlpkLpInstance._get_simplex_params(print_on)
 
-        Timers.tic('glp_simplex')
+        GLP_SIMPLEX_TIMER.tic()
         simplex_res = glpk.glp_simplex(self.lp, params)
-        Timers.toc('glp_simplex')
+        GLP_SIMPLEX_TIMER.toc()
 
         if simplex_res != 0:
             # this can happen when you replace constraints after already solving once
             LpInstance.print_normal('Note: glp_simplex() failed ({}: {}), resetting and retrying'.format(
-                simplex_res, LpInstance.get_simplex_error_string(simplex_res)))
+                simplex_res, GlpkLpInstance.get_simplex_error_string(simplex_res)))
 
             if simplex_res == glpk.GLP_ESING: # singular matrix, can happen after replacing constraints
                 glpk.glp_std_basis(self.lp)
@@ -575,29 +318,36 @@ class LpInstance(Freezable): # pylint: disable=too-many-public-methods
 
             if simplex_res != 0:
                 glpk.glp_cpx_basis(self.lp) # resets the initial basis
+                params = GlpkLpInstance._make_simplex_params(print_on) # don't modify the shared params
                 params.msg_lev = glpk.GLP_MSG_ON # turn printing on
                 params.tm_lim = 30 * 1000 # second try: 30 second time limit
                 simplex_res = glpk.glp_simplex(self.lp, params)
 
         # process simplex result
-        rv = self._process_simplex_result(simplex_res, columns)
+        return self._process_simplex_result(simplex_res, columns)
 
-        Timers.toc('minimize')
+    @staticmethod
+    def _make_simplex_params(print_on):
+        'create the glp_smcp simplex parameters used in _minimize()'
 
-        if rv is None and fail_on_unsat:
-            LpInstance.print_normal("Note: minimize failed with fail_on_unsat was true, resetting and retrying...")
+        params = glpk.glp_smcp()
+        glpk.glp_init_smcp(params)
+        params.meth = glpk.GLP_DUALP # use dual simplex since we're reoptimizing often
+        params.msg_lev = glpk.GLP_MSG_ALL if print_on else glpk.GLP_MSG_OFF
+        params.tm_lim = 1000 # 1000 ms time limit
 
-            glpk.glp_cpx_basis(self.lp) # resets the initial basis
+        return params
 
-            rv = self.minimize(direction_vec, columns, False, print_on=True)
+    @classmethod
+    def _get_simplex_params(cls, print_on):
+        'get the shared (read-only) glp_smcp simplex parameters, creating them on first use'
 
-            if rv is not None:
-                LpInstance.print_verbose("Note: LP was infeasible, but then feasible after resetting statuses")
+        params = cls.simplex_params.get(print_on)
 
-        if rv is None and fail_on_unsat:
-            raise UnsatError("minimize returned UNSAT and fail_on_unsafe was True")
+        if params is None:
+            params = cls.simplex_params[print_on] = cls._make_simplex_params(print_on)
 
-        return rv
+        return params
 
     @staticmethod
     def get_simplex_error_string(simplex_res):
@@ -669,29 +419,14 @@ class LpInstance(Freezable): # pylint: disable=too-many-public-methods
             rv = None
         elif simplex_res != 0: # simplex failed, report the error
             raise RuntimeError("glp_simplex returned nonzero status ({}): {}".format(
-                simplex_res, LpInstance.get_simplex_error_string(simplex_res)))
+                simplex_res, GlpkLpInstance.get_simplex_error_string(simplex_res)))
         else:
             status = glpk.glp_get_status(self.lp)
 
             if status == glpk.GLP_NOFEAS: # infeasible
                 rv = None
             elif status == glpk.GLP_OPT: # optimal
-                lp_cols = self.get_num_cols()
-                
-                if columns is None:
-                    rv = np.zeros(lp_cols)
-                else:
-                    rv = np.zeros(len(columns))
-
-                # copy the output vars
-                rv_len = len(rv)
-                
-                for i in range(rv_len):
-                    col = i if columns is None else columns[i]
-
-                    assert 0 <= col < lp_cols, "out of bounds column requested in LP solution: {}".format(col)
-
-                    rv[i] = glpk.glp_get_col_prim(self.lp, int(col + 1))
+                rv = self._get_col_primals(columns)
 
             else: # neither infeasible nor optimal (for example, unbounded)
                 codes = [glpk.GLP_OPT, glpk.GLP_FEAS, glpk.GLP_INFEAS, glpk.GLP_NOFEAS, glpk.GLP_UNBND, glpk.GLP_UNDEF]
@@ -715,6 +450,32 @@ class LpInstance(Freezable): # pylint: disable=too-many-public-methods
 
         return rv
 
+    def _get_col_primals(self, columns):
+        '''get the primal values of the requested columns (None = all columns) after an optimal solve, as an np.array
+
+        all the values are copied at once with swiglpk.get_col_primals(), unless only a few columns are requested
+        '''
+
+        lp_cols = self.get_num_cols()
+
+        if columns is None:
+            rv = np.array(glpk.get_col_primals(self.lp), dtype=float)
+        else:
+            columns = np.asarray(columns, dtype=int)
+            rv = np.empty(len(columns))
+
+            if rv.size > 0:
+                assert 0 <= columns.min() and columns.max() < lp_cols, \
+                    "out of bounds column requested in LP solution: {}".format(columns)
+
+                if rv.size * GlpkLpInstance.BULK_PRIMALS_RATIO >= lp_cols:
+                    rv[:] = np.array(glpk.get_col_primals(self.lp), dtype=float)[columns]
+                else:
+                    for i, col in enumerate(columns):
+                        rv[i] = glpk.glp_get_col_prim(self.lp, int(col) + 1)
+
+        return rv
+
     def set_constraint_rhs(self, row_index, rhs):
         '''change an existing constraint's right hand side'''
 
@@ -735,6 +496,8 @@ class LpInstance(Freezable): # pylint: disable=too-many-public-methods
             raise RuntimeError("Invalid constraint type {} in row {} in set_constraint_rhs()".format(
                 row_type, row_index))
 
+        self._model_modified()
+
     def write_lp_glpk(self, filename):
         '''write the lp in GLPK format'''
 
@@ -758,17 +521,12 @@ class LpInstance(Freezable): # pylint: disable=too-many-public-methods
 
         return rv
 
-    def get_dense_constraints(self, x, y, w, h):
-        'get a subconstraint matrix from the lpi as a dense matrix'
+    def _get_dense_constraints(self, x, y, w, h):
+        'get a (bounds-checked) subconstraint matrix as a dense matrix, see get_dense_constraints()'
 
         rv = np.zeros((h, w))
-
-        lp_rows = self.get_num_rows()
         lp_cols = self.get_num_cols()
 
-        assert x >= 0 and w >= 0 and x + w <= lp_cols, f"invalid x range requested, lpcols = {lp_cols}"
-        assert y >= 0 and h >= 0 and y + h <= lp_rows, "invalid y range requested"
-
         inds_row = glpk.intArray(lp_cols + 1)
         vals_row = glpk.doubleArray(lp_cols + 1)
 
@@ -783,11 +541,6 @@ class LpInstance(Freezable): # pylint: disable=too-many-public-methods
                     
         return rv
 
-    def get_names(self):
-        '''get the symbolic names of each column'''
-
-        return self.names
-
     def get_rhs(self, row_indices=None):
         '''get the rhs vector of the constraints
 
@@ -882,20 +635,27 @@ class LpInstance(Freezable): # pylint: disable=too-many-public-methods
 
         return glpk.glp_get_num_rows(self.lp)
 
-    def get_num_cols(self):
-        'get the number of columns in the lp'
+    def get_objective(self):
+        'get the objective coefficients of all the columns, as an np.array'
+
+        return np.array([glpk.glp_get_obj_coef(self.lp, col) for col in range(1, self.get_num_cols() + 1)],
+                        dtype=float)
 
-        #return glpk.glp_get_num_cols(self.lp)
-        return len(self.names) # probably faster than making a call to glpk
+    def _get_stat_labels(self):
+        'get the basis status labels for __str__, a pair of lists of strings: (row labels, column labels)'
+
+        stat_labels = ["?(0)?", "BS", "NL", "NU", "NF", "NS", "?(6)?"]
+
+        row_labels = [stat_labels[glpk.glp_get_row_stat(self.lp, row)] for row in range(1, self.get_num_rows() + 1)]
+        col_labels = [stat_labels[glpk.glp_get_col_stat(self.lp, col)] for col in range(1, self.get_num_cols() + 1)]
+
+        return row_labels, col_labels
 
     def get_iterations(self):
         'get the number of LP iterations performed so far'
 
         return glpk.glp_get_it_cnt(self.lp)
 
-class UnsatError(RuntimeError):
-    'raised if an LP is infeasible'
-
 class SwigArray():
     '''Tracker for how much memoey swig arrays allocate (And leak, since there is a memory leak for these:
     see: https://github.com/biosustain/swiglpk/issues/31 )
@@ -936,3 +696,6 @@ class SwigArray():
             raise MemoryError(("Swig array allocation leaked more than {} GB memory. This limit can be raised by " + \
                 "increasing lpinstance.StaticSettings.MAX_MEMORY_SWIGLPK_LEAK_GB. For info on the leak, see: " + \
                   "https://github.com/biosustain/swiglpk/issues/31").format(gb_allowed))
+
+# default backend used by LpInstance()
+LpInstance.backend_class = GlpkLpInstance
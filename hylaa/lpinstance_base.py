@@ -0,0 +1,863 @@
+'''
+Backend-neutral linear programming interface, which is implemented by GlpkLpInstance (in lpinstance.py) and
+HighsLpInstance (in lpinstance_highs.py)
+'''
+
+from termcolor import colored
+
+import numpy as np
+from scipy.sparse import csr_matrix, csc_matrix
+import swiglpk as glpk
+
+from hylaa.util import Freezable
+from hylaa.timerutil import Timers
+
+SET_MINIMIZE_DIRECTION_TIMER = Timers.register('set_minimize_direction')
+MINIMIZE_TIMER = Timers.register('minimize')
+
+def simple_print(s):
+    'print using the print function'
+
+    print(s)
+
+class LpInstance(Freezable): # pylint: disable=too-many-public-methods
+    '''Backend-neutral linear programming interface
+
+    Constructing an LpInstance() creates an instance of LpInstance.backend_class, which is GlpkLpInstance by default
+    and is reassigned in core based on HylaaSettings.lp_backend (and restored after Core.run() or Core.resume()
+    returns). Constraint types use the swiglpk constants
+    (GLP_FX, GLP_UP and GLP_LO) for every backend. Rows and columns are 0-indexed.
+    '''
+
+    print_normal = simple_print # function for printing normal information (reassigned in core)
+    print_verbose = simple_print # function for printing verbose information (reassigned in core)
+    print_debug = simple_print # function for printing debug information (reassigned in core)
+
+    backend_class = None # subclass created by LpInstance(), GlpkLpInstance is assigned when lpinstance.py is imported
+
+    def __new__(cls, *_args, **_kwargs):
+        backend = LpInstance.backend_class if cls is LpInstance else cls
+        assert backend is not None, "LpInstance() needs a backend, import it from hylaa.lpinstance"
+
+        return super().__new__(backend)
+
+    def __init__(self):
+        '''initialize the backend-neutral part of the lp instance
+
+        subclasses should call this first, and then freeze_attrs() at the end of their own __init__
+        '''
+
+        # these are assigned on set_reach_vars()
+        self.dims = None
+        self.basis_mat_pos = None # 2-tuple, row, column (NOT X/Y)
+        self.cur_vars_offset = None
+        self.input_effects_offsets = None # None or 2-tuple, row of input constraints / col of accumulated input effects
+
+        # internal bookkeeping
+        self.obj_cols = [] # columns in the LP with an assigned objective coefficient
+        self.names = [] # column names
+        self.last_basis_matrix = None # basis matrix last assigned with set_basis_matrix_bulk(), None if unknown
+        self.model_version = 0 # incremented whenever the rows, columns or constraints change (see _model_modified)
+
+        # lputil.InitZonotope if this lp was made from a box or zonotope, used for closed-form support functions
+        # this is not copied on clone(), since it's only valid until other constraints are added
+        self.init_zonotope = None
+
+    def convert(self, lpi_class):
+        '''get a copy of this lp instance using a different backend (an LpInstance subclass)
+
+        returns self if the lp is already an instance of lpi_class
+        '''
+
+        rv = self
+
+        if not isinstance(self, lpi_class):
+            rv = LpInstance.from_model(self.get_model(), lpi_class)
+            rv.init_zonotope = self.init_zonotope
+
+        return rv
+
+    def get_model(self):
+        '''get a backend-neutral, picklable description of the lp: its column names, row types, rhs values, constraints
+        (csr_matrix) and reachability variables. This does not include the objective or any solver state.
+
+        use LpInstance.from_model() to create an lp instance from the returned object
+        '''
+
+        reach_vars = None
+
+        if self.dims is not None:
+            reach_vars = (self.dims, self.basis_mat_pos, self.cur_vars_offset, self.input_effects_offsets)
+
+        return (self.names.copy(), self.get_types(), self.get_rhs(), self.get_full_constraints(), reach_vars)
+
+    @staticmethod
+    def from_model(model, lpi_class=None):
+        '''create an lp instance from a model returned by get_model()
+
+        lpi_class is the LpInstance subclass to use (None = LpInstance.backend_class)
+        '''
+
+        rv = LpInstance() if lpi_class is None else lpi_class()
+        rv._load_model(model) # pylint: disable=protected-access
+
+        return rv
+
+    def _load_model(self, model):
+        'add the columns, rows, constraints and reachability variables of a model to this (empty) lp instance'
+
+        names, types, rhs, csr, reach_vars = model
+
+        self.add_cols(list(names))
+        self.add_rows_with_types(types, rhs)
+        self.set_constraints_csr(csr)
+
+        if reach_vars is not None:
+            self.set_reach_vars(*reach_vars)
+
+    def __getstate__(self):
+        '''get the state of this lp for pickling, in a compact numpy form: the constraint matrix (as csr arrays), the
+        row types and rhs values (columns are always free), the column names, the reachability variable offsets and
+        the basis statuses, so that the unpickled lp is warm started. The objective is not included.
+        '''
+
+        csr = self.get_full_constraints()
+        reach_vars = None
+
+        if self.dims is not None:
+            reach_vars = (self.dims, self.basis_mat_pos, self.cur_vars_offset, self.input_effects_offsets)
+
+        return {'names': self.names, 'types': np.array(self.get_types(), dtype=np.int8), 'rhs': self.get_rhs(),
+                'shape': csr.shape, 'data': csr.data, 'indices': csr.indices.astype(np.int32, copy=False),
+                'indptr': csr.indptr.astype(np.int32, copy=False), 'reach_vars': reach_vars,
+                'basis_statuses': self._get_basis_statuses(), 'init_zonotope': self.init_zonotope}
+
+    def __setstate__(self, state):
+        'restore the lp from the state returned by __getstate__()'
+
+        self.__init__() # pylint: disable=unnecessary-dunder-call
+
+        csr = csr_matrix((state['data'], state['indices'], state['indptr']), shape=state['shape'])
+        self._load_model((state['names'], state['types'].tolist(), state['rhs'], csr, state['reach_vars']))
+
+        if state['basis_statuses'] is not None:
+            self._set_basis_statuses(*state['basis_statuses'])
+
+        self.init_zonotope = state['init_zonotope']
+
+    def set_reach_vars(self, dims, basis_mat_pos, cur_vars_offset, input_effects_offsets):
+        'set reachability variables'
+
+        num_rows = self.get_num_rows()
+        num_cols = self.get_num_cols()
+
+        assert basis_mat_pos[0] + dims <= num_rows
+        assert basis_mat_pos[1] + 2 * dims <= num_cols  # need >= 2*dims for cur_time vars somewhere to the right of BM
+
+        if input_effects_offsets is not None:
+            assert input_effects_offsets[0] + dims <= num_rows
+            assert input_effects_offsets[1] + dims <= num_cols
+
+        self.dims = dims
+        self.basis_mat_pos = basis_mat_pos
+        self.cur_vars_offset = cur_vars_offset #num_cols - dims # right-most variables
+        self.input_effects_offsets = input_effects_offsets
+        self.last_basis_matrix = None
+
+        self._create_bm_indices()
+        self._model_modified()
+
+    def _create_bm_indices(self):
+        '''called when the reach vars are assigned, so backends can cache the basis matrix row structure'''
+
+    def _changed_basis_matrix_rows(self, basis_mat):
+        '''get the rows of the basis matrix that differ from the last one assigned with set_basis_matrix_bulk()
+
+        this also checks the shape of basis_mat and saves it as the last assigned basis matrix
+        '''
+
+        dims = self.dims
+        assert basis_mat.shape == (dims, dims), \
+            f"basis matrix wrong shape, expected ({dims}, {dims}), got {basis_mat.shape}"
+
+        if self.last_basis_matrix is None:
+            rv = range(dims)
+        else:
+            rv = np.nonzero(np.any(basis_mat != self.last_basis_matrix, axis=1))[0]
+
+        self.last_basis_matrix = basis_mat.copy()
+
+        if len(rv) > 0:
+            self._model_modified()
+
+        return rv
+
+    def _model_modified(self):
+        '''called whenever the rows, columns, constraints or rhs values are modified
+
+        this increments model_version, which is used to skip re-saving unchanged lps in checkpoints
+        '''
+
+        self.model_version += 1
+
+    def _rows_modified(self, rows):
+        'called when the passed-in lp rows (np.array) are modified; invalidates last_basis_matrix if needed'
+
+        self._model_modified()
+
+        if self.last_basis_matrix is not None:
+            bm_row = self.basis_mat_pos[0]
+
+            if np.any((rows >= bm_row) & (rows < bm_row + self.dims)):
+                self.last_basis_matrix = None
+
+    def _column_names_str(self, cur_var_print):
+        'get the line in __str__ for the column names'
+
+        rv = "       "
+
+        for col, name in enumerate(self.names):
+            name = self.names[col]
+            name = "-" if name is None else name
+            
+            if len(name) < 6:
+                name = (" " * (6 - len(name))) + name
+            else:
+                name = name[0:6]
+
+            if self.cur_vars_offset <= col < self.cur_vars_offset + self.dims: 
+                rv += cur_var_print(name) + " "
+            else:
+                rv += name + " "
+
+        rv += "\n"
+        
+        return rv
+
+    def _opt_dir_str(self, zero_print):
+        'get the optimization direction line for __str__'
+
+        rv = "min    "
+
+        for val in self.get_objective():
+            num = str(val)
+            
+            if len(num) < 6:
+                num = (" " * (6 - len(num))) + num
+            else:
+                num = num[0:6]
+
+            if val == 0:
+                rv += zero_print(num) + " "
+            else:
+                rv += num + " "
+
+        rv += "\n"
+        
+        return rv
+
+    def _col_stat_str(self):
+        'get the column statuses line for __str__'
+
+        rv = "   "
+
+        for label in self._get_stat_labels()[1]:
+            rv += "{:>6} ".format(label)
+
+        rv += "\n"
+
+        return rv
+
+    def _constraints_str(self, bm_print, input_print, zero_print):
+        'get the constraints matrix lines for __str__'
+
+        rv = ""
+        rows = self.get_num_rows()
+        cols = self.get_num_cols()
+
+        mat = self.get_full_constraints().toarray()
+        types = self.get_types()
+        rhs_vec = self.get_rhs()
+        row_labels = self._get_stat_labels()[0]
+
+        for row in range(rows):
+            rv += "{:2}: {} ".format(row, row_labels[row])
+
+            for col in range(cols):
+                val = mat[row, col]
+
+                num = str(val)
+                if len(num) < 6:
+                    num = (" " * (6 - len(num))) + num
+                else:
+                    num = num[0:6]
+
+                if self.basis_mat_pos[0] <= row < self.basis_mat_pos[0] + self.dims and \
+                        self.basis_mat_pos[1] <= col < self.basis_mat_pos[1] + self.dims:
+                    rv += bm_print(num) + " "
+                elif self.input_effects_offsets is not None and \
+                        self.input_effects_offsets[0] <= row < self.input_effects_offsets[0] + self.dims and \
+                        self.input_effects_offsets[1] <= col < self.input_effects_offsets[1] + self.dims:
+                    rv += input_print(num) + " "
+                else:
+                    rv += (zero_print(num) if val == 0 else num) + " "
+
+            row_type = types[row]
+            val = rhs_vec[row]
+
+            if row_type == glpk.GLP_FX:
+                rv += " == "
+            elif row_type == glpk.GLP_UP:
+                rv += " <= "
+            elif row_type == glpk.GLP_LO:
+                rv += " >= "
+            else:
+                rv += " <?> (unknown bounds)"
+                val = '?'
+
+            num = str(val)
+            if len(num) < 6:
+                num = (" " * (6 - len(num))) + num
+            else:
+                num = num[0:6]
+
+            rv += (zero_print(num) if val == 0 else num) + " "
+
+            rv += "\n"
+
+        return rv
+
+    def __str__(self, plain_text=False):
+        'get the LP as string (useful for debugging)'
+
+        if plain_text:
+            cur_var_print = bm_print = input_print = zero_print = lambda x: x
+        else:
+            def cur_var_print(s):
+                'print function for current variables'
+
+                return colored(s, on_color="on_cyan")
+
+            def bm_print(s):
+                'print function for basis matrix'
+
+                return colored(s, on_color="on_red")
+
+            def input_print(s):
+                'print function for input offset'
+
+                return colored(s, on_color="on_green")
+
+            def zero_print(s):
+                'print function for zeros'
+
+                return colored(s, 'white', attrs=['dark'])
+
+        rows = self.get_num_rows()
+        cols = self.get_num_cols()
+        rv = "Lp has {} columns (variables) and {} rows (constraints)\n".format(cols, rows)
+
+        rv += self._column_names_str(cur_var_print)
+
+        rv += self._opt_dir_str(zero_print)
+
+        rv += "subject to:\n"
+
+        rv += self._col_stat_str()
+
+        rv += self._constraints_str(bm_print, input_print, zero_print)
+        
+        rv += "Key: " + bm_print("Basis Matrix") + " " + cur_var_print("Cur Vars") + " " + \
+          input_print("Input Effects Offset") + "\n"
+
+        return rv
+    
+    def add_rows_less_equal(self, rhs_vec):
+        '''add rows to the LP with <= constraints
+
+        rhs_vector is the right-hand-side values of the constriants
+        '''
+
+        if isinstance(rhs_vec, list):
+            rhs_vec = np.array(rhs_vec, dtype=float)
+
+        assert isinstance(rhs_vec, np.ndarray) and len(rhs_vec.shape) == 1, "expected 1-d right-hand-side vector"
+
+        self.add_rows_with_types([glpk.GLP_UP] * rhs_vec.shape[0], rhs_vec)
+
+    def add_rows_equal_zero(self, num):
+        '''add rows to the LP with == 0 constraints'''
+
+        self.add_rows_with_types([glpk.GLP_FX] * num, np.zeros(num))
+
+    def is_feasible(self):
+        '''check if the lp is feasible
+        '''
+
+        return self.minimize(columns=[], fail_on_unsat=False) is not None
+
+    def set_minimize_direction(self, direction_vec, is_csr=False, offset=None):
+        '''set the direction for the optimization
+
+        if offset is None, will use cur_vars_offset (direction is in terms of current-time variables)
+        '''
+
+        SET_MINIMIZE_DIRECTION_TIMER.tic()
+
+        size = direction_vec.shape[1] if is_csr else len(direction_vec)
+
+        if offset is None:
+            offset = self.cur_vars_offset
+
+            assert size <= self.dims, "len(direction_vec) ({}) > number of cur_vars({})".format(
+                size, self.dims)
+        else:
+            assert size + offset <= self.get_num_cols()
+
+        if is_csr:
+            assert isinstance(direction_vec, csr_matrix)
+            assert direction_vec.shape[0] == 1
+
+            data, inds, indptr = direction_vec.data, direction_vec.indices, direction_vec.indptr
+
+            cols = [int(offset + inds[n]) for n in range(indptr[1])]
+            vals = [float(data[n]) for n in range(indptr[1])]
+
+            if cols and cols[-1] >= len(self.names):
+                print(self)
+
+            assert not cols or max(cols) < len(self.names)
+
+        else: # non-csr
+            if not isinstance(direction_vec, np.ndarray):
+                direction_vec = np.array(direction_vec, dtype=float)
+
+            assert len(direction_vec.shape) == 1
+
+            cols = [int(offset + i) for i in range(len(direction_vec))]
+            vals = [float(direction) for direction in direction_vec]
+
+        self._set_objective(cols, vals)
+        self.obj_cols = cols
+
+        SET_MINIMIZE_DIRECTION_TIMER.toc()
+
+    def minimize(self, direction_vec=None, columns=None, fail_on_unsat=True, print_on=False):
+        '''minimize the lp, returning a list of assigments to each of the variables
+
+        if direction_vec is not None, this will first assign the optimization direction (note: relative to cur_vars)
+        if columns is not None, will only return the requested columns (default: all columns)
+        if fail_on_unsat is True and the LP is infeasible, an UnsatError is raised
+        unsat (sometimes happens in GLPK due to likely bug, see space station model)
+
+        returns None if UNSAT, otherwise the optimization result. Use columns=[] if you're not interested in the result
+        '''
+
+        MINIMIZE_TIMER.tic()
+
+        if direction_vec is not None:
+            self.set_minimize_direction(direction_vec)
+
+        start_iterations = self.get_iterations() if Timers.enabled else 0
+        rv = self._minimize(columns, print_on)
+
+        if Timers.enabled:
+            Timers.count('lp solves')
+            Timers.count('simplex iterations', self.get_iterations() - start_iterations)
+            Timers.record_histogram('lp rows', self.get_num_rows())
+            Timers.record_histogram('lp cols', self.get_num_cols())
+
+        MINIMIZE_TIMER.toc()
+
+        if rv is None and fail_on_unsat:
+            LpInstance.print_normal("Note: minimize failed with fail_on_unsat was true, resetting and retrying...")
+
+            self._reset_basis()
+
+            rv = self.minimize(direction_vec, columns, False, print_on=True)
+
+            if rv is not None:
+                LpInstance.print_verbose("Note: LP was infeasible, but then feasible after resetting statuses")
+
+        if rv is None and fail_on_unsat:
+            raise UnsatError("minimize returned UNSAT and fail_on_unsafe was True")
+
+        return rv
+
+    def minimize_value(self, direction_vec=None, is_csr=False, offset=None, fail_on_unsat=True):
+        '''minimize the lp, returning only the optimal objective value (the projection of the optimal solution onto
+        the optimization direction), without extracting the solution
+
+        if direction_vec is not None, this will first assign the optimization direction (see set_minimize_direction)
+
+        returns None if UNSAT (and fail_on_unsat is False), otherwise the minimum value
+        '''
+
+        if direction_vec is not None:
+            self.set_minimize_direction(direction_vec, is_csr=is_csr, offset=offset)
+
+        rv = None
+
+        if self.minimize(columns=[], fail_on_unsat=fail_on_unsat) is not None:
+            rv = self._get_objective_value()
+
+        return rv
+
+    def support_batch(self, direction_matrix, columns=None, offset=None, fail_on_unsat=True):
+        '''maximize the lp in each of the directions given by the rows of direction_matrix (2-d np.array or csr_matrix)
+
+        The directions are solved in an order where each one is close to the previous one, so that the optimal basis
+        of one lp is a good warm start for the next. As in set_minimize_direction(), the directions are relative to the
+        current-time variables if offset is None.
+
+        if columns is not None, the returned points will only contain the requested columns (default: all columns)
+
+        returns a pair of np.arrays (optima, points), where optima[i] is the maximum in direction i and points[i] is
+        the lp solution at the maximum. If the lp is infeasible and fail_on_unsat is False, None is returned.
+        '''
+
+        Timers.tic('support_batch')
+
+        if not isinstance(direction_matrix, np.ndarray):
+            direction_matrix = direction_matrix.toarray()
+
+        direction_matrix = np.array(direction_matrix, dtype=float)
+        assert len(direction_matrix.shape) == 2
+
+        num_dirs = direction_matrix.shape[0]
+        dir_offset = self.cur_vars_offset if offset is None else offset
+        assert offset is not None or direction_matrix.shape[1] <= self.dims
+        assert dir_offset + direction_matrix.shape[1] <= self.get_num_cols()
+
+        optima = np.zeros(num_dirs)
+        points = np.zeros((num_dirs, self.get_num_cols() if columns is None else len(columns)))
+        rv = (optima, points)
+
+        for index in LpInstance._warm_start_order(direction_matrix):
+            direction = direction_matrix[index]
+            nonzero = np.flatnonzero(direction)
+
+            # maximize direction by minimizing its negation, only assigning the nonzero objective coefficients
+            cols = [int(dir_offset + i) for i in nonzero]
+            self._set_objective(cols, [float(-direction[i]) for i in nonzero])
+            self.obj_cols = cols
+
+            result = self.minimize(columns=columns, fail_on_unsat=fail_on_unsat)
+
+            if result is None:
+                rv = None
+                break
+
+            optima[index] = -self._get_objective_value()
+            points[index] = result
+
+        Timers.toc('support_batch')
+
+        return rv
+
+    @staticmethod
+    def _warm_start_order(direction_matrix):
+        '''get an order to solve the rows of direction_matrix in, for support_batch()
+
+        This starts at the first direction and then greedily picks the remaining direction whose line (the direction or
+        its negation) has the smallest angle to the previous direction, with ties going to the earlier row. A direction
+        and its negation are therefore solved one after the other, if they are adjacent rows. Returns a list of row
+        indices.
+        '''
+
+        norms = np.linalg.norm(direction_matrix, axis=1)
+        norms[norms == 0] = 1.0
+        unit_dirs = direction_matrix / norms[:, np.newaxis]
+
+        remaining = np.ones(len(unit_dirs), dtype=bool)
+        rv = []
+
+        if len(unit_dirs) > 0:
+            cur = 0
+
+            while True:
+                rv.append(cur)
+                remaining[cur] = False
+
+                if len(rv) == len(unit_dirs):
+                    break
+
+                cosines = np.abs(np.dot(unit_dirs, unit_dirs[cur]))
+                cosines[~remaining] = -np.inf
+                cur = int(np.argmax(cosines))
+
+        return rv
+
+    def _get_solution_columns(self, solution, columns):
+        '''get the requested columns (None = all) from a full lp solution (np.array)'''
+
+        lp_cols = self.get_num_cols()
+
+        if columns is None:
+            rv = np.array(solution[:lp_cols], dtype=float)
+        else:
+            rv = np.zeros(len(columns))
+
+            for i, col in enumerate(columns):
+                assert 0 <= col < lp_cols, "out of bounds column requested in LP solution: {}".format(col)
+
+                rv[i] = solution[col]
+
+        return rv
+
+    def get_names(self):
+        '''get the symbolic names of each column'''
+
+        return self.names
+
+    def get_num_cols(self):
+        'get the number of columns in the lp'
+
+        return len(self.names)
+
+    def add_rows_with_types(self, types, rhs_vec):
+        '''add rows to the LP with the given types
+
+        types is a vector of types: swiglpk.GLP_FX, swiglpk.GLP_UP, or swiglpk.GLP_LO
+        rhs_vector is the right-hand-side values of the constriants
+        '''
+
+        assert len(types) == len(rhs_vec)
+
+        if isinstance(rhs_vec, list):
+            rhs_vec = np.array(rhs_vec, dtype=float)
+
+        assert isinstance(rhs_vec, np.ndarray) and len(rhs_vec.shape) == 1, "expected 1-d right-hand-side vector"
+
+        if rhs_vec.shape[0] > 0:
+            self._add_rows_with_types(types, rhs_vec)
+            self._model_modified()
+
+    def del_cols(self, cols):
+        '''delete columns (variables) from the LP
+
+        cols is a list of column indices; the columns after each deleted column get shifted left. This also
+        clears the optimization direction.
+        '''
+
+        if cols:
+            self._set_objective([], [])
+            self.obj_cols = []
+
+            self._del_cols(cols)
+
+            deleted = set(cols)
+            self.names = [name for i, name in enumerate(self.names) if i not in deleted]
+            self.last_basis_matrix = None
+            self._model_modified()
+
+    def set_constraints_csr(self, csr_mat, offset=None):
+        '''set the constrains row by row to be equal to the passed-in csr matrix (each row is replaced)
+
+        offset is an optional tuple (num_rows, num_cols) which tells you the top-left offset for the assignment
+        '''
+
+        Timers.tic('set_constraints_csr')
+
+        assert isinstance(csr_mat, csr_matrix)
+        assert csr_mat.dtype == float
+
+        if offset is None:
+            offset = (0, 0)
+
+        self._check_bounds(csr_mat, offset)
+        self._set_constraints_csr(csr_mat, offset)
+
+        Timers.toc('set_constraints_csr')
+
+    def set_constraints_csc(self, csc_mat, offset=None):
+        '''set the constrains column by column to be equal to the passed-in csc matrix (each column is replaced)
+
+        offset is an optional tuple (num_rows, num_cols) which tells you the top-left offset for the assignment
+        '''
+
+        Timers.tic('set_constraints_csc')
+
+        assert isinstance(csc_mat, csc_matrix)
+        assert csc_mat.dtype == float
+
+        if offset is None:
+            offset = (0, 0)
+
+        self._check_bounds(csc_mat, offset)
+        self._set_constraints_csc(csc_mat, offset)
+
+        Timers.toc('set_constraints_csc')
+
+    def _check_bounds(self, mat, offset):
+        'check that a matrix being assigned at the given offset is in bounds, raising RuntimeError otherwise'
+
+        assert len(offset) == 2, "offset should be a 2-tuple (num_rows, num_cols)"
+
+        lp_rows = self.get_num_rows()
+        lp_cols = self.get_num_cols()
+
+        if offset[0] < 0 or offset[1] < 0 or \
+                            offset[0] + mat.shape[0] > lp_rows or offset[1] + mat.shape[1] > lp_cols:
+            raise RuntimeError("Error: set constraints matrix out of bounds (offset was " + \
+                "{}, matrix size was {}), but lp size was ({}, {})".format(
+                    offset, mat.shape, lp_rows, lp_cols))
+
+    def get_dense_constraints(self, x, y, w, h):
+        'get a subconstraint matrix from the lpi as a dense matrix'
+
+        lp_rows = self.get_num_rows()
+        lp_cols = self.get_num_cols()
+
+        assert x >= 0 and w >= 0 and x + w <= lp_cols, f"invalid x range requested, lpcols = {lp_cols}"
+        assert y >= 0 and h >= 0 and y + h <= lp_rows, "invalid y range requested"
+
+        return self._get_dense_constraints(x, y, w, h)
+
+    ##### methods below are implemented by each backend #####
+
+    def clone(self):
+        'create a copy of this lp instance'
+
+        raise NotImplementedError("clone() not implemented by lp backend")
+
+    def add_cols(self, names):
+        'add a certain number of free columns to the LP'
+
+        raise NotImplementedError("add_cols() not implemented by lp backend")
+
+
+    def del_rows(self, rows):
+        '''delete rows from the LP
+
+        rows is a list of row indices; the rows after each deleted row get shifted up
+        '''
+
+        raise NotImplementedError("del_rows() not implemented by lp backend")
+
+    def set_basis_matrix_bulk(self, basis_mat):
+        '''set the basis matrix block of the lp from the passed-in 2-d np.array'''
+
+        raise NotImplementedError("set_basis_matrix_bulk() not implemented by lp backend")
+
+    def reset_lp(self):
+        'reset all the column and row statuses of the LP'
+
+        raise NotImplementedError("reset_lp() not implemented by lp backend")
+
+    def set_constraint_rhs(self, row_index, rhs):
+        '''change an existing constraint's right hand side'''
+
+        raise NotImplementedError("set_constraint_rhs() not implemented by lp backend")
+
+    def get_types(self):
+        '''get the constraint types. These are swiglpk.GLP_FX, swiglpk.GLP_UP, or swiglpk.GLP_LO'''
+
+        raise NotImplementedError("get_types() not implemented by lp backend")
+
+    def get_rhs(self, row_indices=None):
+        '''get the rhs vector of the constraints
+
+        row_indices - a list of requested indices (None=all)
+
+        this returns an np.array of rhs values for the requested indices
+        '''
+
+        raise NotImplementedError("get_rhs() not implemented by lp backend")
+
+    def get_full_constraints(self):
+        '''get the LP matrix as a csr_matrix
+        '''
+
+        raise NotImplementedError("get_full_constraints() not implemented by lp backend")
+
+    def get_row(self, row):
+        '''get a row of the LP matrix as a csr_matrix
+        '''
+
+        raise NotImplementedError("get_row() not implemented by lp backend")
+
+    def get_objective(self):
+        'get the objective coefficients of all the columns, as an np.array'
+
+        raise NotImplementedError("get_objective() not implemented by lp backend")
+
+    def get_num_rows(self):
+        'get the number of rows in the lp'
+
+        raise NotImplementedError("get_num_rows() not implemented by lp backend")
+
+    def get_iterations(self):
+        'get the number of LP iterations performed so far'
+
+        raise NotImplementedError("get_iterations() not implemented by lp backend")
+
+    def _add_rows_with_types(self, types, rhs_vec):
+        'add rows with the given types and (non-empty, 1-d np.array) right-hand sides, see add_rows_with_types()'
+
+        raise NotImplementedError("_add_rows_with_types() not implemented by lp backend")
+
+    def _del_cols(self, cols):
+        'delete columns from the LP, see del_cols() (which also updates the column names)'
+
+        raise NotImplementedError("_del_cols() not implemented by lp backend")
+
+    def _set_constraints_csr(self, csr_mat, offset):
+        'set the constraints row by row from the csr matrix at the (bounds-checked) offset, see set_constraints_csr()'
+
+        raise NotImplementedError("_set_constraints_csr() not implemented by lp backend")
+
+    def _set_constraints_csc(self, csc_mat, offset):
+        'set the constraints col by col from the csc matrix at the (bounds-checked) offset, see set_constraints_csc()'
+
+        raise NotImplementedError("_set_constraints_csc() not implemented by lp backend")
+
+    def _get_dense_constraints(self, x, y, w, h):
+        'get a (bounds-checked) subconstraint matrix as a dense matrix, see get_dense_constraints()'
+
+        raise NotImplementedError("_get_dense_constraints() not implemented by lp backend")
+
+    def _set_objective(self, cols, vals):
+        '''set the objective coefficients of the passed-in columns (list of indices), and set all other objective
+        coefficients (the ones in self.obj_cols) to zero'''
+
+        raise NotImplementedError("_set_objective() not implemented by lp backend")
+
+    def _minimize(self, columns, print_on):
+        '''solve the lp with the current objective
+
+        returns None if UNSAT, otherwise the optimization result with the requested columns (None = all columns)
+        '''
+
+        raise NotImplementedError("_minimize() not implemented by lp backend")
+
+    def _reset_basis(self):
+        'reset the starting basis, called before retrying a failed lp'
+
+        raise NotImplementedError("_reset_basis() not implemented by lp backend")
+
+    def _get_objective_value(self):
+        'get the objective value of the last optimal solution found by _minimize()'
+
+        raise NotImplementedError("_get_objective_value() not implemented by lp backend")
+
+    def _get_basis_statuses(self):
+        '''get the basis status of each row and column (backend-specific codes), used for pickling
+
+        returns a pair of np.int8 arrays (row statuses, column statuses), or None if there is no basis
+        '''
+
+        raise NotImplementedError("_get_basis_statuses() not implemented by lp backend")
+
+    def _set_basis_statuses(self, row_statuses, col_statuses):
+        'set the starting basis from statuses returned by _get_basis_statuses(), used when unpickling'
+
+        raise NotImplementedError("_set_basis_statuses() not implemented by lp backend")
+
+    def _get_stat_labels(self):
+        'get the basis status labels for __str__, a pair of lists of strings: (row labels, column labels)'
+
+        return ["?"] * self.get_num_rows(), ["?"] * self.get_num_cols()
+
+class UnsatError(RuntimeError):
+    'raised if an LP is infeasible'
@@ -0,0 +1,584 @@
+'''
+HiGHS linear programming backend
+
+The model is stored in numpy arrays (one array of column indices and values for each row), and solved with the HiGHS
+simplex method. If highspy is installed, a persistent solver object is kept for each lp, so that re-solves after
+changing the objective or constraints are warm started from the previous basis. Otherwise, each solve is done from
+scratch with scipy.optimize.linprog(method='highs').
+'''
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.optimize import linprog
+import swiglpk as glpk
+
+from hylaa.lpinstance import LpInstance
+from hylaa.timerutil import Timers
+
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+HIGHS_SOLVE_TIMER = Timers.register('highs_solve')
+
+class HighsLpInstance(LpInstance): # pylint: disable=too-many-public-methods
+    'Linear programming wrapper using HiGHS (through highspy if installed, otherwise scipy)'
+
+    use_highspy = highspy is not None # set to False to always solve with scipy.optimize.linprog
+
+    def __init__(self):
+        'initialize the lp instance'
+
+        super().__init__()
+
+        self.row_indices = [] # for each row, np.array of column indices
+        self.row_data = [] # for each row, np.array of values
+        self.types = [] # for each row, swiglpk.GLP_FX, swiglpk.GLP_UP or swiglpk.GLP_LO
+        self.rhs = [] # for each row, the right-hand side value
+        self.objective = np.zeros(0) # objective coefficient of each column
+
+        self.bm_indices = None # for each basis matrix row, np.array of column indices, assigned on set_reach_vars
+
+        self.model_changed = True # has the model changed since it was last passed to the solver?
+        self.scipy_model = None # cached (A_ub, b_ub, A_eq, b_eq) for scipy solves, None if the model changed
+        self.highs = None # persistent highspy.Highs object, created on the first highspy solve
+        self.basis = None # last optimal highspy.HighsBasis, used to warm start after the model is rebuilt
+        self.iterations = 0
+        self.solution = None # optimal assignment to all the columns found by the last _minimize() call
+
+        self.freeze_attrs()
+
+    def clone(self):
+        'create a copy of this lp instance'
+
+        rv = HighsLpInstance()
+
+        # row arrays are replaced rather than modified, so they can be shared
+        rv.row_indices = self.row_indices.copy()
+        rv.row_data = self.row_data.copy()
+        rv.types = self.types.copy()
+        rv.rhs = self.rhs.copy()
+        rv.objective = self.objective.copy()
+        rv.names = self.names.copy()
+
+        rv.set_reach_vars(self.dims, self.basis_mat_pos, self.cur_vars_offset, self.input_effects_offsets)
+        rv.obj_cols = self.obj_cols.copy()
+        rv.last_basis_matrix = self.last_basis_matrix
+        rv.basis = self._get_basis()
+
+        return rv
+
+    def _create_bm_indices(self):
+        'create a cached version of the column indices of each basis matrix row'
+
+        # basis matrix rows are as follows:
+        # 0 BM 0 -I 0 (I? <- if inputs exist)
+
+        self.bm_indices = []
+        bm_cols = np.arange(self.basis_mat_pos[1], self.basis_mat_pos[1] + self.dims)
+
+        for row in range(self.dims):
+            extra_cols = [self.cur_vars_offset + row]
+
+            if self.input_effects_offsets is not None:
+                extra_cols.append(self.input_effects_offsets[1] + row)
+
+            self.bm_indices.append(np.concatenate([bm_cols, extra_cols]).astype(np.int32))
+
+    def set_basis_matrix_bulk(self, basis_mat):
+        '''set the basis matrix block of the lp from the passed-in 2-d np.array
+
+        only the lp rows whose coefficients changed since the last assignment are updated
+        '''
+
+        Timers.tic('set_basis_matrix_bulk')
+
+        changed_rows = self._changed_basis_matrix_rows(basis_mat)
+        extra_data = [-1.0] if self.input_effects_offsets is None else [-1.0, 1.0]
+
+        for row in changed_rows:
+            row = int(row)
+            data = np.concatenate([basis_mat[row], extra_data])
+            nonzero = data != 0
+
+            self.row_indices[self.basis_mat_pos[0] + row] = self.bm_indices[row][nonzero]
+            self.row_data[self.basis_mat_pos[0] + row] = data[nonzero]
+
+        if len(changed_rows) > 0:
+            self._model_modified()
+
+        Timers.toc('set_basis_matrix_bulk')
+
+    def _model_modified(self):
+        'called whenever the constraints or bounds are modified'
+
+        super()._model_modified()
+
+        self.model_changed = True
+        self.scipy_model = None
+
+    def add_cols(self, names):
+        'add a certain number of free columns to the LP'
+
+        assert isinstance(names, list)
+
+        if names:
+            self.names += names
+            self.objective = np.concatenate([self.objective, np.zeros(len(names))])
+            self._model_modified()
+
+    def _add_rows_with_types(self, types, rhs_vec):
+        'add rows with the given types and (non-empty, 1-d np.array) right-hand sides, see add_rows_with_types()'
+
+        for ty in types:
+            assert ty in [glpk.GLP_FX, glpk.GLP_UP, glpk.GLP_LO], f"unsupported constraint type: {ty}"
+
+        num = rhs_vec.shape[0]
+
+        self.row_indices += [np.zeros(0, dtype=np.int32)] * num
+        self.row_data += [np.zeros(0)] * num
+        self.types += list(types)
+        self.rhs += [float(rhs) for rhs in rhs_vec]
+
+    def del_rows(self, rows):
+        '''delete rows from the LP
+
+        rows is a list of row indices; the rows after each deleted row get shifted up
+        '''
+
+        if rows:
+            deleted = set(int(row) for row in rows)
+            keep = [row for row in range(self.get_num_rows()) if row not in deleted]
+
+            self.row_indices = [self.row_indices[row] for row in keep]
+            self.row_data = [self.row_data[row] for row in keep]
+            self.types = [self.types[row] for row in keep]
+            self.rhs = [self.rhs[row] for row in keep]
+
+            self.last_basis_matrix = None
+            self._model_modified()
+
+    def _del_cols(self, cols):
+        'delete columns from the LP, see del_cols() (which also updates the column names)'
+
+        is_kept = np.ones(self.get_num_cols(), dtype=bool)
+        is_kept[np.array(cols, dtype=int)] = False
+        new_index = np.cumsum(is_kept) - 1
+
+        for row, indices in enumerate(self.row_indices):
+            mask = is_kept[indices]
+
+            self.row_indices[row] = new_index[indices[mask]].astype(np.int32)
+            self.row_data[row] = self.row_data[row][mask]
+
+        self.objective = self.objective[is_kept]
+
+    def _set_constraints_csr(self, csr_mat, offset):
+        'set the constraints row by row from the csr matrix at the (bounds-checked) offset, see set_constraints_csr()'
+
+        indptr, indices, data = csr_mat.indptr, csr_mat.indices, csr_mat.data
+
+        for row in range(csr_mat.shape[0]):
+            start, end = indptr[row], indptr[row + 1]
+
+            self.row_indices[offset[0] + row] = (offset[1] + indices[start:end]).astype(np.int32)
+            self.row_data[offset[0] + row] = np.array(data[start:end], dtype=float)
+
+        self._rows_modified(np.arange(offset[0], offset[0] + csr_mat.shape[0]))
+        self._model_modified()
+
+    def _set_constraints_csc(self, csc_mat, offset):
+        'set the constraints col by col from the csc matrix at the (bounds-checked) offset, see set_constraints_csc()'
+
+        first_col, end_col = offset[1], offset[1] + csc_mat.shape[1]
+
+        # remove the existing entries in the replaced columns
+        if self.row_indices:
+            all_indices = np.concatenate(self.row_indices)
+            row_of_entry = np.repeat(np.arange(len(self.row_indices)), [len(i) for i in self.row_indices])
+            in_range = (all_indices >= first_col) & (all_indices < end_col)
+
+            for row in np.unique(row_of_entry[in_range]):
+                mask = (self.row_indices[row] < first_col) | (self.row_indices[row] >= end_col)
+
+                self.row_indices[row] = self.row_indices[row][mask]
+                self.row_data[row] = self.row_data[row][mask]
+
+        # add the new entries
+        csr_mat = csc_mat.tocsr()
+        csr_mat.eliminate_zeros()
+        indptr, indices, data = csr_mat.indptr, csr_mat.indices, csr_mat.data
+
+        for row in range(csr_mat.shape[0]):
+            start, end = indptr[row], indptr[row + 1]
+
+            if start < end:
+                lp_row = offset[0] + row
+                new_indices = (first_col + indices[start:end]).astype(np.int32)
+
+                self.row_indices[lp_row] = np.concatenate([self.row_indices[lp_row], new_indices])
+                self.row_data[lp_row] = np.concatenate([self.row_data[lp_row], data[start:end]])
+
+        self._rows_modified(offset[0] + csc_mat.indices)
+        self._model_modified()
+
+    def reset_lp(self):
+        'reset all the column and row statuses of the LP'
+
+        self.basis = None
+
+        if self.highs is not None:
+            self.highs.clearSolver()
+
+    def _reset_basis(self):
+        'reset the starting basis, called before retrying a failed lp'
+
+        self.reset_lp()
+
+    def set_constraint_rhs(self, row_index, rhs):
+        '''change an existing constraint's right hand side'''
+
+        rows = self.get_num_rows()
+
+        assert 0 <= row_index < rows, "Invalid row ({}) in set_constraint_rhs() (lp has {})".format(
+            row_index, rows)
+
+        self.rhs[row_index] = float(rhs)
+
+        if self.highs is not None and not self.model_changed:
+            lower, upper = self._row_bounds(self.types[row_index], self.rhs[row_index])
+            status = self.highs.changeRowBounds(row_index, lower, upper)
+            assert status != highspy.HighsStatus.kError, "highs changeRowBounds() failed"
+            self.scipy_model = None
+        else:
+            self._model_modified()
+
+    @staticmethod
+    def _row_bounds(row_type, rhs):
+        'get the (lower, upper) bounds of a row with the given type and right-hand side'
+
+        if row_type == glpk.GLP_UP:
+            rv = -np.inf, rhs
+        elif row_type == glpk.GLP_LO:
+            rv = rhs, np.inf
+        else:
+            rv = rhs, rhs
+
+        return rv
+
+    def _set_objective(self, cols, vals):
+        '''set the objective coefficients of the passed-in columns (list of indices), and set all other objective
+        coefficients (the ones in self.obj_cols) to zero'''
+
+        changed_cols = self.obj_cols + cols
+
+        self.objective[self.obj_cols] = 0
+        self.objective[cols] = vals
+
+        if self.highs is not None and not self.model_changed and changed_cols:
+            changed_cols = np.unique(np.array(changed_cols, dtype=np.int32)) # highs rejects duplicate indices
+            status = self.highs.changeColsCost(len(changed_cols), changed_cols, self.objective[changed_cols])
+            assert status != highspy.HighsStatus.kError, "highs changeColsCost() failed"
+
+    def _minimize(self, columns, print_on):
+        '''solve the lp with the current objective
+
+        returns None if UNSAT, otherwise the optimization result with the requested columns (None = all columns)
+        '''
+
+        HIGHS_SOLVE_TIMER.tic()
+
+        if HighsLpInstance.use_highspy:
+            solution = self._solve_highspy(print_on)
+        else:
+            solution = self._solve_scipy(print_on)
+
+        HIGHS_SOLVE_TIMER.toc()
+
+        self.solution = solution
+
+        return None if solution is None else self._get_solution_columns(solution, columns)
+
+    def _get_objective_value(self):
+        'get the objective value of the last optimal solution found by _minimize()'
+
+        return float(np.dot(self.objective, self.solution))
+
+    def _solve_highspy(self, print_on):
+        '''solve the lp using a persistent highspy.Highs object, warm started from the last basis
+
+        returns None if UNSAT, otherwise the optimal assignment to all the columns
+        '''
+
+        if self.highs is None:
+            # default options: presolve is only used for cold starts, which helps a lot on the first solve
+            self.highs = highspy.Highs()
+            self.model_changed = True
+
+        highs = self.highs
+        highs.setOptionValue('output_flag', print_on)
+
+        if self.model_changed:
+            self._pass_highspy_model()
+
+        highs.run()
+        status = highs.getModelStatus()
+        self.iterations += highs.getInfo().simplex_iteration_count
+
+        expected = [highspy.HighsModelStatus.kOptimal, highspy.HighsModelStatus.kInfeasible,
+                    highspy.HighsModelStatus.kUnbounded, highspy.HighsModelStatus.kUnboundedOrInfeasible,
+                    highspy.HighsModelStatus.kModelEmpty]
+
+        if status not in expected:
+            # this can happen when warm starting from a basis that's numerically bad after the constraints changed
+            LpInstance.print_normal("Note: highs returned status '{}', resetting and retrying".format(
+                highs.modelStatusToString(status)))
+
+            self.reset_lp()
+            self._pass_highspy_model()
+            highs.run()
+            status = highs.getModelStatus()
+
+        if status == highspy.HighsModelStatus.kUnboundedOrInfeasible:
+            # dual simplex couldn't tell which; check feasibility with a zero objective
+            self._pass_highspy_model(objective=np.zeros(self.get_num_cols()))
+            highs.run()
+
+            if highs.getModelStatus() == highspy.HighsModelStatus.kInfeasible:
+                status = highspy.HighsModelStatus.kInfeasible
+            else:
+                status = highspy.HighsModelStatus.kUnbounded
+
+            self.model_changed = True
+
+        rv = None
+
+        if status == highspy.HighsModelStatus.kOptimal:
+            rv = np.array(highs.getSolution().col_value, dtype=float)
+        elif status == highspy.HighsModelStatus.kModelEmpty:
+            lower, upper = self._get_row_bounds()
+
+            if np.all(lower <= 0) and np.all(upper >= 0):
+                rv = np.zeros(self.get_num_cols())
+        elif status == highspy.HighsModelStatus.kUnbounded:
+            raise RuntimeError("LP had unbounded solution in minimize()")
+        elif status != highspy.HighsModelStatus.kInfeasible:
+            raise RuntimeError("LP status after solving in minimize() was '{}'".format(
+                highs.modelStatusToString(status)))
+
+        return rv
+
+    def _get_basis(self):
+        'get the last optimal basis (a highspy.HighsBasis), or None'
+
+        rv = self.basis
+
+        if self.highs is not None:
+            basis = self.highs.getBasis()
+
+            if basis.valid:
+                self.basis = rv = basis
+
+        return rv
+
+    def _get_basis_statuses(self):
+        '''get the basis status of each row and column (backend-specific codes), used for pickling
+
+        returns a pair of np.int8 arrays (row statuses, column statuses), or None if there is no basis
+        '''
+
+        rv = None
+        basis = self._get_basis()
+
+        if basis is not None:
+            rv = (np.array([int(stat) for stat in basis.row_status], dtype=np.int8),
+                  np.array([int(stat) for stat in basis.col_status], dtype=np.int8))
+
+        return rv
+
+    def _set_basis_statuses(self, row_statuses, col_statuses):
+        'set the starting basis from statuses returned by _get_basis_statuses(), used when unpickling'
+
+        if highspy is not None:
+            basis = highspy.HighsBasis()
+            basis.row_status = [highspy.HighsBasisStatus(stat) for stat in row_statuses.tolist()]
+            basis.col_status = [highspy.HighsBasisStatus(stat) for stat in col_statuses.tolist()]
+            basis.valid = True
+
+            self.basis = basis
+
+    def _pass_highspy_model(self, objective=None):
+        'pass the current model to the highspy solver, setting the last basis (warm start) if the sizes match'
+
+        basis = self._get_basis()
+
+        num_rows = self.get_num_rows()
+        num_cols = self.get_num_cols()
+        mat = self._get_csr()
+        lower, upper = self._get_row_bounds()
+
+        lp = highspy.HighsLp()
+        lp.num_col_ = num_cols
+        lp.num_row_ = num_rows
+        lp.col_cost_ = self.objective if objective is None else objective
+        lp.col_lower_ = np.full(num_cols, -np.inf)
+        lp.col_upper_ = np.full(num_cols, np.inf)
+        lp.row_lower_ = lower
+        lp.row_upper_ = upper
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.num_col_ = num_cols
+        lp.a_matrix_.num_row_ = num_rows
+        lp.a_matrix_.start_ = mat.indptr
+        lp.a_matrix_.index_ = mat.indices
+        lp.a_matrix_.value_ = mat.data
+
+        status = self.highs.passModel(lp)
+        assert status != highspy.HighsStatus.kError, "highs passModel() failed"
+        self.model_changed = False
+
+        if basis is not None and len(basis.col_status) == num_cols and len(basis.row_status) == num_rows:
+            self.highs.setBasis(basis)
+
+    def _get_row_bounds(self):
+        'get the lower and upper bounds of every row, as a pair of np.arrays'
+
+        lower = np.empty(self.get_num_rows())
+        upper = np.empty(self.get_num_rows())
+
+        for row, (row_type, rhs) in enumerate(zip(self.types, self.rhs)):
+            lower[row], upper[row] = self._row_bounds(row_type, rhs)
+
+        return lower, upper
+
+    def _solve_scipy(self, print_on):
+        '''solve the lp using scipy.optimize.linprog(method='highs')
+
+        returns None if UNSAT, otherwise the optimal assignment to all the columns
+        '''
+
+        if self.scipy_model is None:
+            mat = self._get_csr()
+            types = np.array(self.types, dtype=int)
+            rhs = np.array(self.rhs, dtype=float)
+
+            # linprog uses A_ub x <= b_ub, so >= rows are negated
+            ub_rows = np.nonzero(types != glpk.GLP_FX)[0]
+            eq_rows = np.nonzero(types == glpk.GLP_FX)[0]
+            signs = np.where(types[ub_rows] == glpk.GLP_LO, -1.0, 1.0)
+
+            a_ub = csr_matrix(mat[ub_rows].multiply(signs[:, np.newaxis])) if ub_rows.size > 0 else None
+            a_eq = mat[eq_rows] if eq_rows.size > 0 else None
+
+            self.scipy_model = (a_ub, rhs[ub_rows] * signs, a_eq, rhs[eq_rows])
+
+        a_ub, b_ub, a_eq, b_eq = self.scipy_model
+        rv = None
+
+        if self.get_num_cols() == 0:
+            rv = np.zeros(0)
+
+            if np.any(b_ub < 0) or np.any(b_eq != 0):
+                rv = None
+        else:
+            res = linprog(self.objective, A_ub=a_ub, b_ub=b_ub if a_ub is not None else None, A_eq=a_eq,
+                          b_eq=b_eq if a_eq is not None else None, bounds=(None, None), method='highs',
+                          options={'disp': print_on})
+
+            self.iterations += res.nit
+
+            if res.status == 0:
+                rv = res.x
+            elif res.status == 3:
+                raise RuntimeError("LP had unbounded solution in minimize()")
+            elif res.status != 2: # 2 is infeasible
+                raise RuntimeError("LP status after solving in minimize() was '{}': {}".format(res.message,
+                                                                                               res.status))
+
+        return rv
+
+    def get_types(self):
+        '''get the constraint types. These are swiglpk.GLP_FX, swiglpk.GLP_UP, or swiglpk.GLP_LO'''
+
+        return self.types.copy()
+
+    def get_rhs(self, row_indices=None):
+        '''get the rhs vector of the constraints
+
+        row_indices - a list of requested indices (None=all)
+
+        this returns an np.array of rhs values for the requested indices
+        '''
+
+        if row_indices is None:
+            row_indices = range(self.get_num_rows())
+
+        return np.array([self.rhs[row] for row in row_indices], dtype=float)
+
+    def _get_dense_constraints(self, x, y, w, h):
+        'get a (bounds-checked) subconstraint matrix as a dense matrix, see get_dense_constraints()'
+
+        rv = np.zeros((h, w))
+
+        for row in range(y, y + h):
+            indices = self.row_indices[row]
+            mask = (indices >= x) & (indices < x + w)
+
+            rv[row - y, indices[mask] - x] = self.row_data[row][mask]
+
+        return rv
+
+    def get_full_constraints(self):
+        '''get the LP matrix as a csr_matrix
+        '''
+
+        csr_mat = self._get_csr()
+        csr_mat.check_format()
+
+        return csr_mat
+
+    def _get_csr(self):
+        'assemble the LP matrix as a csr_matrix from the rows (without checking the format)'
+
+        lp_rows = self.get_num_rows()
+        lp_cols = self.get_num_cols()
+
+        indptr = np.zeros((lp_rows + 1,), dtype=np.int32)
+        indptr[1:] = np.cumsum([len(indices) for indices in self.row_indices])
+
+        if lp_rows > 0:
+            inds = np.concatenate(self.row_indices).astype(np.int32)
+            data = np.concatenate(self.row_data).astype(float)
+        else:
+            inds = np.zeros((0,), dtype=np.int32)
+            data = np.zeros((0,), dtype=float)
+
+        return csr_matrix((data, inds, indptr), shape=(lp_rows, lp_cols), dtype=float)
+
+    def get_row(self, row):
+        '''get a row of the LP matrix as a csr_matrix
+        '''
+
+        assert 0 <= row < self.get_num_rows()
+
+        indices = self.row_indices[row]
+        csr_mat = csr_matrix((self.row_data[row].copy(), indices.copy(), [0, len(indices)]),
+                             shape=(1, self.get_num_cols()), dtype=float)
+        csr_mat.check_format()
+
+        return csr_mat
+
+    def get_objective(self):
+        'get the objective coefficients of all the columns, as an np.array'
+
+        return self.objective.copy()
+
+    def get_num_rows(self):
+        'get the number of rows in the lp'
+
+        return len(self.types)
+
+    def get_iterations(self):
+        'get the number of LP iterations performed so far'
+
+        return self.iterations
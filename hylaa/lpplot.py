@@ -23,19 +23,19 @@ def pt_to_plot_xy(pt, xdim=0, ydim=1, cur_time=0.0):
 
     if isinstance(xdim, int):
         x = pt[xdim]
-    elif xdim:
+    elif xdim is not None:
         assert isinstance(xdim, np.ndarray)
         x = np.dot(pt, xdim)
 
-    if ydim and isinstance(ydim, int):
+    if isinstance(ydim, int):
         y = pt[ydim]
-    elif ydim:
+    elif ydim is not None:
         assert isinstance(ydim, np.ndarray)
         y = np.dot(pt, ydim)
 
     return x, y
 
-def get_verts(lpi, xdim=0, ydim=1, plot_vecs=None, cur_time=0.0):
+def get_verts(lpi, xdim=0, ydim=1, plot_vecs=None, cur_time=0.0, star=None):
     '''get the vertices defining (an underapproximation) of the outside of the given linear constraints
     These will be usable for plotting, so that rv[0] == rv[-1]. A single point may be returned if the constraints
     are (close to) a single point.
@@ -46,9 +46,21 @@ def get_verts(lpi, xdim=0, ydim=1, plot_vecs=None, cur_time=0.0):
 
     plot_vecs is an ordered list of vectors defining all the 2-d directions to optimize in... if None will 
     construct and use 256 equally spaced vectors 
+
+    star is an optional (exact) stateset.Star for the lpi, used to compute support points in closed form
     '''
 
     tol = 1e-9
+
+    def maximize_points(dir_mat):
+        'get the current-time points maximizing each row of the passed-in direction matrix'
+
+        if star is not None:
+            rv = np.array([star.minimize_point(-1 * direction) for direction in dir_mat], dtype=float)
+        else:
+            rv = lpi.support_batch(dir_mat, columns=[lpi.cur_vars_offset + n for n in range(lpi.dims)])[1]
+
+        return rv
     
     if plot_vecs is None:
         plot_vecs = make_plot_vecs()
@@ -73,13 +85,9 @@ def get_verts(lpi, xdim=0, ydim=1, plot_vecs=None, cur_time=0.0):
         if isinstance(ydim, int):
             ydim = np.array([1.0 if dim == ydim else 0.0 for dim in range(lpi.dims)], dtype=float)
 
-        lpi.set_minimize_direction(ydim)
-        res = lpi.minimize(columns=[lpi.cur_vars_offset + n for n in range(lpi.dims)])
-        ymin = np.dot(ydim, res)
-
-        lpi.set_minimize_direction(-1 * ydim)
-        res = lpi.minimize(columns=[lpi.cur_vars_offset + n for n in range(lpi.dims)])
-        ymax = np.dot(ydim, res)
+        res = maximize_points(np.array([-1 * ydim, ydim], dtype=float))
+        ymin = np.dot(ydim, res[0])
+        ymax = np.dot(ydim, res[1])
 
         verts = [[cur_time[0], ymin]]
 
@@ -97,13 +105,9 @@ def get_verts(lpi, xdim=0, ydim=1, plot_vecs=None, cur_time=0.0):
         if isinstance(xdim, int):
             xdim = np.array([1.0 if dim == xdim else 0.0 for dim in range(lpi.dims)], dtype=float)
 
-        lpi.set_minimize_direction(xdim)
-        res = lpi.minimize(columns=[lpi.cur_vars_offset + n for n in range(lpi.dims)])
-        xmin = np.dot(xdim, res)
-
-        lpi.set_minimize_direction(-1 * xdim)
-        res = lpi.minimize(columns=[lpi.cur_vars_offset + n for n in range(lpi.dims)])
-        xmax = np.dot(xdim, res)
+        res = maximize_points(np.array([-1 * xdim, xdim], dtype=float))
+        xmin = np.dot(xdim, res[0])
+        xmax = np.dot(xdim, res[1])
 
         verts = [[xmin, cur_time[0]]]
 
@@ -117,38 +121,29 @@ def get_verts(lpi, xdim=0, ydim=1, plot_vecs=None, cur_time=0.0):
             verts.append([xmin, cur_time[1]])
     else:
         # 2-d plot
-        bboxw = bbox_widths(lpi, xdim, ydim)
+        bboxw = bbox_widths(lpi, xdim, ydim, star)
 
         # use bbox to determine acceptable accuracy... might be better to somehow do this
         epsilon = min(bboxw) / 1000.0
         dim_list = [xdim, ydim]
 
-        def supp_point_nd(vec):
-            'return a supporting point for the given direction (maximize)'
-
-            assert len(vec) == len(dim_list)
+        def supp_points_nd(vecs):
+            'return the supporting points for each row of vecs (maximize)'
 
-            d = np.zeros((lpi.dims,), dtype=float)
-            # negative here because we want to MAXIMIZE not minimize
+            assert vecs.shape[1] == len(dim_list)
 
-            for i, dim_index in enumerate(dim_list):
-                d[dim_index] = -vec[i]
+            dir_mat = np.zeros((len(vecs), lpi.dims), dtype=float)
+            dir_mat[:, dim_list] = vecs
 
-            lpi.set_minimize_direction(d)
+            return maximize_points(dir_mat)[:, dim_list]
 
-            res = lpi.minimize(columns=[lpi.cur_vars_offset + n for n in range(lpi.dims)])
-
-            rv = []
-
-            for dim in dim_list:
-                rv.append(res[dim])
-
-            rv = np.array(rv, dtype=float)
+        def supp_point_nd(vec):
+            'return a supporting point for the given direction (maximize)'
 
-            return rv
+            return supp_points_nd(np.array([vec], dtype=float))[0]
 
         Timers.tic('kamenev.get_verts')
-        verts = kamenev.get_verts(len(dim_list), supp_point_nd, epsilon=epsilon)
+        verts = kamenev.get_verts(len(dim_list), supp_point_nd, epsilon=epsilon, supp_points_func=supp_points_nd)
         Timers.toc('kamenev.get_verts')
 
         if len(verts) > 2:
@@ -166,22 +161,24 @@ def get_verts(lpi, xdim=0, ydim=1, plot_vecs=None, cur_time=0.0):
 
     return verts
 
-def bbox_widths(lpi, xdim, ydim):
-    'find and return the bounding box widths of the lp for the passed-in dimensions'
+def bbox_widths(lpi, xdim, ydim, star=None):
+    '''find and return the bounding box widths of the lp for the passed-in dimensions
 
-    rv = []
-    dims = lpi.dims
+    star is an optional (exact) stateset.Star for the lpi, used instead of solving LPs
+    '''
 
-    for dim in [xdim, ydim]:
-        col = lpi.cur_vars_offset + dim
-        min_dir = [1 if i == dim else 0 for i in range(dims)]
-        max_dir = [-1 if i == dim else 0 for i in range(dims)]
-        
-        min_val = lpi.minimize(direction_vec=min_dir, columns=[col])[0]
-        max_val = lpi.minimize(direction_vec=max_dir, columns=[col])[0]
+    # maximize -x, +x, -y, +y
+    dir_mat = np.zeros((4, lpi.dims), dtype=float)
+    dir_mat[[0, 1, 2, 3], [xdim, xdim, ydim, ydim]] = [-1, 1, -1, 1]
 
-        dx = max_val - min_val
+    if star is not None:
+        maxes = -1 * star.minimize_vals(-1 * dir_mat)
+    else:
+        maxes = lpi.support_batch(dir_mat, columns=[])[0]
+
+    rv = []
 
+    for dx in maxes[0::2] + maxes[1::2]:
         if dx < 1e-5:
             dx = 1e-5
 
@@ -0,0 +1,95 @@
+'''
+Process pool for solving independent lps in parallel, used for template aggregation
+
+The lps are sent to the worker processes using LpInstance.get_model(), and each worker rebuilds them using the same
+lp backend.
+'''
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from hylaa.lpinstance import LpInstance
+from hylaa.timerutil import Timers
+
+class LpPool():
+    '''
+    A static class holding the shared pool of worker processes, which is created on first use and kept until
+    shutdown() (or program exit)
+    '''
+
+    MIN_CHUNK_SIZE = 8 # minimum number of directions in each job, so the lp construction cost is amortized
+
+    executor = None # concurrent.futures.ProcessPoolExecutor
+    num_workers = 0
+
+    def __init__(self):
+        raise RuntimeError('LpPool is a static class; should not be instantiated')
+
+    @staticmethod
+    def get_executor(num_workers):
+        'get the process pool with the passed-in number of workers, (re)creating it if needed'
+
+        if LpPool.executor is None or LpPool.num_workers != num_workers:
+            LpPool.shutdown()
+
+            LpPool.executor = ProcessPoolExecutor(max_workers=num_workers)
+            LpPool.num_workers = num_workers
+
+        return LpPool.executor
+
+    @staticmethod
+    def shutdown():
+        'stop the worker processes, if they were started'
+
+        if LpPool.executor is not None:
+            LpPool.executor.shutdown()
+
+            LpPool.executor = None
+            LpPool.num_workers = 0
+
+def _support_batch_job(lpi_class, model, direction_matrix):
+    'run in a worker process: rebuild the lp from its model and return the optima of support_batch()'
+
+    lpi = LpInstance.from_model(model, lpi_class)
+
+    return lpi.support_batch(direction_matrix, columns=[])[0]
+
+def support_batch_parallel(lpi_list, direction_matrix, num_workers):
+    '''compute the optima of lpi.support_batch(direction_matrix) for every lpi in lpi_list, using a pool of num_workers
+    processes
+
+    The directions are split into contiguous chunks with an even number of rows (so a direction and its negation in
+    adjacent rows stay together), which are solved in parallel.
+
+    returns a 2-d np.array, where row i contains the optima of lpi_list[i]
+    '''
+
+    Timers.tic('support_batch_parallel')
+
+    num_dirs = direction_matrix.shape[0]
+    rv = np.zeros((len(lpi_list), num_dirs))
+
+    # split each lp's directions so that every worker gets a job, while keeping the chunks large enough
+    num_chunks = max(1, min(math.ceil(num_workers / len(lpi_list)), num_dirs // LpPool.MIN_CHUNK_SIZE))
+    bounds = 2 * np.linspace(0, num_dirs // 2, num_chunks + 1).astype(int)
+    bounds[-1] = num_dirs
+
+    executor = LpPool.get_executor(num_workers)
+    jobs = [] # list of (lpi index, start row, end row, future)
+
+    for i, lpi in enumerate(lpi_list):
+        model = lpi.get_model()
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if start < end:
+                future = executor.submit(_support_batch_job, type(lpi), model, direction_matrix[start:end])
+                jobs.append((i, start, end, future))
+
+    for i, start, end, future in jobs:
+        rv[i, start:end] = future.result()
+
+    Timers.toc('support_batch_parallel')
+
+    return rv
@@ -0,0 +1,250 @@
+'''
+Template polytopes of lp instances, which are used to compact the lp after discrete transitions (see
+HylaaSettings.compact_transition_lps)
+'''
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from hylaa.timerutil import Timers
+from hylaa import lputil
+
+def from_template(direction_matrix, rhs_list, mode):
+    '''make a new lp instance from a template polytope
+
+    direction_matrix has a direction on each row, and rhs_list has two values for each direction d: the maximum of d
+    and the maximum of -d (in this order)
+    '''
+
+    inds = []
+    data = []
+    indptrs = [0]
+    rhs = []
+
+    for d, direction in enumerate(direction_matrix):
+        dir_inds = [i for i, x in enumerate(direction) if x != 0]
+        dir_data = [x for x in direction if x != 0]
+        dir_neg_data = [-x for x in dir_data]
+
+        inds += dir_inds
+        data += dir_data
+        indptrs.append(len(data))
+        rhs.append(rhs_list[2*d])
+
+        inds += dir_inds
+        data += dir_neg_data
+        indptrs.append(len(data))
+        rhs.append(rhs_list[2*d + 1])
+
+    rows = len(indptrs) - 1
+    cols = direction_matrix.shape[1]
+    csr_mat = csr_matrix((data, inds, indptrs), dtype=float, shape=(rows, cols))
+    csr_mat.check_format()
+    
+    rv = lputil.from_constraints(csr_mat, rhs, mode)
+
+    return rv
+
+def project_to_template(lpi, template_dirs, mode, exact_max_dims=0, tol=1e-9):
+    '''
+    make a new lp over only the current-time variables of the passed-in lpi, dropping all the other variables (for
+    example, those of the predecessor modes after a discrete transition). The new lp has the variables of the passed-in
+    mode, and its set is the template polytope of the box directions and the rows of template_dirs, which
+    overapproximates the projection of the lpi onto the current-time variables. If the set is flat in directions
+    other than the axes (its affine hull is lower-dimensional, like a line segment in a 3-d space), the orthonormal
+    directions along and orthogonal to the affine hull are added to the template as well.
+
+    If the affine hull has at most exact_max_dims dimensions, each corner of the bounding box along the affine hull
+    directions (or the non-flat axes) is checked to be in the lpi. If so, the projection is exactly this box, and
+    the new lp is made with lputil.from_box() or lputil.from_zonotope().
+
+    returns a pair (new_lpi, is_exact), or None if lp solving fails (numerical issues)
+    '''
+
+    Timers.tic('project_to_template')
+
+    dims = lpi.dims
+    rv = None
+
+    # rows with a single nonzero are (scaled) box directions
+    other_dirs = np.array(template_dirs, dtype=float)
+    other_dirs = other_dirs[np.count_nonzero(other_dirs, axis=1) > 1]
+
+    direction_matrix = np.concatenate([np.identity(dims), other_dirs])
+    res = _support_both_directions(lpi, direction_matrix)
+
+    if res is not None:
+        # optima are [max d_0, max -d_0, max d_1, ...], so the box is (-optima[1::2], optima[0::2]) in the first dims
+        nonflat = [d for d in range(dims) if res[0][2*d] + res[0][2*d + 1] > tol]
+        hull_dirs, flat_dirs = _get_affine_hull(res[1], tol)
+        hull_rows, flat_rows = nonflat, [] # rows of direction_matrix along and orthogonal to the affine hull
+
+        # the optimal points may not span the affine hull, so the lps in the flat directions are solved, and the
+        # affine hull is recomputed with the new points until its dimension stops increasing
+        while res is not None and len(hull_dirs) < len(nonflat):
+            direction_matrix, res, flat_rows = _add_template_directions(lpi, direction_matrix, res, flat_dirs)
+
+            if res is not None:
+                new_hull_dirs, new_flat_dirs = _get_affine_hull(res[1], tol)
+
+                if len(new_hull_dirs) > len(hull_dirs):
+                    hull_dirs, flat_dirs = new_hull_dirs, new_flat_dirs
+                    flat_rows = [] # either the loop continues, or the affine hull is along the non-flat axes
+                else:
+                    # bounds along the affine hull, for the exactness check
+                    direction_matrix, res, hull_rows = _add_template_directions(lpi, direction_matrix, res, hull_dirs)
+                    break
+
+    if res is not None:
+        # the bounds are at least the values of all the optimal points, so that the template contains them even if
+        # some lps were only solved to within the solver's tolerances (otherwise the template could be infeasible)
+        values = np.dot(res[1], direction_matrix.T)
+        optima = np.empty(2 * len(direction_matrix))
+        optima[0::2] = np.maximum(res[0][0::2], values.max(axis=0))
+        optima[1::2] = np.maximum(res[0][1::2], -values.min(axis=0))
+
+        hull_mat = direction_matrix[hull_rows]
+        hull_lower = -optima[[2*row + 1 for row in hull_rows]]
+        hull_upper = optima[[2*row for row in hull_rows]]
+
+        # the set is exactly flat (within tol) in the flat directions, and the box corners are in the lpi
+        is_exact = len(hull_rows) <= exact_max_dims and \
+            all(optima[2*row] + optima[2*row + 1] <= tol for row in flat_rows) and \
+            _box_corners_in_lpi(lpi, hull_mat, hull_lower, hull_upper, tol)
+
+        if is_exact and hull_rows is nonflat:
+            lower = -optima[1:2*dims:2]
+            new_lpi = lputil.from_box(np.array([lower, np.maximum(lower, optima[0:2*dims:2])]).T, mode)
+        elif is_exact:
+            # center + generators * alpha, where the center has the coordinates of an lp point along the flat dirs
+            point = res[1][0]
+            center = point + np.dot((hull_lower + hull_upper) / 2 - np.dot(hull_mat, point), hull_mat)
+            generators = [row * radius for row, radius in zip(hull_mat, (hull_upper - hull_lower) / 2)]
+
+            new_lpi = lputil.from_zonotope(center, generators, mode)
+        else:
+            new_lpi = from_template(direction_matrix, optima, mode)
+
+        rv = (new_lpi, is_exact)
+
+    Timers.toc('project_to_template')
+
+    return rv
+
+def _add_template_directions(lpi, direction_matrix, res, new_dirs):
+    '''solve the lps for new template directions in project_to_template(), where res is the (optima, points) pair
+    for direction_matrix from _support_both_directions()
+
+    returns the triple (direction_matrix, res, new_rows) with the new directions appended, where res is None if lp
+    solving fails, and new_rows are the rows of the new directions in direction_matrix
+    '''
+
+    new_res = _support_both_directions(lpi, new_dirs)
+    new_rows = list(range(len(direction_matrix), len(direction_matrix) + len(new_dirs)))
+
+    if new_res is not None:
+        new_res = (np.concatenate([res[0], new_res[0]]), np.concatenate([res[1], new_res[1]]))
+
+    return np.concatenate([direction_matrix, new_dirs]), new_res, new_rows
+
+def _support_both_directions(lpi, direction_matrix):
+    '''maximize each direction (row of direction_matrix) and its negation over the current-time variables
+
+    returns (optima, points) as in LpInstance.support_batch(), where optima is [max d_0, max -d_0, max d_1, ...] and
+    points are the current-time variables at each optimum, or None if lp solving fails
+    '''
+
+    both_dirs = np.empty((2 * len(direction_matrix), lpi.dims), dtype=float)
+    both_dirs[0::2] = direction_matrix
+    both_dirs[1::2] = -direction_matrix
+
+    return lpi.support_batch(both_dirs, columns=list(range(lpi.cur_vars_offset, lpi.cur_vars_offset + lpi.dims)),
+                             fail_on_unsat=False)
+
+def _get_affine_hull(points, tol):
+    '''get orthonormal directions along and orthogonal to the affine hull of the passed-in points (rows)
+
+    returns a pair of 2-d np.arrays (hull_dirs, flat_dirs), with a direction on each row
+    '''
+
+    _, sing_vals, vt = np.linalg.svd(points - points[0])
+
+    # singular values below this are considered to be lp tolerances
+    rank = np.count_nonzero(sing_vals > max(tol, 1e-7 * sing_vals[0])) if len(sing_vals) > 0 else 0
+
+    return vt[:rank], vt[rank:]
+
+def get_reset_template_directions(lpi, reset_csr=None):
+    '''
+    get template directions for the set after a reset (x' = Rx) from the constraints of the passed-in lpi, before the
+    reset variables are added. The constraints only on the initial-time variables (like the initial set and the
+    invariants) and only on the current-time variables (like the guard) are mapped through the basis matrix and R
+    to directions in the successor mode's variables. If the lpi has no other constraints (for example, no input
+    effects), the template polytope with these directions is exactly the set after the reset.
+
+    returns a 2-d np.array with a (normalized) direction on each row, which has zero rows if R is not invertible
+    '''
+
+    dims = lpi.dims
+    reset_mat = np.identity(dims) if reset_csr is None else reset_csr.toarray()
+    rv = np.zeros((0, reset_mat.shape[0]), dtype=float)
+
+    # x' = R * BM * x_init
+    init_to_new = np.dot(reset_mat, lputil.get_basis_matrix(lpi))
+
+    if reset_mat.shape[0] == dims and np.linalg.cond(init_to_new) < 1e12:
+        csr = lpi.get_full_constraints()
+        nonempty = np.diff(csr.indptr) > 0
+        starts = csr.indptr[:-1][nonempty]
+
+        if len(starts) > 0:
+            min_cols = np.minimum.reduceat(csr.indices, starts)
+            max_cols = np.maximum.reduceat(csr.indices, starts)
+            rows = np.flatnonzero(nonempty)
+            dir_list = []
+
+            for first_col, mat in [(lpi.basis_mat_pos[1], init_to_new), (lpi.cur_vars_offset, reset_mat)]:
+                block_rows = rows[(min_cols >= first_col) & (max_cols < first_col + dims)]
+                block = csr[block_rows][:, first_col:first_col + dims].toarray()
+
+                # a * x = (a * mat^-1) * x'
+                dir_list.append(np.linalg.solve(mat.T, block.T).T)
+
+            dirs = np.concatenate(dir_list)
+            norms = np.linalg.norm(dirs, axis=1)
+            dirs = dirs[norms > 1e-9] / norms[norms > 1e-9, np.newaxis]
+
+            rv = np.unique(np.round(dirs, 12) + 0.0, axis=0)
+
+    return rv
+
+def _box_corners_in_lpi(lpi, direction_matrix, lower, upper, tol):
+    '''check if all the corners of a box in the passed-in directions of the current-time variables (the rows of
+    direction_matrix, between the values in lower and upper) are in the passed-in lpi. This is used by
+    project_to_template().
+    '''
+
+    lpi = lpi.clone()
+    num = len(direction_matrix)
+    rv = True
+
+    if num > 0:
+        # constraints d * x <= val + tol and -d * x <= -val + tol for each direction d
+        mat = np.empty((2 * num, lpi.dims), dtype=float)
+        mat[0::2] = direction_matrix
+        mat[1::2] = -direction_matrix
+
+        first_row = lpi.get_num_rows()
+        lputil.add_curtime_constraints(lpi, csr_matrix(mat), np.zeros(2 * num))
+
+        for corner in range(2**num):
+            for i in range(num):
+                val = upper[i] if corner & (1 << i) else lower[i]
+                lpi.set_constraint_rhs(first_row + 2*i, val + tol)
+                lpi.set_constraint_rhs(first_row + 2*i + 1, -val + tol)
+
+            if not lpi.is_feasible():
+                rv = False
+                break
+
+    return rv
@@ -7,14 +7,22 @@ the first N rows are the current-time constraints (equality constraints equal to
 '''
 
 import math
+from collections import namedtuple
 
 import numpy as np
 import scipy as sp
 from scipy.sparse import csr_matrix, csc_matrix, hstack
 
 import swiglpk as glpk
-from hylaa.lpinstance import LpInstance, SwigArray
+from hylaa.lpinstance import LpInstance
+from hylaa.lppool import support_batch_parallel
 from hylaa.timerutil import Timers
+from hylaa import kamenev
+
+# the initial set of an lp made with from_box() or from_zonotope(): x = center + generators * alpha, alpha in [-1, 1]
+# generators is either a matrix (one column per generator), or a 1-d array of radii for boxes (a diagonal matrix)
+# num_rows and num_cols are the size of the lp when it was created
+InitZonotope = namedtuple('InitZonotope', ['center', 'generators', 'num_rows', 'num_cols'])
 
 def from_box(box_list, mode):
     'make a new lp instance from a passed-in box'
@@ -46,7 +54,14 @@ def from_box(box_list, mode):
     csr = csr_matrix((data, inds, indptr), shape=(2*dims, dims), dtype=float)
     csr.check_format()
 
-    return from_constraints(csr, rhs, mode)
+    rv = from_constraints(csr, rhs, mode)
+
+    box = np.array(box_list, dtype=float)
+    center = (box[:, 0] + box[:, 1]) / 2
+    radii = (box[:, 1] - box[:, 0]) / 2
+    rv.init_zonotope = InitZonotope(center, radii, rv.get_num_rows(), rv.get_num_cols())
+
+    return rv
 
 def from_zonotope(center, generator_list, mode):
     'make a new lp instance from the passed in zonotope'
@@ -91,7 +106,12 @@ def from_zonotope(center, generator_list, mode):
         mat.append([-1 * x for x in row])
         rhs.append(0)
 
-    return from_constraints(mat, rhs, mode, dims=cdims)
+    rv = from_constraints(mat, rhs, mode, dims=cdims)
+
+    generators = np.array(generator_list, dtype=float).reshape((len(generator_list), cdims)).transpose()
+    rv.init_zonotope = InitZonotope(np.array(center, dtype=float), generators, rv.get_num_rows(), rv.get_num_cols())
+
+    return rv
 
 def from_constraints(csr, rhs, mode, types=None, names=None, dims=None):
     '''make a new lp instance from a passed-in set of constraints and rhs
@@ -193,27 +213,8 @@ def set_basis_matrix(lpi, basis_mat):
     assert basis_mat.shape[0] == lpi.dims, \
       f"basis matrix wrong shape, expected ({lpi.dims}, {lpi.dims}), got {basis_mat.shape}"
 
-    # this is done using the optimized swigvec interface in lpinstance
-
-    data_vec_list = [] # list of swig doubleArray objects for each row
-
-    # 0 BM 0 -I 0 (I? <- if inputs exist)
-    for row in range(lpi.dims):
-        data = []
-
-        data += basis_mat[row].tolist()
-        
-        data.append(-1.0)
-
-        if lpi.input_effects_offsets is not None:
-            data.append(1.0)
-
-        data_vec_list.append(SwigArray.as_double_array(data))
-
-    entries_per_row = basis_mat.shape[0] + 1 + (1 if lpi.input_effects_offsets else 0)
-    count_list = [entries_per_row] * basis_mat.shape[0]
-        
-    lpi.set_constraints_swigvec_rows(data_vec_list, lpi.bm_indices, count_list, lpi.basis_mat_pos[0])
+    # this is done using the optimized persistent-buffer interface in lpinstance
+    lpi.set_basis_matrix_bulk(basis_mat)
 
 def add_input_effects_matrix(lpi, input_mat, mode, lgg_beta=None):
     'add an input effects matrix to this lpi'
@@ -300,7 +301,203 @@ def add_input_effects_matrix(lpi, input_mat, mode, lgg_beta=None):
 
     lpi.set_constraints_csc(csc, offset=(0, pre_cols))
 
-def check_intersection(lpi, lc, tol=1e-13):
+def get_input_box(u_constraints_csc, u_constraints_rhs, overapprox=False):
+    '''get the bounds of the input variables, if the input constraints are a box (every constraint is on a single
+    variable, and every variable is bounded from above and below)
+
+    if overapprox is True and the constraints are not a box, the bounding box of the input set is computed with lps
+
+    returns a pair of 1-d np.arrays (lower, upper), or None if the constraints are not a box
+    '''
+
+    num_inputs = u_constraints_csc.shape[1]
+    lower = np.full(num_inputs, -np.inf)
+    upper = np.full(num_inputs, np.inf)
+
+    csr = csr_matrix(u_constraints_csc)
+    rv = None
+
+    if np.all(np.diff(csr.indptr) == 1):
+        for val, col, rhs in zip(csr.data, csr.indices, u_constraints_rhs):
+            if val > 0:
+                upper[col] = min(upper[col], rhs / val)
+            else:
+                lower[col] = max(lower[col], rhs / val)
+
+        if np.all(np.isfinite(lower)) and np.all(np.isfinite(upper)):
+            rv = (lower, upper)
+
+    if rv is None and overapprox:
+        lpi = _make_input_lpi(csr, u_constraints_rhs)
+
+        for i in range(num_inputs):
+            lpi.set_minimize_direction(csr_matrix(([1.0], [i], [0, 1]), shape=(1, num_inputs)), is_csr=True, offset=0)
+            lower[i] = lpi.minimize(columns=[i])[0]
+
+            lpi.set_minimize_direction(csr_matrix(([-1.0], [i], [0, 1]), shape=(1, num_inputs)), is_csr=True, offset=0)
+            upper[i] = lpi.minimize(columns=[i])[0]
+
+        rv = (lower, upper)
+
+    return rv
+
+def get_input_verts(u_constraints_csc, u_constraints_rhs):
+    'get the vertices of the input set (u_constraints * u <= rhs) as the rows of a 2-d np.array'
+
+    csr = csr_matrix(u_constraints_csc)
+    num_inputs = csr.shape[1]
+    lpi = _make_input_lpi(csr, u_constraints_rhs)
+
+    def supp_point_func(vec):
+        'return a supporting point for the given direction (maximize)'
+
+        lpi.set_minimize_direction(csr_matrix(-1 * np.array([vec], dtype=float)), is_csr=True, offset=0)
+
+        return lpi.minimize(columns=range(num_inputs))
+
+    return np.array(kamenev.get_verts(num_inputs, supp_point_func), dtype=float)
+
+def _make_input_lpi(u_constraints_csr, u_constraints_rhs):
+    'make an lp over only the input variables, with the input constraints'
+
+    num_inputs = u_constraints_csr.shape[1]
+
+    lpi = LpInstance()
+    lpi.add_cols([f"u{i}" for i in range(num_inputs)])
+    lpi.add_rows_less_equal(u_constraints_rhs)
+    lpi.set_constraints_csr(u_constraints_csr)
+
+    return lpi
+
+def compress_input_effects(lpi, template_dirs, mode, template_bounds=None):
+    '''
+    replace the input effects variables of the current mode (all the columns to the right of the total input
+    effects variables) by fresh variables constrained to a template overapproximation of the total input effects.
+    This keeps the lp size bounded when there are many steps with inputs.
+
+    template_dirs is a 2-d np.array with a (state-space) direction on each row. For each direction, the lower and
+    upper bounds of the total input effects are computed by solving lps, and become constraints on the new
+    variables. Afterwards, the input effects matrix of the new variables is the identity. If template_bounds, a pair
+    of 1-d np.arrays (lower, upper), is passed in, these are used instead of solving lps.
+
+    Constraints that mix the removed variables and other variables (invariant constraints) are relaxed, by
+    replacing the removed part with its minimum over the lp. Constraints only on removed variables are deleted.
+
+    returns a list mapping each old row index to its new row index (or None if the row was deleted)
+    '''
+
+    Timers.tic('compress_input_effects')
+
+    assert lpi.input_effects_offsets is not None
+    assert template_dirs.shape[1] == lpi.dims
+
+    dims = lpi.dims
+    ie_row, ie_col = lpi.input_effects_offsets
+    first_col = ie_col + dims
+    num_rows = lpi.get_num_rows()
+    num_cols = lpi.get_num_cols()
+
+    Timers.record_stat('compress lp rows (before)', num_rows)
+    Timers.record_stat('compress lp cols (before)', num_cols)
+
+    # template bounds of the total input effects
+    num_dirs = template_dirs.shape[0]
+
+    if template_bounds is not None:
+        lower_bounds, upper_bounds = template_bounds
+        assert len(lower_bounds) == len(upper_bounds) == num_dirs
+    else:
+        both_dirs = np.zeros((2 * num_dirs, template_dirs.shape[1]), dtype=float)
+        both_dirs[0::2] = template_dirs
+        both_dirs[1::2] = -template_dirs
+
+        optima = lpi.support_batch(both_dirs, columns=[], offset=ie_col)[0]
+        upper_bounds = optima[0::2]
+        lower_bounds = -optima[1::2]
+
+    # find rows to delete and rows to relax
+    csr = lpi.get_full_constraints()
+    types = lpi.get_types()
+    del_rows = []
+    relaxed_rows = [] # list of (row_index, csr_row_without_removed_part, new_rhs)
+
+    for row in range(ie_row + dims, num_rows):
+        start, end = csr.indptr[row], csr.indptr[row + 1]
+        inds = csr.indices[start:end]
+        is_removed = inds >= first_col
+
+        if not np.any(is_removed):
+            continue
+
+        if np.all(is_removed) or types[row] != glpk.GLP_UP:
+            del_rows.append(row)
+            continue
+
+        vals = csr.data[start:end]
+        removed_part = csr_matrix((vals[is_removed], inds[is_removed], [0, np.count_nonzero(is_removed)]), \
+                                  shape=(1, num_cols))
+
+        min_val = lpi.minimize_value(removed_part, is_csr=True, offset=0)
+
+        keep = np.logical_not(is_removed)
+        kept_part = csr_matrix((vals[keep], inds[keep], [0, np.count_nonzero(keep)]), shape=(1, num_cols))
+        relaxed_rows.append((row, kept_part, lpi.get_rhs([row])[0] - min_val))
+
+    # modify the lp
+    for row, kept_part, rhs in relaxed_rows:
+        lpi.set_constraints_csr(kept_part, offset=(row, 0))
+        lpi.set_constraint_rhs(row, rhs)
+
+    lpi.del_rows(del_rows)
+    lpi.del_cols(list(range(first_col, num_cols)))
+
+    lpi.add_cols([f"m{mode.mode_id}_w{i}" for i in range(dims)])
+    template_row = lpi.get_num_rows()
+    lpi.add_rows_less_equal(np.concatenate([upper_bounds, -lower_bounds]))
+
+    # new variables: identity in the total input effects rows, template directions in the template rows
+    data = []
+    inds = []
+    indptr = [0]
+
+    for col in range(dims):
+        data.append(1)
+        inds.append(ie_row + col)
+
+        for i, direction in enumerate(template_dirs):
+            if direction[col] != 0:
+                data += [direction[col], -direction[col]]
+                inds += [template_row + i, template_row + num_dirs + i]
+
+        indptr.append(len(data))
+
+    csc = csc_matrix((data, inds, indptr), shape=(lpi.get_num_rows(), dims), dtype=float)
+    csc.check_format()
+    lpi.set_constraints_csc(csc, offset=(0, first_col))
+
+    # the old basis is no longer valid after deleting rows and columns
+    lpi.reset_lp()
+
+    Timers.record_stat('compress lp rows (after)', lpi.get_num_rows())
+    Timers.record_stat('compress lp cols (after)', lpi.get_num_cols())
+
+    # map from old rows to new rows
+    row_map = []
+    deleted = set(del_rows)
+    num_deleted = 0
+
+    for row in range(num_rows):
+        if row in deleted:
+            row_map.append(None)
+            num_deleted += 1
+        else:
+            row_map.append(row - num_deleted)
+
+    Timers.toc('compress_input_effects')
+
+    return row_map
+
+def check_intersection(lpi, lc, tol=1e-13, star=None):
     '''check if there is an intersection between the LP constriants and the LinearConstraint object lc
 
     This solves an LP optimizing in the given direction... without adding the constraint to the LP
@@ -308,36 +505,43 @@ def check_intersection(lpi, lc, tol=1e-13):
     This returns True/False if an intersection is possible
 
     it also can return None if the lp is infeasible
+
+    if star (a stateset.Star for the lpi) is passed in, its closed-form support function is used instead of the
+    LP when it is exact; otherwise it is used to quickly rule out intersections before solving the LP
     '''
 
     Timers.tic("check_intersection")
 
-    lpi.set_minimize_direction(lc.csr, is_csr=True)
-
-    columns = lc.csr.indices[0:lc.csr.indptr[1]]
-    lp_columns = [lpi.cur_vars_offset + c for c in columns]
+    star_min = None if star is None else star.minimize_vals(lc.csr)[0]
 
-    lp_res = lpi.minimize(columns=lp_columns, fail_on_unsat=False)
-
-    if lp_res is None:
-        # sometimes, changing optimization direction makes lp infeasible (up to numerical accuracy)
-        # this happens in gearbox with small time steps. In this case, return no intersection
-        rv = None
+    if star_min is not None and (star_min + tol > lc.rhs or star.is_exact()):
+        # the star's minimum is a lower bound on the lp minimum (equal if the star is exact)
+        rv = star_min + tol <= lc.rhs
     else:
-        dot_res = np.dot(lc.csr.data, lp_res)
-        rv = dot_res + tol <= lc.rhs
+        min_val = lpi.minimize_value(lc.csr, is_csr=True, fail_on_unsat=False)
+
+        if min_val is None:
+            # sometimes, changing optimization direction makes lp infeasible (up to numerical accuracy)
+            # this happens in gearbox with small time steps. In this case, return no intersection
+            rv = None
+        else:
+            rv = min_val + tol <= lc.rhs
 
     Timers.toc("check_intersection")
 
     return rv
 
-def add_init_constraint(lpi, vec, rhs, basis_matrix=None, input_effects_list=None, row_index=None):
+def add_init_constraint(lpi, vec, rhs, basis_matrix=None, input_effects_list=None, row_index=None,
+                        input_effects_projection=None):
     '''
     add a constraint to the lpi
 
     this replaces an existing row or adds a new one (if row_index is None), with constraints assigned to the 
     initial-time variables
 
+    input_effects_projection is an optional 1-d np.array with the projection of every input effects matrix onto vec,
+    np.dot(vec, np.hstack(input_effects_list)), which is used instead of input_effects_list if it is not None
+
     this returns the row of the newly-created constraint
     '''
 
@@ -347,56 +551,43 @@ def add_init_constraint(lpi, vec, rhs, basis_matrix=None, input_effects_list=Non
     assert isinstance(basis_matrix, np.ndarray)
 
     # we need to project the basis matrix using the passed in direction vector
-    preshape = vec.shape
-
     dims = basis_matrix.shape[0]
-    vec.shape = (1, dims) # vec is now the projection matrix for this direction
+    vec = np.reshape(vec, (dims,))
     bm_projection = np.dot(vec, basis_matrix)
 
-    rows = lpi.get_num_rows()
-    cols = lpi.get_num_cols()
+    # each of the input effects matrices
+    # (after compress_input_effects, the first matrix has a different number of columns)
+    if input_effects_projection is None:
+        if input_effects_list:
+            input_effects_projection = np.dot(vec, np.hstack(input_effects_list))
+        else:
+            input_effects_projection = np.zeros(0)
 
     if row_index is None:
-        row_index = rows
+        row_index = lpi.get_num_rows()
         lpi.add_rows_less_equal([rhs])
     else:
         # overwrite the old rhs
         lpi.set_constraint_rhs(row_index, rhs)
 
-    indptr = [0]
-
-    # basis matrix
-    inds = [lpi.basis_mat_pos[1] + i for i in range(dims)]
-    data = [val for val in bm_projection[0]]
-
-    # each of the input effects matrices
-    if input_effects_list:
-        num_inputs = input_effects_list[0].shape[1]
-        offset = lpi.input_effects_offsets[1] + dims
-
-        for ie_mat in input_effects_list:
-            ie_projection = np.dot(vec, ie_mat)[0]
+    # basis matrix on the initial variables, followed by the input effects variables
+    num_ie = len(input_effects_projection)
+    inds = np.arange(lpi.basis_mat_pos[1], lpi.basis_mat_pos[1] + dims)
 
-            assert len(ie_projection) == num_inputs, \
-              f"len(ie_projection) ({len(ie_projection)}) != num_inputs ({num_inputs})"
+    if num_ie > 0:
+        ie_offset = lpi.input_effects_offsets[1] + dims
+        inds = np.concatenate([inds, np.arange(ie_offset, ie_offset + num_ie)])
 
-            inds += [offset + i for i in range(num_inputs)]
-            data += [val for val in ie_projection]
-            offset += num_inputs
+    data = np.concatenate([bm_projection, input_effects_projection])
 
-    indptr.append(len(data))
-
-    # restore vector shape to what it was when passed in
-    vec.shape = preshape
-
-    csr_row_mat = csr_matrix((data, inds, indptr), dtype=float, shape=(1, cols))
-    csr_row_mat.check_format()
+    csr_row_mat = csr_matrix((data, inds, [0, len(data)]), dtype=float, shape=(1, lpi.get_num_cols()))
 
     lpi.set_constraints_csr(csr_row_mat, offset=(row_index, 0))
 
     return row_index
 
-def try_replace_init_constraint(lpi, old_row_index, direction, rhs, basis_mat=None, input_effects_list=None):
+def try_replace_init_constraint(lpi, old_row_index, direction, rhs, basis_mat=None, input_effects_list=None,
+                                input_effects_projection=None):
     '''replace the constraint in row_index by a new constraint, if the new constraint is stronger, otherwise
     create new constriant
 
@@ -421,18 +612,15 @@ def try_replace_init_constraint(lpi, old_row_index, direction, rhs, basis_mat=No
         
     # replace the old constraint with the new one
     new_row_index = add_init_constraint(lpi, direction, rhs, basis_matrix=basis_mat, \
-                                        input_effects_list=input_effects_list, row_index=old_row_index)
+                                        input_effects_list=input_effects_list, row_index=old_row_index, \
+                                        input_effects_projection=input_effects_projection)
 
     # optimize in the direction of the old constraint, to see if the old constraint is still feasible
-    lpi.set_minimize_direction(-1 * old_constraint, is_csr=True, offset=0)
-
-    res = lpi.minimize(fail_on_unsat=False)
+    min_val = lpi.minimize_value(-1 * old_constraint, is_csr=True, offset=0, fail_on_unsat=False)
 
     # if the lp was unsat, this means adding the new constraint makes it infeasible, so it's safe to replace
-    if res is not None:
-        res_dot = (old_constraint * np.array(res, dtype=float))
-
-        res_dot = res_dot[0]
+    if min_val is not None:
+        res_dot = -min_val
 
         # if res_dot < old_rhs, then the old constraint is no longer needed, otherwise, re-add it
         if res_dot >= old_rhs:
@@ -560,13 +748,15 @@ def _aggregate_chull_recursive(lpi_list, mode):
 
     return lpi
 
-def aggregate(lpi_list, direction_matrix, mode):
+def aggregate(lpi_list, direction_matrix, mode, num_workers=1):
     '''
     return a new lpi consisting of an aggregation of the passed-in lpi list
 
     This creates a template polytope using the passed-in directions (passed in as rows of direction_matrix).
 
     use lputil.make_direction_matrix() to create the direction_matrix with arnoldi directions
+
+    if num_workers > 1, the lps are solved in parallel using a pool of worker processes (see lppool)
     '''
 
     assert isinstance(direction_matrix, np.ndarray)
@@ -574,53 +764,25 @@ def aggregate(lpi_list, direction_matrix, mode):
     assert direction_matrix.shape[0] >= direction_matrix.shape[1], "expected num directions >= dims"
     assert len(lpi_list) > 1, "expected more than one lpi to perform an aggregation"
 
-    inds = []
-    data = []
-    indptrs = [0]
-    rhs = []
-
-    # for each direction, minimize and maximize it within the list
-    for direction in direction_matrix:
-        if abs(np.linalg.norm(direction)) < 1e-6:
-            continue
-        #assert abs(np.linalg.norm(direction) - 1) < 1e-9, "expected normalized directions, got {}".format(direction)
-
-        dir_inds = [i for i, x in enumerate(direction) if x != 0]
-        dir_data = [x for x in direction if x != 0]
-        dir_neg_data = [-x for x in dir_data]
-
-        max_val = -np.inf
-        min_val = np.inf
-       
-        for lpi in lpi_list:
-            assert direction_matrix.shape[1] == lpi.dims
-
-            dir_columns = [i + lpi.cur_vars_offset for i in dir_inds]
+    # skip zero directions
+    direction_matrix = direction_matrix[np.linalg.norm(direction_matrix, axis=1) >= 1e-6]
 
-            result = lpi.minimize(direction_vec=-direction, columns=dir_columns)
-            max_val = max(max_val, np.dot(result, dir_data))
-            
-            result = lpi.minimize(direction_vec=direction, columns=dir_columns)
-            min_val = min(min_val, np.dot(result, dir_data))
+    # for each direction, maximize it and its negation within the list
+    num_dirs = len(direction_matrix)
+    both_dirs = np.zeros((2 * num_dirs, direction_matrix.shape[1]), dtype=float)
+    both_dirs[0::2] = direction_matrix
+    both_dirs[1::2] = -direction_matrix
 
-        inds += dir_inds
-        data += dir_data
-        indptrs.append(len(data))
-        rhs.append(max_val)
-
-        inds += dir_inds
-        data += dir_neg_data
-        indptrs.append(len(data))
-        rhs.append(-min_val)
+    for lpi in lpi_list:
+        assert direction_matrix.shape[1] == lpi.dims
 
-    rows = len(indptrs) - 1
-    cols = direction_matrix.shape[1]
-    csr_mat = csr_matrix((data, inds, indptrs), dtype=float, shape=(rows, cols))
-    csr_mat.check_format()
-    
-    rv = from_constraints(csr_mat, rhs, mode)
+    if num_workers > 1:
+        all_rhs = support_batch_parallel(lpi_list, both_dirs, num_workers).max(axis=0)
+    else:
+        all_rhs = np.max([lpi.support_batch(both_dirs, columns=[])[0] for lpi in lpi_list], axis=0)
 
-    return rv
+    # the template polytope, with constraints d * x <= max d and -d * x <= max -d for each direction d
+    return from_constraints(csr_matrix(both_dirs), all_rhs, mode)
 
 def get_basis_matrix(lpi):
     'get the basis matrix from the lpi'
@@ -840,6 +1002,35 @@ def add_curtime_constraints(lpi, csr, rhs_vec):
 
     lpi.set_constraints_csr(csr, offset=(prerows, lpi.cur_vars_offset))
 
+def _box_directions(dims):
+    '''get the 2*dims directions for computing a box overapproximation with LpInstance.support_batch()
+
+    the rows are -e_0, e_0, -e_1, e_1, ... so that optima[0::2] are the negated lower bounds and optima[1::2] are the
+    upper bounds
+    '''
+
+    rv = np.zeros((2 * dims, dims), dtype=float)
+    rv[0::2] = -np.identity(dims)
+    rv[1::2] = np.identity(dims)
+
+    return rv
+
+def get_init_box(lpi):
+    '''get the box overapproximation of the initial-time variables of the passed-in lpi
+
+    returns a pair of 1-d np.arrays (lower, upper), or None if lp solving fails (numerical issues)
+    '''
+
+    Timers.tic('get_init_box')
+
+    res = lpi.support_batch(_box_directions(lpi.dims), columns=[], offset=lpi.basis_mat_pos[1], fail_on_unsat=False)
+
+    rv = None if res is None else (-res[0][0::2], res[0][1::2])
+
+    Timers.toc('get_init_box')
+
+    return rv
+
 def get_box_center(lpi):
     '''get the center of the box overapproximation of the passed-in lpi
 
@@ -848,25 +1039,9 @@ def get_box_center(lpi):
 
     Timers.tic('get_box_center')
 
-    dims = lpi.dims
-    pt = []
-
-    for dim in range(dims):
-        col = lpi.cur_vars_offset + dim
-        min_dir = [1 if i == dim else 0 for i in range(dims)]
-        max_dir = [-1 if i == dim else 0 for i in range(dims)]
-        
-        min_val = lpi.minimize(direction_vec=min_dir, columns=[col], fail_on_unsat=False)
-        max_val = lpi.minimize(direction_vec=max_dir, columns=[col], fail_on_unsat=False)
-
-        if min_val is None or max_val is None:
-            pt = None
-            break
-        
-        min_val = min_val[0]
-        max_val = max_val[0]
+    res = lpi.support_batch(_box_directions(lpi.dims), columns=[], fail_on_unsat=False)
 
-        pt.append((min_val + max_val) / 2.0)
+    pt = None if res is None else list((res[0][1::2] - res[0][0::2]) / 2.0)
 
     Timers.toc('get_box_center')
 
@@ -1064,17 +1239,9 @@ def compute_radius_inf(lpi):
     This uses 2*n LPs and then returns the maximum over all components
     '''
 
-    max_val = -float('inf')
-
-    for n in range(lpi.dims):
-        for posneg in [1.0, -1.0]:
-            dir_vec = [posneg if n == d else 0.0 for d in range(lpi.dims)]
-
-            lp_result = lpi.minimize(dir_vec)
-
-            max_val = max(max_val, abs(lp_result[n]))
+    optima = lpi.support_batch(_box_directions(lpi.dims), columns=[])[0]
 
-    return max_val
+    return np.max(np.abs(optima))
 
 def minkowski_sum(lpi_list, mode):
     '''
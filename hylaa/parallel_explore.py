@@ -0,0 +1,197 @@
+'''
+Parallel exploration of independent waiting-list states
+
+The states popped off the waiting list are explored (their continuous posts are computed) in forked worker processes,
+each with its own copy of the hybrid automaton and so its own TimeElapser objects. The ops added to each aggdag node,
+the transition successors, the error results, the printed messages and the plot data are then merged back into the
+main process in the order the states were popped, so the result does not depend on how the workers are scheduled.
+
+A new process pool is forked for each batch, so that the workers see the current computation state (the aggdag, the
+result and any per-mode state such as the lgg approximation model) without pickling it. The cost is that basis
+matrices computed in a worker are not kept: each batch recomputes them, starting from the TimeElapser caches of the
+main process at the time of the fork. This pays off when each state's continuous post is long compared to the fork
+and the recomputed matrix exponentials, and is wasted for batches of short continuous posts.
+'''
+
+from collections import namedtuple
+import multiprocessing
+import sys
+
+from termcolor import cprint
+
+from hylaa.deaggregation import OpTransition
+from hylaa.lpinstance import LpInstance
+from hylaa.stateset import StateSet
+from hylaa.timerutil import Timers
+from hylaa.util import Freezable
+
+# a transition successor found in a worker process, which is recreated in the main process by _make_op_transition()
+TransitionRecord = namedtuple('TransitionRecord', ['step', 'transition_index', 'premode_center', 'lpi_class',
+                                                   'lpi_model', 'init_zonotope', 'steps_since_start', 'is_concrete',
+                                                   'init_box'])
+
+# the (core, batch) being explored, assigned in explore_batch() before forking the worker processes. This must be a
+# module global so the forked workers inherit it instead of receiving a pickled copy of the core and aggdag.
+BATCH_DATA = None
+
+class ExploreResult(Freezable): # pylint: disable=too-few-public-methods
+    'the result of exploring one aggdag node in a worker process'
+
+    def __init__(self):
+        # new ops of the node, OpInvIntersect / OpLeftInvariant (with node=None) or TransitionRecord
+        self.op_records = []
+
+        self.has_aggregated_error = False
+        self.has_concrete_error = False
+        self.counterexample = []
+
+        self.plot_list = [] # list of (verts, subplot, cur_step_in_mode) if store_plot_result is set
+        self.messages = [] # list of (msg, color) printed by the worker
+        self.continuous_steps = 0
+
+        self.freeze_attrs()
+
+def explore_batch(core, batch):
+    '''explore a batch of popped states in parallel, and merge the results into core
+
+    batch is a list of (AggDagNode, took_tt_transition) for the nodes whose continuous posts should be computed
+    '''
+
+    global BATCH_DATA # pylint: disable=global-statement
+
+    Timers.tic('explore_batch')
+
+    # flush output so forked processes do not print it a second time
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    BATCH_DATA = (core, batch)
+
+    try:
+        with multiprocessing.get_context('fork').Pool(len(batch)) as pool:
+            results = pool.map(_explore_job, range(len(batch)), chunksize=1)
+    finally:
+        BATCH_DATA = None
+
+    for (node, _), result in zip(batch, results):
+        _merge_result(core, node, result)
+
+    Timers.toc('explore_batch')
+
+def _explore_job(index):
+    'run in a worker process: explore the node at the given index in the batch'
+
+    core, batch = BATCH_DATA
+    node, took_tt_transition = batch[index]
+
+    return explore_node(core, node, took_tt_transition)
+
+def explore_node(core, node, took_tt_transition):
+    '''compute the continuous post of the current state of node until it leaves the invariant, reaches the time bound,
+    or the computation finishes. This modifies core, so it's done in a worker process.
+
+    returns an ExploreResult
+    '''
+
+    rv = ExploreResult()
+    num_old_ops = len(node.op_list)
+
+    core.message_buffer = rv.messages
+    core.aggdag.cur_node = node
+    core.took_tt_transition = took_tt_transition
+
+    state = node.get_cur_state()
+    core.max_steps_remaining = core.settings.num_steps - state.cur_steps_since_start[0]
+
+    def add_plot_data(state):
+        'save the vertices of the state at each step (the main process adds them to the plot data)'
+
+        for subplot in range(core.plotman.num_subplots):
+            rv.plot_list.append((state.verts(core.plotman, subplot=subplot), subplot, state.cur_step_in_mode))
+
+    state_func = add_plot_data if core.settings.plot.store_plot_result else None
+    rv.continuous_steps = core.do_continuous_post(state_func)
+
+    for op in node.op_list[num_old_ops:]:
+        if isinstance(op, OpTransition):
+            rv.op_records.append(_make_transition_record(op, state))
+        else:
+            rv.op_records.append(op._replace(node=None))
+
+    rv.has_aggregated_error = core.result.has_aggregated_error
+    rv.has_concrete_error = core.result.has_concrete_error
+    rv.counterexample = core.result.counterexample
+
+    # send modes and transitions by name / index, rather than copies of the hybrid automaton
+    for segment in rv.counterexample:
+        if segment.outgoing_transition is not None:
+            segment.outgoing_transition = segment.mode.transitions.index(segment.outgoing_transition)
+
+        segment.mode = segment.mode.name
+
+    return rv
+
+def _make_transition_record(op, state):
+    'make a picklable TransitionRecord from an OpTransition taken from the passed-in state'
+
+    post = op.poststate
+    init_box = None
+    screen = post.interval_screen
+
+    if screen is not None and screen.init_center is not None:
+        init_box = (screen.init_center - screen.init_radius, screen.init_center + screen.init_radius)
+
+    return TransitionRecord(op.step, state.mode.transitions.index(op.transition), getattr(op, 'premode_center', None),
+                            type(post.lpi), post.lpi.get_model(), post.lpi.init_zonotope, post.cur_steps_since_start,
+                            post.is_concrete, init_box)
+
+def _make_op_transition(record, node):
+    'recreate an OpTransition (and its poststate) from a TransitionRecord, in the main process'
+
+    t = node.stateset.mode.transitions[record.transition_index]
+    op = OpTransition(record.step, node, None, t, None)
+
+    if record.premode_center is not None:
+        op.premode_center = record.premode_center
+
+    lpi = LpInstance.from_model(record.lpi_model, record.lpi_class)
+    lpi.init_zonotope = record.init_zonotope
+
+    op.poststate = StateSet(lpi, t.to_mode, record.steps_since_start, [op], record.is_concrete)
+
+    if record.init_box is not None and op.poststate.interval_screen is not None:
+        op.poststate.interval_screen.set_init_box(*record.init_box)
+
+    return op
+
+def _merge_result(core, node, result):
+    'merge the ExploreResult of a node into core'
+
+    for msg, col in result.messages:
+        cprint(msg, col)
+
+    for record in result.op_records:
+        if isinstance(record, TransitionRecord):
+            op = _make_op_transition(record, node)
+            core.aggdag.waiting_list.append(op)
+        else:
+            op = record._replace(node=node)
+
+        node.op_list.append(op)
+
+    core.result.has_aggregated_error |= result.has_aggregated_error
+    core.result.has_concrete_error |= result.has_concrete_error
+
+    if result.counterexample and not core.result.counterexample:
+        for segment in result.counterexample:
+            segment.mode = core.hybrid_automaton.modes[segment.mode]
+
+            if segment.outgoing_transition is not None:
+                segment.outgoing_transition = segment.mode.transitions[segment.outgoing_transition]
+
+        core.result.counterexample = result.counterexample
+
+    for verts, subplot, step in result.plot_list:
+        core.result.plot_data.add_state(node.stateset, verts, subplot, step)
+
+    core.continuous_steps += result.continuous_steps
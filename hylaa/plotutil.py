@@ -623,17 +623,11 @@ class PlotManager(Freezable):
         if self.core.sim_states:
             for subplot in range(self.num_subplots):
                 xdim, ydim = self.settings.xdim_dir[subplot], self.settings.ydim_dir[subplot]
-                plot_pts = []
+                plot_pts = [None] * len(self.core.sim_states) # None for finished simulations
 
-                for obj in self.core.sim_states:
-                    if obj is None:
-                        plot_pts.append(None)
-                    else:
-                        _, pt, steps = obj
-                        cur_time = steps * self.core.settings.step_size
-                        x, y = lpplot.pt_to_plot_xy(pt, xdim, ydim, cur_time)
-
-                        plot_pts.append((x, y))
+                for i, pt, steps in self.core.sim_states.get_active_pts():
+                    cur_time = steps * self.core.settings.step_size
+                    plot_pts[i] = lpplot.pt_to_plot_xy(pt, xdim, ydim, cur_time)
 
                 self.shapes[subplot].set_cur_sim(plot_pts)
 
@@ -6,6 +6,7 @@ Code associated with counterexamples.
 
 from collections import defaultdict
 from collections import deque
+import json
 
 import numpy as np
 
@@ -22,6 +23,9 @@ class HylaaResult(Freezable): # pylint: disable=too-few-public-methods
 
     def __init__(self):
         self.top_level_timer = None # TimerData for total time
+        self.timer_stats = None # dict of recorded (non-time) statistics, name -> list of values, see Timers.stats
+        self.timer_counters = None # dict of counters (for example, lp solves), name -> int, see Timers.counters
+        self.timer_histograms = None # dict of histograms (for example, lp rows), name -> Histogram
 
         # verification result:
         self.has_aggregated_error = False
@@ -42,6 +46,23 @@ class HylaaResult(Freezable): # pylint: disable=too-few-public-methods
 
         self.freeze_attrs()
 
+    def get_stats_dict(self):
+        '''get the timers, counters, histograms and recorded statistics of the computation as a json-serializable
+        dict (see TimerData.to_dict() and Histogram.to_dict())
+        '''
+
+        timers = None if self.top_level_timer is None else self.top_level_timer.to_dict()
+        histograms = {name: h.to_dict() for name, h in (self.timer_histograms or {}).items()}
+
+        return {'timers': timers, 'counters': self.timer_counters or {}, 'histograms': histograms,
+                'stats': self.timer_stats or {}}
+
+    def save_stats_json(self, filename):
+        'save the statistics from get_stats_dict() to a json file'
+
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.get_stats_dict(), f, indent=2)
+
 class PlotData(Freezable):
     'used if setting.plot.store_plot_result is True, stores data about the plots'
 
@@ -57,12 +78,15 @@ class PlotData(Freezable):
 
         return self.mode_to_obj_list[plot_index][mode_name][0]
 
-    def add_state(self, state, verts, plot_index):
-        'add a plotted state'
+    def add_state(self, state, verts, plot_index, step=None):
+        'add a plotted state, at the passed-in step in the mode (None = the current step of the state)'
 
         mode_name = state.mode.name
 
-        obj = (verts, state, state.cur_step_in_mode, f"{mode_name} at step {state.cur_step_in_mode}")
+        if step is None:
+            step = state.cur_step_in_mode
+
+        obj = (verts, state, step, f"{mode_name} at step {step}")
 
         self.mode_to_obj_list[plot_index][mode_name].append(obj)
 
@@ -142,8 +166,10 @@ class CounterExampleSegment(Freezable):
 def make_counterexample(ha, state, transition_to_error, lpi):
     '''make and return the result counter-example from the lp solution'''
 
-    lp_solution = lpi.minimize() # resolves the LP to get the full unsafe solution
-    names = lpi.get_names()
+    # resolve the LP to get the unsafe solution, only extracting the mode and reset variables used below
+    columns = [col for col, name in enumerate(lpi.get_names()) if name.startswith(('m', 'reset'))]
+    names = [lpi.get_names()[col] for col in columns]
+    lp_solution = lpi.minimize(columns=columns)
 
     # first get the number of steps in each mode
     num_steps = []
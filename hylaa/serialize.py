@@ -0,0 +1,83 @@
+'''
+Pickling of Hylaa computation state (StateSet, LpInstance, AggDagNode and aggdag op objects)
+
+Modes, transitions and the hybrid automaton are not copied, but pickled by reference (modes by mode_id, transitions
+by their mode and transition_index), and resolved on loading using the passed-in HybridAutomaton. Similarly, the
+AggDag object (which owns the Core) is pickled as a reference, and resolved to the AggDag passed in to loads().
+
+LpInstance objects are pickled using LpInstance.__getstate__(), which saves the lp in a compact numpy form along with
+its basis statuses.
+'''
+
+import io
+import pickle
+
+from hylaa.aggdag import AggDag
+from hylaa.hybrid_automaton import HybridAutomaton, Mode, Transition
+
+class HylaaPickler(pickle.Pickler):
+    'pickler which saves references to the modes, transitions, hybrid automaton and aggdag'
+
+    def persistent_id(self, obj):
+        'get the persistent id for referenced objects, or None for objects that should be pickled normally'
+
+        rv = None
+
+        if isinstance(obj, Mode):
+            rv = ('mode', obj.mode_id)
+        elif isinstance(obj, Transition):
+            rv = ('transition', obj.from_mode.mode_id, obj.transition_index)
+        elif isinstance(obj, HybridAutomaton):
+            rv = ('ha',)
+        elif isinstance(obj, AggDag):
+            rv = ('aggdag',)
+
+        return rv
+
+class HylaaUnpickler(pickle.Unpickler):
+    'unpickler which resolves the references saved by HylaaPickler'
+
+    def __init__(self, file, ha, aggdag=None):
+        super().__init__(file)
+
+        self.ha = ha
+        self.aggdag = aggdag
+        self.modes_by_id = {mode.mode_id: mode for mode in ha.modes.values()}
+
+    def persistent_load(self, pid):
+        'resolve a persistent id saved by HylaaPickler.persistent_id()'
+
+        kind = pid[0]
+
+        if kind == 'mode':
+            rv = self.modes_by_id[pid[1]]
+        elif kind == 'transition':
+            rv = self.modes_by_id[pid[1]].transitions[pid[2]]
+        elif kind == 'ha':
+            rv = self.ha
+        elif kind == 'aggdag':
+            if self.aggdag is None:
+                raise pickle.UnpicklingError("pickled data references an AggDag, but none was passed to loads()")
+
+            rv = self.aggdag
+        else:
+            raise pickle.UnpicklingError(f"unknown persistent id: {pid}")
+
+        return rv
+
+def dumps(obj):
+    'pickle an object containing hylaa computation state, returns bytes'
+
+    f = io.BytesIO()
+    HylaaPickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump(obj)
+
+    return f.getvalue()
+
+def loads(data, ha, aggdag=None):
+    '''unpickle an object created with dumps()
+
+    ha is the HybridAutomaton used to resolve modes and transitions, and aggdag is the AggDag that the unpickled
+    AggDagNode objects will belong to (if any were pickled)
+    '''
+
+    return HylaaUnpickler(io.BytesIO(data), ha, aggdag).load()
@@ -31,13 +31,27 @@ class HylaaSettings(Freezable):  # pylint: disable=too-few-public-methods
     #                       lgg: support function method from Le Guernic'10
     APPROX_NONE, APPROX_CHULL, APPROX_LGG = range(3)
 
+    # Input Effects Compression Templates: box: bounds of each variable, box_mode: box plus invariant and guard
+    #                                       directions of the current mode
+    COMPRESS_BOX, COMPRESS_BOX_MODE = range(2)
+
+    # LP Backends: glpk: swiglpk (default), highs: HiGHS simplex (warm-started through highspy if it's
+    #                                              installed, otherwise scipy.optimize.linprog)
+    LP_GLPK, LP_HIGHS = range(2)
+
+    # Simulation Input Sampling: vertex: a random vertex of the input set at each step, uniform: uniformly distributed
+    #                                     in the input set at each step
+    SIM_INPUTS_VERTEX, SIM_INPUTS_UNIFORM = range(2)
+
     def __init__(self, step_size, max_time):
         plot_settings = PlotSettings()
+        time_elapse_settings = TimeElapseSettings()
 
         self.step_size = step_size #: simulation step size
         self.num_steps = int(math.ceil(max_time / step_size))
 
         self.plot = plot_settings
+        self.time_elapse = time_elapse_settings
         self.stdout = HylaaSettings.STDOUT_NORMAL
         self.stdout_colors = [None, "white", "blue", "yellow"] #: colors for each level of printing
 
@@ -47,17 +61,105 @@ class HylaaSettings(Freezable):  # pylint: disable=too-few-public-methods
         self.optimize_tt_transitions = True #: auto-detect time-triggered transitions and use single-step semantics?
         self.approx_model = HylaaSettings.APPROX_NONE
         self.skip_zero_dynamics_modes = True
+        self.lp_backend = HylaaSettings.LP_GLPK #: linear programming engine used for new lps
+
+        #: before solving lps for guards and invariants, check them using a box overapproximation of the state set
+        self.interval_guard_optimization = True
+
+        #: when no guard or invariant can become active for several steps (using the interval overapproximation and
+        #: a bound on the dynamics), advance directly by that many steps. Skipped steps are not plotted.
+        self.skip_event_free_steps = False
+
+        #: in modes with inputs, every this many steps replace the lp variables for the accumulated input effects
+        #: with a template overapproximation of their total, so lp size stays bounded (0 = never, exact). States
+        #: become overapproximations (non-concrete), so an error they reach is reported as an aggregated error. While
+        #: a concrete error is needed (stop_on_concrete_error or make_counterexample), concrete states in modes that
+        #: can reach an error mode are not compressed
+        self.compress_inputs_steps = 0
+        self.compress_inputs_template = HylaaSettings.COMPRESS_BOX #: template directions for compression
+
+        #: after each discrete transition, replace the lp (which contains the variables of all the predecessor modes)
+        #: by a template overapproximation over only the variables of the new mode, so lp size does not grow along
+        #: chains of transitions. The template also has the directions of the lp's constraints mapped through the
+        #: reset (see lptemplate.project_to_template). If the projection is exactly a box (in its affine hull) with at
+        #: most compact_exact_max_dims dimensions, the new lp is exact and the state stays concrete; otherwise it
+        #: becomes an overapproximation. Concrete states keep the full lp if make_counterexample is True, which needs it
+        self.compact_transition_lps = False
+        self.compact_transition_template = HylaaSettings.COMPRESS_BOX_MODE #: template directions for compaction
+        self.compact_exact_max_dims = 3 #: check exactness (2^dims lps) if the box has at most this many dims
+
+        #: only compact lps with at least this many columns per dimension before the reset (each mode along the path
+        #: adds about two: initial and current-time variables), since compacting small lps costs more than it saves
+        self.compact_transition_min_cols_per_dim = 4
 
         # what to do when an error appears reachable
         self.stop_on_aggregated_error = False #: stop whenever any state (aggregated or not) reaches an error mode
         self.stop_on_concrete_error = True #: stop whenver a concrete state reaches an error
         self.make_counterexample = True #: save counter-example to data structure / file?
 
+        #: if set, the computation state is periodically saved to this file, which can be resumed with Core.resume()
+        self.checkpoint_path = None
+        self.checkpoint_interval = 600.0 #: wall-clock seconds between checkpoints
+
         self.aggstrat = aggstrat.Aggregated() #: aggregation strategy class
 
+        #: number of worker processes used to solve the lps of template (box / arnoldi) aggregation, which are split
+        #: by state and by direction. 1 = solve them in this process
+        self.aggregation_workers = 1
+
+        #: number of worker processes used to compute the continuous posts of several waiting-list states at once
+        #: (with PLOT_NONE). 1 = pop and explore one state at a time. The workers are forked for each batch, so basis
+        #: matrices they compute are not reused by later batches (time_elapse.disk_cache_dir avoids recomputing the
+        #: one-step matrix exponentials)
+        self.waiting_list_workers = 1
+
+        #: measure the computation with Timers (times, counters and histograms, see result.top_level_timer). If
+        #: False, the timing functions do nothing during run(), which reduces overhead on small models
+        self.timers = True
+
+        #: if set, a timeline of the computation steps (see core.TRACE_TIMERS) is saved to this file in the Chrome
+        #: trace_event json format, which can be viewed in chrome://tracing or Perfetto
+        self.trace_filename = None
+
         #: for deterministic random numbers (simulations / color selection)
         self.random_seed = 0
 
+        #: in simulations of modes with inputs, how the (piecewise-constant) input at each step is sampled
+        self.sim_input_sampling = HylaaSettings.SIM_INPUTS_VERTEX
+
+        #: before the reachability computation in run(), simulate this many points from the initial states (corners,
+        #: center and random points, see falsify.py) to search for a concrete counter-example. If a simulation reaches
+        #: an error mode, the result is unsafe without computing the reachable set (0 = no falsification pre-pass)
+        self.falsify_sims = 0
+        self.falsify_max_secs = 10.0 #: time limit for the falsification pre-pass in wall-clock seconds
+
+        self.freeze_attrs()
+
+class TimeElapseSettings(Freezable): # pylint: disable=too-few-public-methods
+    'time elapse (basis matrix computation) settings container'
+
+    def __init__(self):
+        # memory budget (per mode) for the step-indexed cache of basis and input effects matrices, 0 = no cache
+        self.cache_max_mb = 64.0
+
+        # when a requested step is not cached, advance from the nearest earlier step using at most this many
+        # matrix multiplications; if further away, compute a new matrix exponential instead
+        self.cache_max_multiply_steps = 64
+
+        # compute basis matrices only along each mode's output directions (invariants, guards, resets and plot
+        # directions), propagating a k x n projection rather than the full n x n matrix. This is only used for
+        # reachability (not simulation) with APPROX_NONE, and only in modes where the output directions span
+        # at most output_space_max_fraction of the state space
+        self.output_space = False
+        self.output_space_max_fraction = 0.5
+
+        # if set, one-step matrix exponentials and input effects matrices are saved to this directory, and loaded
+        # (memory-mapped) by later runs with the same dynamics and step size (see hylaa.expm_cache)
+        self.disk_cache_dir = None
+
+        # size limit of the files in disk_cache_dir, when exceeded the least-recently used entries are deleted
+        self.disk_cache_max_mb = 1024.0
+
         self.freeze_attrs()
 
 class PlotSettings(Freezable): # pylint: disable=too-few-public-methods,too-many-instance-attributes
@@ -2,11 +2,214 @@
 Hylaa Simuation Utilities
 '''
 
+import numpy as np
 import matplotlib.pyplot as plt
+from scipy.sparse import csr_matrix
 
 from hylaa.util import Freezable
-from hylaa.settings import PlotSettings
+from hylaa.settings import HylaaSettings, PlotSettings
+from hylaa.timerutil import Timers
+from hylaa import lputil
 
+class InputSampler(Freezable):
+    '''samples the piecewise-constant inputs of a mode for simulation, from the input set u_constraints * u <= rhs
+
+    with SIM_INPUTS_VERTEX, each input is a vertex of the input set (chosen uniformly), with SIM_INPUTS_UNIFORM it's
+    uniformly distributed in the input set
+    '''
+
+    # uniform sampling of non-box input sets uses rejection sampling from the bounding box; if not enough samples are
+    # accepted after this many rounds (the set is nearly degenerate), random convex combinations of the vertices are
+    # used for the rest
+    MAX_REJECTION_ROUNDS = 20
+
+    def __init__(self, mode, sample_mode):
+        assert sample_mode in [HylaaSettings.SIM_INPUTS_VERTEX, HylaaSettings.SIM_INPUTS_UNIFORM]
+
+        self.sample_mode = sample_mode
+        self.u_constraints_csr = csr_matrix(mode.u_constraints_csc)
+        self.u_constraints_rhs = mode.u_constraints_rhs
+        self.num_inputs = self.u_constraints_csr.shape[1]
+
+        self.is_box = True
+        self.box = lputil.get_input_box(mode.u_constraints_csc, mode.u_constraints_rhs) # (lower, upper)
+        self.verts = None # rows are the vertices of the input set, computed if needed for non-box sets
+
+        if self.box is None:
+            self.is_box = False
+            self.box = lputil.get_input_box(mode.u_constraints_csc, mode.u_constraints_rhs, overapprox=True)
+
+        self.freeze_attrs()
+
+    def sample(self, num):
+        'sample inputs for num simulations, returns a (num x num_inputs) array'
+
+        lower, upper = self.box
+
+        if self.is_box:
+            if self.sample_mode == HylaaSettings.SIM_INPUTS_VERTEX:
+                rv = np.where(np.random.rand(num, self.num_inputs) < 0.5, lower, upper)
+            else:
+                rv = lower + np.random.rand(num, self.num_inputs) * (upper - lower)
+        elif self.sample_mode == HylaaSettings.SIM_INPUTS_VERTEX:
+            verts = self._get_verts()
+            rv = verts[np.random.randint(len(verts), size=num)]
+        else:
+            rv = self._sample_uniform(num)
+
+        return rv
+
+    def _get_verts(self):
+        'get the vertices of the input set'
+
+        if self.verts is None:
+            self.verts = lputil.get_input_verts(self.u_constraints_csr, self.u_constraints_rhs)
+
+        return self.verts
+
+    def _sample_uniform(self, num):
+        'sample uniformly in a non-box input set'
+
+        lower, upper = self.box
+        tol = 1e-9
+        accepted = []
+        num_accepted = 0
+
+        for _ in range(InputSampler.MAX_REJECTION_ROUNDS):
+            if num_accepted >= num:
+                break
+
+            candidates = lower + np.random.rand(2 * num, self.num_inputs) * (upper - lower)
+            vals = self.u_constraints_csr * candidates.T
+            candidates = candidates[np.all(vals <= self.u_constraints_rhs[:, np.newaxis] + tol, axis=0)]
+
+            accepted.append(candidates)
+            num_accepted += candidates.shape[0]
+
+        if num_accepted < num:
+            verts = self._get_verts()
+            weights = np.random.dirichlet(np.ones(len(verts)), size=num - num_accepted)
+            accepted.append(np.dot(weights, verts))
+
+        return np.concatenate(accepted)[:num]
+
+class SimBatch(Freezable):
+    '''a batch of simulations in the same mode, which are advanced together
+
+    the points are stored as a single (num_sims x dims) array, so each step is a single matrix-matrix product, and
+    guards and invariants are checked for all the points at once. The array is in fortran order, so that the
+    transpose (dims x num_sims) is contiguous for the sparse guard and invariant products.
+    '''
+
+    # finished simulations are removed from the arrays when fewer than this fraction are still active
+    COMPACT_FRACTION = 0.25
+
+    def __init__(self, mode, pts, steps):
+        assert pts.shape[0] == steps.shape[0]
+
+        self.mode = mode
+        self.num_sims = steps.shape[0]
+
+        self.pts = np.asfortranarray(pts, dtype=float) # num_sims x dims array of the current points
+        self.steps = steps # int array, the number of steps of each simulation since the start
+        self.ids = np.arange(self.num_sims) # index of each row in the original batch (rows are removed on compact)
+
+        self.active = np.ones(self.num_sims, dtype=bool) # simulations which are not finished
+        self.took_transition = np.zeros(self.num_sims, dtype=bool) # simulations that took a transition last step
+
+        # in modes with inputs, num_sims x num_inputs array with the input of each simulation in the last step where
+        # it was advanced (assigned in step())
+        self.inputs = None
+
+        self.freeze_attrs()
+
+    def __len__(self):
+        return self.num_sims
+
+    def get_active_pts(self):
+        'get the active simulations as a list of (original index, pt, steps)'
+
+        return list(zip(self.ids[self.active], self.pts[self.active], self.steps[self.active]))
+
+    def step(self, basis_matrix, num_steps, try_guards, input_effects_matrix=None, input_sampler=None):
+        '''do one simulation step: finish simulations which took a transition or reached the time bound, try the
+        guards (if try_guards is True), check the invariant and advance the remaining points using basis_matrix
+
+        in modes with inputs, input_effects_matrix is the one-step input effects matrix and the input of each
+        simulation in the step is sampled with input_sampler (an InputSampler)
+
+        simulations which take a transition are not advanced, and their point becomes the post-reset point (if the
+        number of dimensions is the same in both modes)
+
+        returns (successors, num_advanced), where successors is a list of (transition, post_pts, steps, ids), and
+        ids are the original indices (see self.ids) of the simulations which took the transition
+        '''
+
+        Timers.tic('sim batch step')
+
+        self.active &= ~self.took_transition & (self.steps < num_steps)
+        self.took_transition[:] = False
+
+        if np.count_nonzero(self.active) < SimBatch.COMPACT_FRACTION * self.active.shape[0]:
+            self._compact()
+
+        successors = []
+        remaining = self.active.copy()
+
+        if try_guards:
+            for transition in self.mode.transitions:
+                if not remaining.any():
+                    break
+
+                taken = np.flatnonzero(remaining & transition.is_guard_true_for_points(self.pts))
+
+                if taken.size > 0:
+                    post_pts, _ = transition.apply_reset_for_points(self.pts[taken])
+                    successors.append((transition, post_pts, self.steps[taken], self.ids[taken]))
+
+                    self.took_transition[taken] = True
+                    remaining[taken] = False
+
+                    if post_pts.shape[1] == self.pts.shape[1]:
+                        self.pts[taken] = post_pts
+
+        # simulations outside the invariant are finished
+        advance = remaining & self.mode.points_in_invariant(self.pts)
+        self.active &= advance | self.took_transition
+
+        # advance time
+        new_pts = np.dot(basis_matrix, self.pts.T)
+
+        if input_effects_matrix is not None:
+            indices = np.flatnonzero(advance)
+            inputs = input_sampler.sample(indices.size)
+            new_pts[:, indices] += np.dot(input_effects_matrix, inputs.T)
+
+            if self.inputs is None:
+                self.inputs = np.zeros((self.active.shape[0], inputs.shape[1]))
+
+            self.inputs[indices] = inputs
+
+        np.copyto(self.pts, new_pts.T, where=advance[:, np.newaxis])
+        self.steps[advance] += 1
+
+        Timers.toc('sim batch step')
+
+        return successors, np.count_nonzero(advance)
+
+    def _compact(self):
+        'remove the finished simulations from the arrays'
+
+        keep = self.active
+
+        self.pts = np.asfortranarray(self.pts[keep])
+        self.steps = self.steps[keep]
+        self.ids = self.ids[keep]
+        self.took_transition = self.took_transition[keep]
+        self.active = self.active[keep]
+
+        if self.inputs is not None:
+            self.inputs = self.inputs[keep]
 
 class Simulation(Freezable):
     'main simulation container class. Initialize and call run()'
@@ -8,6 +8,7 @@ import math
 
 import numpy as np
 import scipy as sp
+from scipy.sparse import csc_matrix
 
 from matplotlib.path import Path
 
@@ -19,6 +20,229 @@ from hylaa.util import Freezable
 from hylaa.lpinstance import LpInstance
 from hylaa.settings import HylaaSettings
 
+STEP_TIMER = Timers.register('step')
+GET_BM_TIMER = Timers.register('get_bm')
+SET_BM_TIMER = Timers.register('set_bm')
+
+class Star(Freezable):
+    '''
+    A closed-form representation of a state set whose lp was made from a box or zonotope (with no inputs),
+    x = basis_matrix * (center + generators * alpha), where each alpha is in [-1, 1].
+
+    Support functions are computed with numpy, rather than solving LPs. Once other constraints are added to the
+    lp (for example, invariant constraints), the star is an overapproximation and is_exact() returns False.
+    '''
+
+    def __init__(self, lpi, init_zonotope):
+        self.lpi = lpi
+        self.center = init_zonotope.center
+        self.generators = init_zonotope.generators # matrix, or 1-d array of radii for boxes
+        self.num_rows = init_zonotope.num_rows
+
+        self.basis_matrix = np.identity(len(self.center))
+
+        self.freeze_attrs()
+
+    def is_exact(self):
+        'is the star exactly equal to the lp (no other constraints were added)?'
+
+        return self.lpi.get_num_rows() == self.num_rows
+
+    def _project_generators(self, proj):
+        'project the generators onto the passed-in (projected basis matrix) directions'
+
+        if self.generators.ndim == 1:
+            rv = proj * self.generators
+        else:
+            rv = np.dot(proj, self.generators)
+
+        return rv
+
+    def minimize_vals(self, dir_mat):
+        '''get the minimum value in the direction of each row of dir_mat (2-d np.array or csr_matrix)
+
+        returns a 1-d np.array of minimums
+        '''
+
+        proj = dir_mat.dot(self.basis_matrix)
+
+        return np.dot(proj, self.center) - np.abs(self._project_generators(proj)).sum(axis=1)
+
+    def minimize_point(self, direction):
+        'get a point in the set minimizing the passed-in direction vector'
+
+        proj = np.dot(direction, self.basis_matrix)
+        alphas = -np.sign(self._project_generators(proj))
+
+        if self.generators.ndim == 1:
+            init_pt = self.center + self.generators * alphas
+        else:
+            init_pt = self.center + np.dot(self.generators, alphas)
+
+        return np.dot(self.basis_matrix, init_pt)
+
+class IntervalScreen(Freezable):
+    '''
+    A cheap overapproximation of a state set, x = basis_matrix * x0 + total_input_effects, where x0 is in a box (the
+    bounds of the initial variables in the lp), and the total input effects are bounded along the mode's template
+    directions. The input effects bounds are updated incrementally at each step, using a box around the input set.
+
+    This has the same minimize_vals() interface as Star (but is never exact), and is used to prove that guards are
+    disjoint or that invariants are satisfied without solving LPs.
+    '''
+
+    def __init__(self, mode, box_template=True):
+        self.mode = mode
+        self.has_inputs = mode.b_csr is not None
+
+        # box_template should be False if the basis matrices are only correct along the output directions
+        self.template_dirs = mode.get_template_directions(box=box_template)
+        self.template_index = {row.tobytes(): i for i, row in enumerate(self.template_dirs)}
+
+        dims = mode.a_csr.shape[0]
+        self.box_indices = None # template index of each unit direction, if box_template
+
+        if box_template:
+            self.box_indices = [self.template_index[row.tobytes()] for row in np.identity(dims)]
+
+        # bounds of the total input effects in each template direction
+        self.input_lower = np.zeros(len(self.template_dirs))
+        self.input_upper = np.zeros(len(self.template_dirs))
+        self.input_box = None # (lower, upper) around the input set, assigned on the first add_input_effects()
+
+        # box of the initial variables, assigned in set_init_box()
+        self.init_center = None
+        self.init_radius = None
+
+        self.basis_matrix = np.identity(dims)
+
+        self.freeze_attrs()
+
+    def is_exact(self):
+        'the interval screen is always an overapproximation'
+
+        return False
+
+    def set_init_box(self, lower, upper):
+        'set the bounds of the initial variables (1-d np.arrays)'
+
+        self.init_center = (lower + upper) / 2
+        self.init_radius = (upper - lower) / 2
+
+    def get_input_box(self):
+        'get the (lower, upper) bounds of a box around the input set, computed once'
+
+        if self.input_box is None:
+            self.input_box = lputil.get_input_box(self.mode.u_constraints_csc, self.mode.u_constraints_rhs, \
+                                                  overapprox=True)
+
+        return self.input_box
+
+    def add_input_effects(self, input_effects_matrix, lgg_beta=None):
+        'update the total input effects bounds using the input effects matrix of a new step'
+
+        lower, upper = self.get_input_box()
+        extra = input_effects_matrix.shape[1] - len(lower)
+
+        if extra > 0: # lgg bloating variables are in [-beta, beta]
+            assert lgg_beta is not None
+            lower = np.concatenate([lower, [-lgg_beta] * extra])
+            upper = np.concatenate([upper, [lgg_beta] * extra])
+
+        proj = np.dot(self.template_dirs, input_effects_matrix)
+
+        self.input_lower += np.minimum(proj * lower, proj * upper).sum(axis=1)
+        self.input_upper += np.maximum(proj * lower, proj * upper).sum(axis=1)
+
+    def _input_effects_min(self, direction):
+        '''get a lower bound on the total input effects in the passed-in direction (1-d np.array)
+
+        this is -np.inf if the direction is not a template direction (or its negation) and there is no box template
+        '''
+
+        rv = -np.inf
+        index = self.template_index.get((direction + 0.0).tobytes())
+
+        if index is not None:
+            rv = self.input_lower[index]
+        else:
+            index = self.template_index.get((-direction + 0.0).tobytes())
+
+            if index is not None:
+                rv = -self.input_upper[index]
+            elif self.box_indices is not None:
+                lower = self.input_lower[self.box_indices]
+                upper = self.input_upper[self.box_indices]
+
+                rv = np.minimum(direction * lower, direction * upper).sum()
+
+        return rv
+
+    def minimize_vals(self, dir_mat):
+        '''get a lower bound on the minimum value in the direction of each row of dir_mat (2-d np.array or csr_matrix)
+
+        returns a 1-d np.array of lower bounds
+        '''
+
+        assert self.init_center is not None, "set_init_box() should be called before minimize_vals()"
+
+        if not isinstance(dir_mat, np.ndarray):
+            dir_mat = dir_mat.toarray()
+
+        proj = np.dot(dir_mat, self.basis_matrix)
+        rv = np.dot(proj, self.init_center) - np.dot(np.abs(proj), self.init_radius)
+
+        # without a box template, the basis matrix may only be correct along the template directions, which
+        # _input_effects_min() also checks
+        if self.has_inputs or self.box_indices is None:
+            for i, direction in enumerate(dir_mat):
+                rv[i] += self._input_effects_min(direction)
+
+        return rv
+
+class InputEffectsProjections(Freezable):
+    '''
+    Running projections of a StateSet's input effects matrices onto a fixed set of directions (the invariant
+    conditions), kept in the same column order as the input effects variables in the lp.
+
+    This is updated as input effects matrices are added, so that constraints on the initial and input effects
+    variables in these directions can be constructed without re-projecting every past step's input effects matrix.
+    '''
+
+    def __init__(self, dir_mat):
+        self.dir_mat = dir_mat # 2-d np.array, one direction per row
+        self.data = np.zeros((dir_mat.shape[0], 64)) # buffer with the projections in the first self.size columns
+        self.size = 0
+
+        self.freeze_attrs()
+
+    def append(self, input_effects_matrix):
+        'add the projection of the input effects matrix of a new step'
+
+        proj = np.dot(self.dir_mat, input_effects_matrix)
+        new_size = self.size + proj.shape[1]
+
+        if new_size > self.data.shape[1]: # grow by doubling
+            data = np.zeros((self.data.shape[0], max(new_size, 2 * self.data.shape[1])))
+            data[:, :self.size] = self.data[:, :self.size]
+            self.data = data
+
+        self.data[:, self.size:new_size] = proj
+        self.size = new_size
+
+    def reset(self, input_effects_list):
+        'recompute the projections from the passed-in list of input effects matrices'
+
+        self.size = 0
+
+        for ie_mat in input_effects_list:
+            self.append(ie_mat)
+
+    def get(self, index):
+        'get the projection of all the input effects matrices onto direction number index, as a 1-d np.array'
+
+        return self.data[index, :self.size]
+
 class StateSet(Freezable):
     '''
     A set of states (possibly aggregated) in the same mode.
@@ -60,11 +284,27 @@ class StateSet(Freezable):
         
         self.input_effects_list = None if mode.b_csr is None else [] # list of input effects at each step
 
+        # projections of input_effects_list onto each invariant condition, used to construct invariant constraints
+        self.invariant_ie_projections = None
+
+        if self.input_effects_list is not None and mode.inv_list:
+            inv_dirs = np.concatenate([lc.csr.toarray() for lc in mode.inv_list], axis=0)
+            self.invariant_ie_projections = InputEffectsProjections(inv_dirs)
+        self.uncompressed_input_steps = 0 # number of steps with input effects since the last compression
+        self.compressed_bounds = None # (template_dirs, lower, upper) from the last input effects compression
+
+        self.star = None # closed-form star representation, assigned in init_screens()
+        self.interval_screen = None # interval overapproximation used if there is no star, assigned in init_screens()
+        self.init_screens()
+
         self.aggstring = None # aggstring that led to this state, like 'full', or '010'
 
         # approximation model variables
         self.lgg_beta = None
 
+        # mode-dependent data used to skip event-free steps, created on first call to get_event_free_steps()
+        self.event_free_data = None
+
         #### plotting variables below ####
         self._verts = None # cached vertices at the current step
         self.assigned_plot_dim = False # set to True on first call to verts()
@@ -76,6 +316,17 @@ class StateSet(Freezable):
 
         self.freeze_attrs()
 
+    def __getstate__(self):
+        '''get the state for pickling (see hylaa.serialize, which pickles the mode by id)
+
+        the plotted matplotlib paths are not included
+        '''
+
+        rv = self.__dict__.copy()
+        rv['step_to_paths'] = {}
+
+        return rv
+
     def __str__(self):
         'short string representation of this state set'
 
@@ -106,7 +357,7 @@ class StateSet(Freezable):
         going to a specific step number
         '''
 
-        Timers.tic("step")
+        STEP_TIMER.tic()
 
         if step_in_mode is None:
             step_in_mode = self.cur_step_in_mode + 1
@@ -118,25 +369,36 @@ class StateSet(Freezable):
           f"{self.mode.name}, cur_step_in_mode: {self.cur_step_in_mode}, requested_step: {step_in_mode})"
 
         if num_steps > 0:
-            Timers.tic('get_bm')
+            GET_BM_TIMER.tic()
             self.basis_matrix, input_effects_matrix = self.mode.time_elapse.get_basis_matrix(step_in_mode)
-            Timers.toc('get_bm')
+            GET_BM_TIMER.toc()
 
-            Timers.tic('set_bm')
+            SET_BM_TIMER.tic()
             lputil.set_basis_matrix(self.lpi, self.basis_matrix)
-            Timers.toc('set_bm')
+            SET_BM_TIMER.toc()
+
+            if self.star is not None:
+                self.star.basis_matrix = self.basis_matrix
+
+            if self.interval_screen is not None:
+                self.interval_screen.basis_matrix = self.basis_matrix
 
             if input_effects_matrix is not None:
                 Timers.tic('input effects matrix')
                 # if we're doing multiple steps here we need to get each step's input effects matrix
                 for step in range(self.cur_step_in_mode + 1, step_in_mode):
                     _, ie_mat = self.mode.time_elapse.get_basis_matrix(step)
-                    self.input_effects_list.append(ie_mat)
-                    lputil.add_input_effects_matrix(self.lpi, ie_mat, self.mode, self.lgg_beta)
+                    self._append_input_effects(ie_mat)
+
+                    if self.interval_screen is not None:
+                        self.interval_screen.add_input_effects(ie_mat, self.lgg_beta)
 
                 # add the input effects matrix for the final step (computed before with basis matrix)
-                self.input_effects_list.append(input_effects_matrix)
-                lputil.add_input_effects_matrix(self.lpi, input_effects_matrix, self.mode, self.lgg_beta)
+                self._append_input_effects(input_effects_matrix)
+                self.uncompressed_input_steps += num_steps
+
+                if self.interval_screen is not None:
+                    self.interval_screen.add_input_effects(input_effects_matrix, self.lgg_beta)
                 Timers.toc('input effects matrix')
 
                 #print(f".ss lp columns = {self.lpi.get_num_cols()}")
@@ -146,7 +408,329 @@ class StateSet(Freezable):
             self.cur_steps_since_start[1] += num_steps
             self._verts = None # cached vertices no longer valid
 
-        Timers.toc("step")
+        STEP_TIMER.toc()
+
+    def _append_input_effects(self, input_effects_matrix):
+        'add the input effects matrix of a new step to the lp, input_effects_list and the invariant projections'
+
+        self.input_effects_list.append(input_effects_matrix)
+        lputil.add_input_effects_matrix(self.lpi, input_effects_matrix, self.mode, self.lgg_beta)
+
+        if self.invariant_ie_projections is not None:
+            self.invariant_ie_projections.append(input_effects_matrix)
+
+    def get_invariant_ie_projection(self, invariant_index):
+        '''get the projection of the input effects matrices onto the passed-in invariant condition, as a 1-d np.array
+
+        this is None if the mode has no inputs
+        '''
+
+        rv = None
+
+        if self.invariant_ie_projections is not None:
+            rv = self.invariant_ie_projections.get(invariant_index)
+
+        return rv
+
+    def convert_lpi(self, lpi_class):
+        'convert the lp to use the passed-in lp backend (an LpInstance subclass), if it doesn\'t already'
+
+        if not isinstance(self.lpi, lpi_class):
+            self.lpi = self.lpi.convert(lpi_class)
+
+            if self.star is not None:
+                self.star.lpi = self.lpi
+
+    def init_screens(self):
+        '''create the closed-form star (if the lp was made from a box or zonotope and there are no inputs), or otherwise
+        the interval screen, used to pre-screen guard and invariant checks (see get_screen())
+
+        This is called again by Core.setup() for the initial states, since they are usually constructed before the
+        mode's output space is set up. With output-space basis matrices, the star is not used, since its support values
+        would only be correct along the output directions.
+        '''
+
+        assert self.cur_step_in_mode == 0, "init_screens() called after a continuous post operation"
+
+        mode = self.mode
+        zono = self.lpi.init_zonotope
+        self.star = None
+        self.interval_screen = None
+
+        if zono is not None and mode.a_csr is not None and mode.b_csr is None and not self.uses_output_space() and \
+                zono.num_rows == self.lpi.get_num_rows() and zono.num_cols == self.lpi.get_num_cols():
+            self.star = Star(self.lpi, zono)
+
+        if self.star is None and mode.a_csr is not None:
+            self.interval_screen = self._make_interval_screen()
+
+    def uses_output_space(self):
+        '''are the basis matrices in this state set's mode computed in an output space (see
+        TimeElapser.use_output_space())? If so, they are only correct along the mode's output directions.
+        '''
+
+        time_elapse = self.mode.time_elapse
+
+        return time_elapse is not None and time_elapse.output_space_mat is not None
+
+    def _make_interval_screen(self):
+        'create an IntervalScreen for this state set (the box of the initial variables is assigned in get_screen())'
+
+        # with output-space basis matrices, only the invariant and guard directions are correct
+        return IntervalScreen(self.mode, box_template=not self.uses_output_space())
+
+    def get_screen(self, use_interval=True):
+        '''get an object to quickly bound the minimum of the lp in given directions without solving lps (see
+        Star.minimize_vals()), used to pre-screen guard and invariant checks
+
+        this is the closed-form star if it exists, otherwise the IntervalScreen (if use_interval is True), or None
+        '''
+
+        rv = self.star
+
+        if rv is None and use_interval and self.interval_screen is not None:
+            rv = screen = self.interval_screen
+
+            if screen.init_center is None:
+                zono = self.lpi.init_zonotope
+
+                if zono is not None:
+                    # the lp is a subset of the zonotope (other constraints may have been added)
+                    gens = zono.generators
+                    radius = np.abs(gens) if gens.ndim == 1 else np.abs(gens).sum(axis=1)
+                    box = (zono.center - radius, zono.center + radius)
+                else:
+                    box = lputil.get_init_box(self.lpi)
+
+                if box is None:
+                    self.interval_screen = rv = None
+                else:
+                    screen.set_init_box(*box)
+
+        return rv
+
+    def get_event_free_steps(self, max_steps, use_interval=True):
+        '''get a number of steps k (between 1 and max_steps), such that at each of the next k steps every guard is
+        certainly disjoint from the state set, and every invariant is certainly satisfied. The per-step guard and
+        invariant checks can then be skipped by stepping directly to step cur_step_in_mode + k.
+
+        This uses the screen (see get_screen()) lower bounds at the current step, along with a bound on how much the
+        set can move in time tau, ||x(t + tau) - x(t)|| <= (e^(a*tau) - 1) * (w + v) / a, where a = ||A||, w bounds
+        ||Ax(t)|| and v bounds ||Bu|| (all infinity norms).
+
+        No steps are skipped with output-space basis matrices, since bounding w needs a box around the state set,
+        and the basis matrices are only correct along the output directions.
+        '''
+
+        Timers.tic('get_event_free_steps')
+
+        rv = 1
+        screen = None if self.uses_output_space() else self.get_screen(use_interval)
+
+        # the lgg approximation model bloats the set at each step, so it's not covered by the bound
+        if max_steps > 1 and screen is not None and self.lgg_beta is None:
+            if self.event_free_data is None:
+                self.event_free_data = self._make_event_free_data()
+
+            dir_mat, rhs, norms, guard_slices, a_norm, v_norm = self.event_free_data
+            dims = self.mode.a_csr.shape[0]
+
+            vals = screen.minimize_vals(dir_mat)
+            box_center = (vals[dims:2*dims] - vals[:dims]) / -2
+            box_radius = -(vals[dims:2*dims] + vals[:dims]) / 2
+
+            if np.isfinite(box_radius).all():
+                a_csr = self.mode.a_csr
+                w_norm = np.max(np.abs(a_csr * box_center) + abs(a_csr) * box_radius)
+
+                # the maximum time each direction stays inactive
+                times = self._event_free_times(vals[2*dims:] - rhs, norms, a_norm, w_norm + v_norm)
+                num_inv = len(self.mode.inv_list)
+
+                # invariants must stay satisfied, guards are inactive as long as any condition is not satisfied
+                tau_list = list(times[:num_inv])
+                tau_list += [np.max(times[num_inv + start:num_inv + end], initial=0) for start, end in guard_slices]
+
+                tau = min(tau_list, default=np.inf)
+                step_size = self.mode.time_elapse.step_size
+
+                rv = max(1, min(max_steps, math.floor(tau / step_size) if np.isfinite(tau) else max_steps))
+
+        Timers.toc('get_event_free_steps')
+
+        return rv
+
+    def _make_event_free_data(self):
+        '''make the mode-dependent data used in get_event_free_steps()
+
+        returns a tuple: dir_mat, rhs, norms, guard_slices, a_norm, v_norm
+        '''
+
+        mode = self.mode
+        dims = mode.a_csr.shape[0]
+
+        # rows are: identity, -identity, negated invariant rows, guard rows
+        rows = [np.identity(dims), -np.identity(dims)]
+        rhs = []
+        guard_slices = []
+
+        for lc in mode.inv_list:
+            rows.append(-lc.csr.toarray())
+            rhs.append(-lc.rhs)
+
+        num_guard_rows = 0
+
+        for t in mode.transitions:
+            rows.append(t.guard_csr.toarray())
+            rhs += list(t.guard_rhs)
+            guard_slices.append((num_guard_rows, num_guard_rows + t.guard_csr.shape[0]))
+            num_guard_rows += t.guard_csr.shape[0]
+
+        dir_mat = np.vstack(rows)
+        norms = np.abs(dir_mat[2*dims:]).sum(axis=1)
+
+        a_norm = sp.sparse.linalg.norm(mode.a_csr, ord=np.inf)
+        v_norm = 0
+
+        if mode.b_csr is not None:
+            u_lower, u_upper = self.interval_screen.get_input_box()
+            u_bound = np.maximum(np.abs(u_lower), np.abs(u_upper))
+            v_norm = np.max(abs(mode.b_csr) * u_bound)
+
+        return dir_mat, np.array(rhs, dtype=float), norms, guard_slices, a_norm, v_norm
+
+    @staticmethod
+    def _event_free_times(gaps, norms, a_norm, deriv_norm):
+        '''get the time before each linear function with the given 1-norms can change by the corresponding gap, see
+        get_event_free_steps(). The time is 0 where the gap is not positive (the event may be active now).
+
+        returns a 1-d np.array of times
+        '''
+
+        tol = 1e-9
+        rv = np.zeros(gaps.shape)
+        mask = np.logical_and(gaps > 0, np.isfinite(gaps))
+
+        if deriv_norm == 0:
+            rv[mask] = np.inf
+        elif a_norm < tol:
+            rv[mask] = gaps[mask] / (norms[mask] * deriv_norm)
+        else:
+            rv[mask] = np.log1p(gaps[mask] * a_norm / (norms[mask] * deriv_norm)) / a_norm
+
+        # small safety margin for floating-point error
+        return rv * (1 - tol)
+
+    def get_reset_box(self, transition, use_interval=True):
+        '''get a box overapproximation of the initial variables of the successor state after taking the passed-in
+        transition, computed from the screen (see get_screen()) without solving lps
+
+        returns a pair of 1-d np.arrays (lower, upper), or None if it cannot be computed
+        '''
+
+        rv = None
+        screen = self.get_screen(use_interval)
+
+        if screen is not None:
+            t = transition
+            reset_mat = np.identity(self.lpi.dims) if t.reset_csr is None else t.reset_csr.toarray()
+
+            lower = screen.minimize_vals(reset_mat)
+            upper = -screen.minimize_vals(-reset_mat)
+
+            if t.reset_minkowski_csr is not None:
+                min_box = lputil.get_input_box(csc_matrix(t.reset_minkowski_constraints_csr), \
+                                               t.reset_minkowski_constraints_rhs, overapprox=True)
+                min_mat = t.reset_minkowski_csr.toarray()
+
+                lower += np.minimum(min_mat * min_box[0], min_mat * min_box[1]).sum(axis=1)
+                upper += np.maximum(min_mat * min_box[0], min_mat * min_box[1]).sum(axis=1)
+
+            if np.all(np.isfinite(lower)) and np.all(np.isfinite(upper)):
+                rv = (lower, upper)
+
+        return rv
+
+    def compress_input_effects(self, template):
+        '''replace the accumulated input effects variables in the lp by a template overapproximation of their total
+
+        template - one of the COMPRESS_ values defined in HylaaSettings
+        '''
+
+        assert self.input_effects_list is not None, "compress_input_effects() called in mode without inputs"
+
+        dims = self.mode.a_csr.shape[0]
+
+        if template == HylaaSettings.COMPRESS_BOX_MODE:
+            template_dirs = self.mode.get_template_directions()
+        else:
+            assert template == HylaaSettings.COMPRESS_BOX, f"Unknown compression template: {template}"
+            template_dirs = np.identity(dims)
+        template_bounds = self._input_effects_template_bounds(template_dirs)
+
+        row_map = lputil.compress_input_effects(self.lpi, template_dirs, self.mode, template_bounds)
+
+        self.invariant_constraint_rows = [None if row is None else row_map[row] \
+                                          for row in self.invariant_constraint_rows]
+
+        # the new variables are the total input effects so far
+        self.input_effects_list = [np.identity(dims)]
+        self.uncompressed_input_steps = 0
+
+        if self.invariant_ie_projections is not None:
+            self.invariant_ie_projections.reset(self.input_effects_list)
+
+        if template_bounds is not None:
+            self.compressed_bounds = (template_dirs, template_bounds[0], template_bounds[1])
+        else:
+            self.compressed_bounds = None
+
+        # the lp is now an overapproximation of the reachable states
+        self.is_concrete = False
+        self._verts = None
+
+    def _input_effects_template_bounds(self, template_dirs):
+        '''compute the template bounds of the total input effects using support functions of the input set, rather
+        than solving lps
+
+        This ignores the constraints that couple the inputs to the other variables (invariant constraints), so it's
+        slightly more conservative than the lp bounds. It requires box input constraints and no lgg approximation.
+
+        returns a pair (lower, upper) of 1-d np.arrays, or None if closed-form bounds cannot be computed
+        '''
+
+        input_box = lputil.get_input_box(self.mode.u_constraints_csc, self.mode.u_constraints_rhs)
+        ie_list = self.input_effects_list
+        rv = None
+
+        if input_box is not None and self.lgg_beta is None:
+            num_dirs = template_dirs.shape[0]
+            lower = np.zeros(num_dirs)
+            upper = np.zeros(num_dirs)
+
+            if self.compressed_bounds is not None:
+                prev_dirs, prev_lower, prev_upper = self.compressed_bounds
+
+                # the template constraints bound the previously-compressed input effects in each template direction
+                if not np.array_equal(prev_dirs, template_dirs):
+                    ie_list = None
+                else:
+                    ie_list = ie_list[1:]
+                    lower += prev_lower
+                    upper += prev_upper
+
+            if ie_list is not None:
+                if ie_list:
+                    u_lower = np.tile(input_box[0], len(ie_list))
+                    u_upper = np.tile(input_box[1], len(ie_list))
+                    proj = np.dot(template_dirs, np.hstack(ie_list))
+
+                    lower += np.minimum(proj * u_lower, proj * u_upper).sum(axis=1)
+                    upper += np.maximum(proj * u_lower, proj * u_upper).sum(axis=1)
+
+                rv = (lower, upper)
+
+        return rv
 
     def verts(self, plotman, subplot=0):
         'get the vertices for plotting this state set, wraps around so rv[0] == rv[-1]'
@@ -181,8 +765,11 @@ class StateSet(Freezable):
                             self.mode.name)
                         self.ydim[i] = self.ydim[i][self.mode.name]
 
+            star = self.star if self.star is not None and self.star.is_exact() else None
+
             self._verts[subplot] = lpplot.get_verts(self.lpi, xdim=self.xdim[subplot], ydim=self.ydim[subplot], \
-                                           plot_vecs=plotman.plot_vec_list[subplot], cur_time=time_interval)
+                                           plot_vecs=plotman.plot_vec_list[subplot], cur_time=time_interval, \
+                                           star=star)
             
             assert self._verts[subplot] is not None, "verts() was unsat"
             
@@ -336,6 +923,11 @@ class StateSet(Freezable):
         assert self.cur_step_in_mode == 0, "approximation model should be applied before any continuous post operations"
         assert self.mode.time_elapse is not None, "init_time_elapse() must be called before apply_approx_model()"
 
+        if approx_model != HylaaSettings.APPROX_NONE:
+            # the lpi gets replaced
+            self.star = None
+            self.interval_screen = self._make_interval_screen()
+
         if approx_model == HylaaSettings.APPROX_CHULL:
             self.apply_approx_chull()
         elif approx_model == HylaaSettings.APPROX_LGG:
@@ -6,23 +6,37 @@ Time Elapse Computation. This module is primarily responsible for computing
 l * e^{At} where l is some direction of interest, and t is a multiple of some time step
 """
 
+import bisect
+from collections import OrderedDict
+
 import numpy as np
+from scipy.linalg import orth
 
 from hylaa.util import Freezable
 from hylaa.timerutil import Timers
-from hylaa.time_elapse_expm import TimeElapseExpmMult
+from hylaa.settings import TimeElapseSettings
+from hylaa.time_elapse_expm import TimeElapseExpmMult, TimeElapseOutputSpace
+
+STEP_TIMER = Timers.register('step')
 
 class TimeElapser(Freezable):
     """Object which computes the time-elapse function for a single mode at multiples of the time step
     """
 
-    def __init__(self, mode, step_size):
+    def __init__(self, mode, step_size, settings=None):
         self.mode = mode
         self.step_size = step_size
+        self.settings = settings if settings is not None else TimeElapseSettings()
         self.dims = self.mode.a_csr.shape[0]
         self.inputs = 0 if self.mode.b_csr is None else self.mode.b_csr.shape[1]
 
         self.time_elapse_obj = None
+        self.output_space_mat = None # orthonormal basis of the output directions, assigned in use_output_space()
+
+        # step-indexed cache of computed matrices, step -> (basis_matrix, input_effects_matrix), in lru order
+        self.cache = OrderedDict()
+        self.cached_steps = [] # sorted list of the keys in self.cache
+        self.cache_bytes = 0
 
         self.freeze_attrs()
 
@@ -35,16 +49,20 @@ class TimeElapser(Freezable):
         """
 
         if self.time_elapse_obj is None:
-            Timers.tic('init time_elapse_obj')
-            self.time_elapse_obj = TimeElapseExpmMult(self)
-            Timers.toc('init time_elapse_obj')
+            self._init_time_elapse_obj()
 
-        Timers.tic('step')
-        self.time_elapse_obj.assign_basis_matrix(step_num)
-        Timers.toc('step')
+        STEP_TIMER.tic()
+        entry = self.cache.get(step_num)
 
-        basis_mat = self.time_elapse_obj.cur_basis_matrix
-        input_effects_mat = self.time_elapse_obj.cur_input_effects_matrix
+        if entry is not None:
+            self.cache.move_to_end(step_num)
+            basis_mat, input_effects_mat = entry
+        else:
+            self._assign_uncached(step_num)
+
+            basis_mat = self.time_elapse_obj.cur_basis_matrix
+            input_effects_mat = self.time_elapse_obj.cur_input_effects_matrix
+        STEP_TIMER.toc()
 
         # post-conditions check
         assert isinstance(basis_mat, np.ndarray), "cur_basis_mat should be an np.array, " + \
@@ -65,9 +83,129 @@ class TimeElapser(Freezable):
 
         return basis_mat, input_effects_mat
 
+    def _init_time_elapse_obj(self):
+        """create the object which computes the basis matrices"""
+
+        Timers.tic('init time_elapse_obj')
+
+        if self.output_space_mat is None:
+            self.time_elapse_obj = TimeElapseExpmMult(self)
+        else:
+            self.time_elapse_obj = TimeElapseOutputSpace(self, self.output_space_mat)
+
+        Timers.toc('init time_elapse_obj')
+
+    def get_one_step_matrices(self):
+        """Get the one-step matrix exponential and input effects matrix, used for simulation
+
+        These are the full-space, discrete-time matrices, also if basis matrices are computed in the output space or
+        with the lgg approximation model.
+
+            :returns: (one_step_matrix_exp, one_step_input_effects_matrix), the second is None without inputs
+            :rtype: tuple
+        """
+
+        if self.time_elapse_obj is None:
+            self._init_time_elapse_obj()
+
+        obj = self.time_elapse_obj
+
+        if isinstance(obj, TimeElapseOutputSpace):
+            obj = obj.expm_mult
+        elif obj.use_lgg:
+            obj = TimeElapseExpmMult(self) # the lgg model replaces the one-step input effects matrix
+
+        if obj.one_step_matrix_exp is None:
+            obj.init_matrices()
+
+        return obj.one_step_matrix_exp, obj.one_step_input_effects_matrix
+
+    def _assign_uncached(self, step_num):
+        """assign the time_elapse_obj to the given step, which is not in the cache
+
+        rather than computing a fresh matrix exponential for out-of-order steps, this
+        advances from the nearest earlier step (cached or current) using matrix multiplication,
+        caching the intermediate steps along the way
+        """
+
+        obj = self.time_elapse_obj
+        max_steps = self.settings.cache_max_multiply_steps
+
+        # the nearest earlier step is either the current step of obj or a cached step
+        base = obj.cur_step if obj.cur_basis_matrix is not None and obj.cur_step < step_num else -1
+        index = bisect.bisect_left(self.cached_steps, step_num)
+
+        if index > 0 and self.cached_steps[index - 1] > base:
+            base = self.cached_steps[index - 1]
+
+            if step_num - base <= max_steps:
+                obj.set_cur_step(base, *self.cache[base])
+
+        if base >= 0 and step_num - base <= max_steps:
+            for step in range(base + 1, step_num):
+                obj.assign_basis_matrix(step)
+                self._cache_insert(step, obj.cur_basis_matrix, obj.cur_input_effects_matrix)
+
+        obj.assign_basis_matrix(step_num)
+        self._cache_insert(step_num, obj.cur_basis_matrix, obj.cur_input_effects_matrix)
+
+    def _cache_insert(self, step_num, basis_mat, input_effects_mat):
+        'insert an entry into the cache, evicting the least-recently used entries if over the memory budget'
+
+        max_bytes = self.settings.cache_max_mb * 1024 * 1024
+        num_bytes = basis_mat.nbytes + (0 if input_effects_mat is None else input_effects_mat.nbytes)
+
+        if num_bytes <= max_bytes and step_num not in self.cache:
+            self.cache[step_num] = (basis_mat, input_effects_mat)
+            bisect.insort(self.cached_steps, step_num)
+            self.cache_bytes += num_bytes
+
+            while self.cache_bytes > max_bytes:
+                step, (bm, ie) = self.cache.popitem(last=False)
+                del self.cached_steps[bisect.bisect_left(self.cached_steps, step)]
+                self.cache_bytes -= bm.nbytes + (0 if ie is None else ie.nbytes)
+
+    def clear_cache(self):
+        'clear the cached basis and input effects matrices'
+
+        self.cache.clear()
+        self.cached_steps = []
+        self.cache_bytes = 0
+
+    def use_output_space(self, output_dirs):
+        """Compute basis matrices only along the passed-in output directions (the rows of a 2-d np.array)
+
+        The resulting basis matrices are only correct when multiplied by vectors in the span of the
+        output directions. This must be called before any basis matrices are computed.
+
+            :param output_dirs: 2-d np.array of directions
+            :returns: True if output-space computation will be used, or False if the output directions span
+                      too much of the state space for it to be worthwhile
+            :rtype: bool
+        """
+
+        assert self.time_elapse_obj is None, "use_output_space() must be called before computing basis matrices"
+        assert output_dirs.shape[1] == self.dims
+
+        if output_dirs.shape[0] == 0:
+            q_mat = np.zeros((self.dims, 0), dtype=float)
+        else:
+            q_mat = orth(output_dirs.transpose())
+
+        rv = q_mat.shape[1] <= self.settings.output_space_max_fraction * self.dims
+
+        if rv:
+            self.output_space_mat = q_mat
+
+        return rv
+
     def use_lgg_approx(self):
         """
         Set this TimeElapser object to use the lgg approximation model
         """
 
-        self.time_elapse_obj.use_lgg_approx()
+        if not self.time_elapse_obj.use_lgg: # may be called once for each state, in each mode sharing this object
+            self.time_elapse_obj.use_lgg_approx()
+
+            # cached input effects matrices were computed without the lgg model
+            self.clear_cache()
@@ -12,6 +12,10 @@ import numpy as np
 
 from hylaa.util import Freezable
 from hylaa.timerutil import Timers
+from hylaa import expm_cache
+
+INIT_MATRICES_TIMER = Timers.register('init_matrices')
+QUICK_STEP_TIMER = Timers.register('quick_step')
 
 class TimeElapseExpmMult(Freezable):
     """Container object for expm + matrix-vec multiplication routines"""
@@ -39,7 +43,30 @@ class TimeElapseExpmMult(Freezable):
         self.freeze_attrs()
 
     def init_matrices(self):
-        """Initializes the one-step basis and input effects matrices
+        """Initializes the one-step basis and input effects matrices, loading them from the disk cache
+        if settings.disk_cache_dir is set
+
+        """
+
+        settings = self.time_elapser.settings
+        cache_key = None
+
+        if settings.disk_cache_dir is not None:
+            cache_key = expm_cache.get_key(self.a_csc, self.b_csc, self.time_elapser.step_size)
+            entry = expm_cache.load(settings.disk_cache_dir, cache_key, self.b_csc is not None)
+
+            if entry is not None:
+                self.one_step_matrix_exp, self.one_step_input_effects_matrix = entry
+                return
+
+        self.compute_matrices()
+
+        if cache_key is not None:
+            expm_cache.store(settings.disk_cache_dir, cache_key, self.one_step_matrix_exp,
+                             self.one_step_input_effects_matrix, settings.disk_cache_max_mb)
+
+    def compute_matrices(self):
+        """Computes the one-step basis and input effects matrices
 
         """
 
@@ -87,10 +114,10 @@ class TimeElapseExpmMult(Freezable):
         :type step_num: int
         """
 
-        Timers.tic('init_matrices')
+        INIT_MATRICES_TIMER.tic()
         if self.one_step_matrix_exp is None:
             self.init_matrices()
-        Timers.toc('init_matrices')
+        INIT_MATRICES_TIMER.toc()
 
         if step_num == 0: # step zero, basis matrix is identity matrix
             self.cur_basis_matrix = np.identity(self.dims, dtype=float)
@@ -106,7 +133,7 @@ class TimeElapseExpmMult(Freezable):
                 self.cur_input_effects_matrix = np.concatenate(blocks, axis=1)
 
         elif step_num == self.cur_step + 1:
-            Timers.tic('quick_step')
+            QUICK_STEP_TIMER.tic()
             prev_step_mat_exp = self.cur_basis_matrix
             self.cur_basis_matrix = np.dot(self.cur_basis_matrix, self.one_step_matrix_exp)
 
@@ -123,7 +150,7 @@ class TimeElapseExpmMult(Freezable):
                     blocks = [self.cur_input_effects_matrix, prev_step_mat_exp]
                     self.cur_input_effects_matrix = np.concatenate(blocks, axis=1)
 
-            Timers.toc('quick_step')
+            QUICK_STEP_TIMER.toc()
         else:
             Timers.tic('slow_step')
 
@@ -150,9 +177,123 @@ class TimeElapseExpmMult(Freezable):
 
         self.cur_step = step_num
 
+    def set_cur_step(self, step_num, basis_matrix, input_effects_matrix):
+        """
+        Restores the current step from previously-computed matrices (for example, from a cache), so that
+        later steps can be computed using matrix multiplication
+
+        :param step_num: step number of the passed-in matrices
+        :param basis_matrix: basis matrix at step_num
+        :param input_effects_matrix: input effects matrix at step_num (None if no inputs)
+        """
+
+        self.cur_step = step_num
+        self.cur_basis_matrix = basis_matrix
+        self.cur_input_effects_matrix = input_effects_matrix
+
     def use_lgg_approx(self):
         """
         Sets this TimeElapseExpmMult object to use lgg approximation model
         """
         self.use_lgg = True
         self.one_step_input_effects_matrix = self.b_csc.toarray() * self.time_elapser.step_size
+
+class TimeElapseOutputSpace(Freezable):
+    """Container object for computing the basis matrix only along a mode's output directions
+
+    The output directions are the directions used by the lp (invariants, guards, resets and plots). With the columns
+    of q_mat an orthonormal basis for the output directions (n x k), this propagates the k x n projection
+    P = Q^T * e^{At} rather than the full n x n matrix, and assigns the basis matrix Q * P, which is equal
+    to e^{At} when multiplied by any output direction. Input effects matrices are projected in the same way.
+    """
+
+    def __init__(self, time_elapser, q_mat):
+        """
+        :param time_elapser: TimeElapser object
+        :param q_mat: n x k matrix with orthonormal columns spanning the output directions
+        """
+
+        self.time_elapser = time_elapser
+        self.q_mat = q_mat
+        self.dims = time_elapser.dims
+
+        # the one-step matrices are computed in the same way as the full-space method
+        self.expm_mult = TimeElapseExpmMult(time_elapser)
+
+        self.cur_step = 0
+        self.cur_projected = None # Q^T * e^{A * cur_step * step_size}
+        self.cur_basis_matrix = None
+        self.cur_input_effects_matrix = None
+
+        self.use_lgg = False # lgg approximation model is not supported in output space
+
+        self.freeze_attrs()
+
+    def assign_basis_matrix(self, step_num):
+        """
+        Computes the (projected) basis and input effects matrices for the desired time step.
+        Consecutive steps use a k x n by n x n multiplication, other steps use expm_multiply on the transposed
+        dynamics.
+
+        :param step_num: step number to compute
+        :type step_num: int
+        """
+
+        expm_mult = self.expm_mult
+
+        INIT_MATRICES_TIMER.tic()
+        if expm_mult.one_step_matrix_exp is None:
+            expm_mult.init_matrices()
+        INIT_MATRICES_TIMER.toc()
+
+        if step_num == 0:
+            prev_projected = None
+            self.cur_projected = self.q_mat.transpose().copy()
+        elif step_num == self.cur_step + 1 and self.cur_projected is not None:
+            QUICK_STEP_TIMER.tic()
+            prev_projected = self.cur_projected
+            self.cur_projected = np.dot(prev_projected, expm_mult.one_step_matrix_exp)
+            QUICK_STEP_TIMER.toc()
+        else:
+            Timers.tic('slow_step')
+            # compute one step behind, because this is what's used by input effects matrix
+            at_csc = expm_mult.a_csc.transpose() * ((step_num - 1) * self.time_elapser.step_size)
+            prev_projected = expm_multiply(at_csc, self.q_mat).transpose()
+
+            self.cur_projected = np.dot(prev_projected, expm_mult.one_step_matrix_exp)
+            Timers.toc('slow_step')
+
+        if step_num == 0:
+            self.cur_basis_matrix = np.identity(self.dims, dtype=float)
+            self.cur_input_effects_matrix = None
+        else:
+            Timers.tic('unproject')
+            self.cur_basis_matrix = np.dot(self.q_mat, self.cur_projected)
+
+            if expm_mult.b_csc is not None:
+                projected_ie = np.dot(prev_projected, expm_mult.one_step_input_effects_matrix)
+                self.cur_input_effects_matrix = np.dot(self.q_mat, projected_ie)
+            Timers.toc('unproject')
+
+        self.cur_step = step_num
+
+    def set_cur_step(self, step_num, basis_matrix, input_effects_matrix):
+        """
+        Restores the current step from previously-computed matrices (for example, from a cache)
+
+        :param step_num: step number of the passed-in matrices
+        :param basis_matrix: (projected) basis matrix at step_num
+        :param input_effects_matrix: input effects matrix at step_num (None if no inputs)
+        """
+
+        self.cur_step = step_num
+        self.cur_basis_matrix = basis_matrix
+        self.cur_input_effects_matrix = input_effects_matrix
+
+        # Q^T * Q * P = P, since Q has orthonormal columns
+        self.cur_projected = np.dot(self.q_mat.transpose(), basis_matrix)
+
+    def use_lgg_approx(self):
+        'lgg approximation model is not supported for output-space computation'
+
+        raise RuntimeError("lgg approximation model cannot be used with output-space basis matrix computation")
@@ -4,12 +4,27 @@
 
 Timer utility functions for Hylaa. Timers are used for performance analysis and
 can be statically referred to using Timers.tic(name) and Timers.toc(name)
+
+In frequently-called code, a TimerHandle from Timers.register(name) can be used instead, which skips the lookup
+of the timer by name. Timers also keeps counters (Timers.count()) and histograms (Timers.record_histogram()).
+
+All instrumentation can be turned off with Timers.set_enabled(False), or by setting the environment variable
+HYLAA_TIMERS=0 before importing hylaa, in which case tic(), toc() and the counting functions do nothing.
+
+The timers can be exported as json using TimerData.to_dict(), and Timers.start_trace() records a timeline of
+selected timers, which can be saved in the Chrome trace_event format (viewable in chrome://tracing or Perfetto).
 """
 
-import time
+import json
+import math
+import os
+from time import perf_counter_ns
 
 from termcolor import cprint
 
+def _noop(*_args):
+    'replaces the timing functions when timers are disabled'
+
 class TimerData():
     """Performance timer object which can be started with the tic() method and paused with toc() method
 
@@ -20,12 +35,19 @@ class TimerData():
         assert parent is None or isinstance(parent, TimerData)
 
         self.name = name
-        self.total_secs = 0
+        self.total_ns = 0
         self.num_calls = 0
-        self.last_start_time = None
+        self.last_start_ns = None # time.perf_counter_ns() when started, None if stopped
 
         self.parent = parent # parent TimerData, None for top-level timers
         self.children = [] # a list of child TimerData
+        self.children_by_name = {} # name -> child TimerData
+
+    @property
+    def total_secs(self):
+        'the total time in seconds'
+
+        return self.total_ns / 1e9
 
     def get_child(self, name):
         """Get a child timer with the given name
@@ -35,12 +57,19 @@ class TimerData():
             :rtype: TimerData
         """
 
-        rv = None
+        return self.children_by_name.get(name)
 
-        for child in self.children:
-            if child.name == name:
-                rv = child
-                break
+    def add_child(self, name):
+        """Add a child timer with the given name
+
+            :param name: name
+            :returns: the new TimerData object
+            :rtype: TimerData
+        """
+
+        rv = TimerData(name, self)
+        self.children.append(rv)
+        self.children_by_name[name] = rv
 
         return rv
 
@@ -78,11 +107,11 @@ class TimerData():
 
         #print "Tic({})".format(self.name)
 
-        if self.last_start_time is not None:
+        if self.last_start_ns is not None:
             raise RuntimeError("Timer started twice: {}".format(self.name))
 
         self.num_calls += 1
-        self.last_start_time = time.perf_counter()
+        self.last_start_ns = perf_counter_ns()
 
     def toc(self):
         """Stop the timer. Add elapsed time to counter of total number of seconds.
@@ -91,11 +120,214 @@ class TimerData():
 
         #print "Toc({})".format(self.name)
 
-        if self.last_start_time is None:
+        if self.last_start_ns is None:
             raise RuntimeError("Timer stopped without being started: {}".format(self.name))
 
-        self.total_secs += time.perf_counter() - self.last_start_time
-        self.last_start_time = None
+        self.total_ns += perf_counter_ns() - self.last_start_ns
+        self.last_start_ns = None
+
+    def to_dict(self):
+        """Get the timer and its descendants as a json-serializable dict
+
+            :returns: dict with the name, total_secs, self_secs (time not in any child timer), num_calls and
+                      children (a list of dicts)
+            :rtype: dict
+        """
+
+        children = [child.to_dict() for child in self.children]
+
+        return {'name': self.name, 'total_secs': self.total_secs,
+                'self_secs': self.total_secs - sum(child['total_secs'] for child in children),
+                'num_calls': self.num_calls, 'children': children}
+
+    def __getstate__(self):
+        # children_by_name is rebuilt when unpickling, rather than saved twice
+        rv = self.__dict__.copy()
+        del rv['children_by_name']
+
+        return rv
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.children_by_name = {child.name: child for child in self.children}
+
+class TimerHandle():
+    """A pre-registered timer name (see Timers.register()), which can be started and stopped without looking up
+    the timer by name, as long as it's started from the same parent timer as the last time.
+    """
+
+    __slots__ = ['name', 'parent', 'timer']
+
+    def __init__(self, name):
+        self.name = name
+        self.parent = None # the parent TimerData when last started
+        self.timer = None # the TimerData when last started
+
+    def tic(self):
+        'start the timer, like Timers.tic(name)'
+
+        stack = Timers.stack
+
+        if stack and stack[-1] is self.parent:
+            # same as TimerData.tic(), inlined since this is the common case
+            td = self.timer
+
+            if td.last_start_ns is not None:
+                raise RuntimeError("Timer started twice: {}".format(td.name))
+
+            td.num_calls += 1
+            stack.append(td)
+            td.last_start_ns = perf_counter_ns()
+
+            if Timers.trace is not None:
+                Timers.trace.timer_started(td)
+        else:
+            Timers.tic(self.name)
+
+            if len(stack) > 1:
+                self.parent = stack[-2]
+                self.timer = stack[-1]
+
+    def toc(self):
+        'stop the timer, like Timers.toc(name)'
+
+        end_ns = perf_counter_ns()
+        stack = Timers.stack
+        td = stack[-1]
+
+        assert td.name == self.name, "Out of order toc(). Expected to first stop timer {}".format(td.full_name())
+
+        if Timers.trace is not None:
+            Timers.trace.timer_stopped(td)
+
+        stack.pop()
+
+        # same as TimerData.toc(), a timer on the stack is always running
+        td.total_ns += end_ns - td.last_start_ns
+        td.last_start_ns = None
+
+class Histogram():
+    """Summary of recorded values (for example lp sizes), with the number of values in each power-of-two bucket
+    """
+
+    def __init__(self):
+        self.num_values = 0
+        self.total = 0
+        self.min_value = math.inf
+        self.max_value = -math.inf
+
+        # exponent e -> number of values in [2^(e-1), 2^e), using the exponent from math.frexp()
+        self.buckets = {}
+        self.num_nonpositive = 0 # number of values <= 0, which are not in any bucket
+
+    def add(self, value):
+        'add a value to the histogram'
+
+        self.num_values += 1
+        self.total += value
+        self.min_value = min(self.min_value, value)
+        self.max_value = max(self.max_value, value)
+
+        if value > 0:
+            exponent = math.frexp(value)[1]
+            self.buckets[exponent] = self.buckets.get(exponent, 0) + 1
+        else:
+            self.num_nonpositive += 1
+
+    def mean(self):
+        'get the mean of the values'
+
+        return self.total / self.num_values
+
+    def to_dict(self):
+        'get the histogram as a json-serializable dict, with buckets as a list of [low, high, count]'
+
+        return {'num_values': self.num_values, 'min': self.min_value, 'max': self.max_value, 'mean': self.mean(),
+                'num_nonpositive': self.num_nonpositive,
+                'buckets': [[2.0**(e-1), 2.0**e, self.buckets[e]] for e in sorted(self.buckets)]}
+
+    def __str__(self):
+        buckets = ", ".join("[{:g}, {:g}): {}".format(2.0**(e-1), 2.0**e, self.buckets[e])
+                            for e in sorted(self.buckets))
+
+        if self.num_nonpositive:
+            buckets = "<= 0: {}, ".format(self.num_nonpositive) + buckets
+
+        return "{} values: min {:g}, max {:g}, mean {:.1f}; {}".format(
+            self.num_values, self.min_value, self.max_value, self.mean(), buckets)
+
+class TimerTrace():
+    """A timeline of the spans of selected timers (see Timers.start_trace()), which is saved in the Chrome
+    trace_event format. Each span has the changes of the lp counters during the span as arguments.
+    """
+
+    # counters whose change during a span is added to its arguments
+    COUNTER_NAMES = ['lp solves', 'simplex iterations']
+
+    # histograms whose mean value during a span is added to its arguments
+    HISTOGRAM_NAMES = ['lp rows', 'lp cols']
+
+    def __init__(self, timer_names):
+        self.timer_names = frozenset(timer_names)
+        self.start_ns = perf_counter_ns()
+        self.pid = os.getpid()
+
+        self.events = [] # list of trace_event dicts
+        self.open_spans = {} # TimerData -> (counter values, histogram (count, total) pairs) when started
+
+    def _get_counts(self):
+        'get the current values of the counters and histogram totals used for span arguments'
+
+        counters = [Timers.counters.get(name, 0) for name in TimerTrace.COUNTER_NAMES]
+        histograms = []
+
+        for name in TimerTrace.HISTOGRAM_NAMES:
+            histogram = Timers.histograms.get(name)
+            histograms.append((0, 0) if histogram is None else (histogram.num_values, histogram.total))
+
+        return counters, histograms
+
+    def timer_started(self, td):
+        'called by Timers.tic() when a timer is started'
+
+        if td.name in self.timer_names:
+            self.open_spans[td] = self._get_counts()
+
+    def timer_stopped(self, td):
+        'called by Timers.toc() before a timer is stopped'
+
+        start_counts = self.open_spans.pop(td, None)
+
+        if start_counts is not None:
+            end_ns = perf_counter_ns()
+            args = {}
+
+            end_counts = self._get_counts()
+
+            for name, start, end in zip(TimerTrace.COUNTER_NAMES, start_counts[0], end_counts[0]):
+                if end > start:
+                    args[name] = end - start
+
+            for name, (start_num, start_total), (end_num, end_total) in \
+                    zip(TimerTrace.HISTOGRAM_NAMES, start_counts[1], end_counts[1]):
+                if end_num > start_num:
+                    args['mean ' + name] = (end_total - start_total) / (end_num - start_num)
+
+            # trace_event times are in microseconds
+            self.events.append({'name': td.name, 'cat': 'hylaa', 'ph': 'X', 'pid': self.pid, 'tid': 0,
+                                'ts': (td.last_start_ns - self.start_ns) / 1000,
+                                'dur': (end_ns - td.last_start_ns) / 1000, 'args': args})
+
+    def to_dict(self):
+        'get the trace as a dict in the Chrome trace_event (json object) format'
+
+        return {'traceEvents': self.events, 'displayTimeUnit': 'ms'}
+
+    def save(self, filename):
+        'save the trace to a json file, which can be loaded in chrome://tracing or Perfetto'
+
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
 
 class Timers():
     """
@@ -106,6 +338,16 @@ class Timers():
 
     stack = [] # stack of currently-running timers, parents at the start, children at the end
 
+    stats = {} # name -> list of recorded values (for example, lp sizes), printed after the timers
+
+    counters = {} # name -> int count (for example, the number of lps solved)
+
+    histograms = {} # name -> Histogram
+
+    enabled = True # changed with set_enabled()
+
+    trace = None # TimerTrace, assigned in start_trace()
+
     def __init__(self):
         raise RuntimeError('Timers is a static class; should not be instantiated')
 
@@ -115,6 +357,50 @@ class Timers():
 
         Timers.top_level_timer = None
         Timers.stack = []
+        Timers.stats = {}
+        Timers.counters = {}
+        Timers.histograms = {}
+        Timers.trace = None
+
+    @staticmethod
+    def start_trace(timer_names):
+        """Start recording a timeline (a TimerTrace, assigned to Timers.trace) of the spans of the passed-in timers.
+        This includes timers started and stopped with a TimerHandle.
+
+            :param timer_names: the names of the timers to record
+            :returns: the TimerTrace object
+        """
+
+        Timers.trace = TimerTrace(timer_names)
+
+        return Timers.trace
+
+    @staticmethod
+    def set_enabled(enabled):
+        """Enable or disable timers, counters and histograms. When disabled, the timing and counting functions
+        (including those of TimerHandle objects) are replaced by functions that do nothing.
+
+            :param enabled: True to enable, False to disable
+        """
+
+        Timers.enabled = enabled
+
+        for name, func in _ENABLED_FUNCS.items():
+            setattr(Timers, name, staticmethod(func if enabled else _noop))
+
+        TimerHandle.tic = _ENABLED_HANDLE_FUNCS['tic'] if enabled else _noop
+        TimerHandle.toc = _ENABLED_HANDLE_FUNCS['toc'] if enabled else _noop
+
+    @staticmethod
+    def register(name):
+        """Get a TimerHandle for the timer with the given name, which is faster than Timers.tic(name) and
+        Timers.toc(name) for frequently-called code.
+
+            :param name: name of timer
+            :returns: TimerHandle object
+        """
+
+        return TimerHandle(name)
 
     @staticmethod
     def tic(name):
@@ -125,7 +411,14 @@ class Timers():
 
         #print("Tic({})".format(name))
 
-        if not Timers.stack:
+        stack = Timers.stack
+
+        if stack:
+            td = stack[-1].children_by_name.get(name)
+
+            if td is None:
+                td = stack[-1].add_child(name)
+        else:
             top = Timers.top_level_timer
 
             if top is not None and top.name != name:
@@ -134,21 +427,16 @@ class Timers():
                 top = Timers.top_level_timer = None
 
             td = top
-        else:
-            td = Timers.stack[-1].get_child(name)
 
-        # create timer object if it doesn't exist
-        if td is None:
-            parent = None if not Timers.stack else Timers.stack[-1]
-            td = TimerData(name, parent)
-
-            if not Timers.stack:
-                Timers.top_level_timer = td
-            else:
-                Timers.stack[-1].children.append(td)
+            # create timer object if it doesn't exist
+            if td is None:
+                td = Timers.top_level_timer = TimerData(name, None)
 
         td.tic()
-        Timers.stack.append(td)
+        stack.append(td)
+
+        if Timers.trace is not None:
+            Timers.trace.timer_started(td)
 
     @staticmethod
     def toc(name):
@@ -159,17 +447,73 @@ class Timers():
 
         #print("Toc({})".format(name))
 
-        assert Timers.stack[-1].name == name, "Out of order toc(). Expected to first stop timer {}".format(
-            Timers.stack[-1].full_name())
+        td = Timers.stack[-1]
+
+        assert td.name == name, "Out of order toc(). Expected to first stop timer {}".format(td.full_name())
 
-        Timers.stack[-1].toc()
+        if Timers.trace is not None:
+            Timers.trace.timer_stopped(td)
+
+        td.toc()
         Timers.stack.pop()
 
+    @staticmethod
+    def record_stat(name, value):
+        """Record a value for a named statistic (not a time), which is summarized in print_stats()
+
+            :param name: name of the statistic
+            :param value: numeric value to record
+        """
+
+        values = Timers.stats.get(name)
+
+        if values is None:
+            values = Timers.stats[name] = []
+
+        values.append(value)
+
+    @staticmethod
+    def count(name, amount=1):
+        """Increment a named counter
+
+            :param name: name of the counter
+            :param amount: amount to add
+        """
+
+        counters = Timers.counters
+        counters[name] = counters.get(name, 0) + amount
+
+    @staticmethod
+    def record_histogram(name, value):
+        """Add a value to a named Histogram. Unlike record_stat(), the values are not kept individually.
+
+            :param name: name of the histogram
+            :param value: numeric value to add
+        """
+
+        histogram = Timers.histograms.get(name)
+
+        if histogram is None:
+            histogram = Timers.histograms[name] = Histogram()
+
+        histogram.add(value)
+
     @staticmethod
     def print_stats():
         'Print statistics about TimerData objects to stdout'
 
-        Timers.print_stats_recursive(Timers.top_level_timer, 0, None)
+        if Timers.top_level_timer is not None:
+            Timers.print_stats_recursive(Timers.top_level_timer, 0, None)
+
+        for name, values in Timers.stats.items():
+            print("{} ({} values): min {}, max {}, mean {:.1f}, last {}".format(name.capitalize(), len(values), \
+                min(values), max(values), sum(values) / len(values), values[-1]))
+
+        for name, value in Timers.counters.items():
+            print("{}: {}".format(name.capitalize(), value))
+
+        for name, histogram in Timers.histograms.items():
+            print("{} ({})".format(name.capitalize(), histogram))
 
     @staticmethod
     def print_stats_recursive(td, level, total_time):
@@ -190,6 +534,7 @@ class Timers():
         percent_total = 100 * td.total_secs / total_time
 
         if percent_total < low_threshold:
+            def print_func(text):
                 'below threshold print function'
 
                 return cprint(text, 'grey')
@@ -204,7 +549,7 @@ class Timers():
 
                 return cprint(text, None)
 
-        if td.last_start_time is not None:
+        if td.last_start_ns is not None:
             raise RuntimeError("Timer was never stopped: {}".format(td.name))
 
         if td.parent is None:
@@ -250,3 +595,10 @@ class Timers():
 
             other_print_func("{}Other: {:.2f} sec{}".format(" " * (level + 1) * 2, \
                 other, percent_str))
+
+# the timing and counting functions used when timers are enabled, see Timers.set_enabled()
+_ENABLED_FUNCS = {name: getattr(Timers, name) for name in ['tic', 'toc', 'record_stat', 'count', 'record_histogram']}
+_ENABLED_HANDLE_FUNCS = {'tic': TimerHandle.tic, 'toc': TimerHandle.toc}
+
+if os.environ.get('HYLAA_TIMERS') == '0':
+    Timers.set_enabled(False)
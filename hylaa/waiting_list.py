@@ -0,0 +1,139 @@
+'''
+Waiting list of OpTransition objects, used by the AggDag and the aggregation strategies
+
+The ops are kept in a heap ordered by a key (from AggregationStrategy.get_pop_key()), with indexes by mode and by path
+(parent node and transition), so the aggregation strategy can find the next op to pop and the ops to aggregate with
+it without scanning the whole waiting list. Removal is O(log n) amortized: removed heap entries are discarded when
+they reach the top of the heap, and the heap is rebuilt if too many removed entries accumulate.
+
+Iteration is in insertion order, like the list that was used before.
+'''
+
+import heapq
+
+from hylaa.util import Freezable
+
+class WaitingList(Freezable):
+    'a waiting list of OpTransition objects with a priority heap and indexes by mode and path'
+
+    def __init__(self, key_func):
+        self.key_func = key_func # op -> key, the op with the smallest key is popped first (ties: insertion order)
+
+        self.entries = {} # op -> heap entry [key, insertion index, op]; dicts keep the insertion order
+        self.heap = [] # heap of entries, removed entries have op None
+        self.next_index = 0
+
+        self.mode_ops = {} # mode -> {op: None}
+        self.path_ops = {} # parent_node -> {transition -> {op: None}}
+        self.branching_nodes = {} # {parent_node: None} for parent nodes of ops with more than one transition
+
+        self.freeze_attrs()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(list(self.entries))
+
+    def __contains__(self, op):
+        return op in self.entries
+
+    def append(self, op):
+        'add an op to the waiting list'
+
+        assert op not in self.entries, "op was already in the waiting list"
+
+        entry = [self.key_func(op), self.next_index, op]
+        self.next_index += 1
+
+        self.entries[op] = entry
+        heapq.heappush(self.heap, entry)
+
+        self.mode_ops.setdefault(op.poststate.mode, {})[op] = None
+
+        transition_ops = self.path_ops.setdefault(op.parent_node, {})
+        transition_ops.setdefault(op.transition, {})[op] = None
+
+        if len(transition_ops) > 1:
+            self.branching_nodes[op.parent_node] = None
+
+    def remove(self, op):
+        'remove an op from the waiting list'
+
+        entry = self.entries.pop(op)
+        entry[2] = None
+
+        mode = op.poststate.mode
+        ops = self.mode_ops[mode]
+        del ops[op]
+
+        if not ops:
+            del self.mode_ops[mode]
+
+        transition_ops = self.path_ops[op.parent_node]
+        ops = transition_ops[op.transition]
+        del ops[op]
+
+        if not ops:
+            del transition_ops[op.transition]
+
+            if not transition_ops:
+                del self.path_ops[op.parent_node]
+            elif len(transition_ops) == 1:
+                self.branching_nodes.pop(op.parent_node, None)
+
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = list(self.entries.values())
+            heapq.heapify(self.heap)
+
+    def peek(self):
+        'get the op with the smallest key (which would be popped next), or None if the waiting list is empty'
+
+        heap = self.heap
+
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+
+        return heap[0][2] if heap else None
+
+    def get_insertion_index(self, op):
+        'get the insertion index of an op in the waiting list (ops added later have larger indices)'
+
+        return self.entries[op][1]
+
+    def get_modes(self):
+        'get the modes of the states in the waiting list'
+
+        return list(self.mode_ops)
+
+    def get_mode_ops(self, mode):
+        'get the ops whose poststate is in the given mode, in insertion order'
+
+        return list(self.mode_ops.get(mode, ()))
+
+    def get_path_ops(self, parent_node, transition):
+        'get the ops with the given parent node and transition, in insertion order'
+
+        return list(self.path_ops.get(parent_node, {}).get(transition, ()))
+
+    def get_node_transitions(self, parent_node):
+        'get the transitions of the ops with the given parent node'
+
+        return list(self.path_ops.get(parent_node, ()))
+
+    def get_node_ops(self, parent_node):
+        'get the ops with the given parent node (for any transition), in insertion order'
+
+        ops = [op for ops in self.path_ops.get(parent_node, {}).values() for op in ops]
+
+        return sorted(ops, key=self.get_insertion_index)
+
+    def has_parent_node(self, parent_node):
+        'are there any ops in the waiting list with the given parent node?'
+
+        return parent_node in self.path_ops
+
+    def get_branching_nodes(self):
+        'get the parent nodes of ops in the waiting list with more than one outgoing transition'
+
+        return list(self.branching_nodes)
@@ -18,6 +18,8 @@ from hylaa.stateset import StateSet
 from hylaa import lputil, lpplot
 from hylaa.aggdag import OpTransition, AggDagNode
 from hylaa.aggstrat import Aggregated
+from hylaa.lppool import LpPool
+from hylaa.waiting_list import WaitingList
 
 from util import pair_almost_in, assert_verts_is_box
 
@@ -182,6 +184,32 @@ def test_aggregate_self():
 
     assert lpi.get_num_rows() == 3 + 3*2
 
+def test_parallel_aggregate():
+    'tests that template aggregation using a process pool gives the same result as the serial version'
+
+    mode = HybridAutomaton().new_mode('mode_name')
+    mode.set_dynamics(np.zeros((4, 4)))
+
+    random.seed(0)
+    lpi_list = []
+
+    for _ in range(3):
+        lpi = lputil.from_box([[x, x + 1] for x in [random.random() for _ in range(4)]], mode)
+        lputil.set_basis_matrix(lpi, expm(np.array([[0, 1, 0, 0], [-1, 0, 0, 0], [0, 0, 0, 2], [0, 0, -2, 0.]])))
+        lpi_list.append(lpi)
+
+    # unit directions and their sums, so the directions are split between the workers
+    agg_dirs = np.array([[1.0 if d in [i, j] else 0.0 for d in range(4)] for i in range(4) for j in range(i, 4)])
+
+    try:
+        serial_lpi = lputil.aggregate(lpi_list, agg_dirs, mode)
+        parallel_lpi = lputil.aggregate(lpi_list, agg_dirs, mode, num_workers=2)
+    finally:
+        LpPool.shutdown()
+
+    assert np.allclose(serial_lpi.get_rhs(), parallel_lpi.get_rhs())
+    assert np.allclose(serial_lpi.get_full_constraints().toarray(), parallel_lpi.get_full_constraints().toarray())
+
 def test_reorthogonalize_matrix():
     'tests the reorthgonalize_matrix function'
 
@@ -790,3 +818,59 @@ def test_chull_one_step_inputs():
 
     # 2 current vars and 2 total input effect vars, so expected to be 4 from the end
     assert chull_lpi.cur_vars_offset == chull_lpi.get_num_cols() - 4, "cur_vars in wrong place"
+
+def test_waiting_list():
+    'test the indexed waiting list used by the Aggregated strategy: pop order, same-path aggregation and removal'
+
+    ha = HybridAutomaton()
+    mode_a = ha.new_mode('a')
+    mode_b = ha.new_mode('b')
+    t1 = ha.new_transition(mode_a, mode_b)
+    t2 = ha.new_transition(mode_a, mode_b)
+
+    lpi = lputil.from_box([[0, 1]], mode_a)
+    parent1 = 'node1' # parent nodes only need to be hashable for the waiting list
+    parent2 = 'node2'
+
+    def make_op(mode, parent, transition, steps, is_concrete=True):
+        'make an op with a poststate at the given [min, max] steps'
+
+        return OpTransition(0, parent, None, transition, StateSet(lpi, mode, steps, is_concrete=is_concrete))
+
+    aggstrat = Aggregated()
+    waiting_list = WaitingList(aggstrat.get_pop_key)
+
+    ops = [make_op(mode_b, parent1, t1, [5, 6]), make_op(mode_b, parent2, t1, [2, 4]),
+           make_op(mode_b, parent1, t1, [3, 3]), make_op(mode_a, None, None, [3, 3]),
+           make_op(mode_b, parent1, t2, [2, 4], is_concrete=False)]
+
+    for op in ops:
+        waiting_list.append(op)
+
+    assert len(waiting_list) == 5 and list(waiting_list) == ops
+
+    # lowest average time first, ties broken by mode name (a < b) then insertion order
+    assert waiting_list.peek() is ops[3]
+    assert aggstrat.pop_waiting_list(waiting_list) == [ops[3]]
+    waiting_list.remove(ops[3])
+
+    assert waiting_list.peek() is ops[1]
+    assert aggstrat.pop_waiting_list(waiting_list) == [ops[1]]
+
+    aggstrat.require_same_path = False
+    assert aggstrat.pop_waiting_list(waiting_list) == [ops[0], ops[1], ops[2], ops[4]]
+    aggstrat.require_same_path = True
+
+    assert waiting_list.get_branching_nodes() == [parent1]
+    assert waiting_list.get_node_ops(parent1) == [ops[0], ops[2], ops[4]]
+    waiting_list.remove(ops[1])
+
+    # ops[2] and ops[4] have the same score, ops[2] was added first; ops[0] is on the same path as ops[2]
+    assert aggstrat.pop_waiting_list(waiting_list) == [ops[0], ops[2]]
+
+    waiting_list.remove(ops[4])
+    assert not waiting_list.get_branching_nodes() and ops[4] not in waiting_list
+
+    waiting_list.remove(ops[0])
+    waiting_list.remove(ops[2])
+    assert not waiting_list and waiting_list.peek() is None and not waiting_list.get_modes()
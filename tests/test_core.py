@@ -2,6 +2,7 @@
 Tests for Hylaa core object. Made for use with py.test
 '''
 
+import os
 import math
 import numpy as np
 
@@ -9,7 +10,10 @@ from hylaa.hybrid_automaton import HybridAutomaton
 from hylaa.stateset import StateSet
 from hylaa.settings import HylaaSettings, PlotSettings
 from hylaa.core import Core
-from hylaa import lputil, lpplot
+from hylaa.simulation import SimBatch, InputSampler
+from hylaa.lpinstance import LpInstance, GlpkLpInstance
+from hylaa.lpinstance_highs import HighsLpInstance
+from hylaa import lputil, lpplot, aggstrat, checkpoint
 
 from util import assert_verts_is_box
 
@@ -252,6 +256,41 @@ def test_transition():
 
     assert result.last_cur_state.cur_steps_since_start[0] == 5
 
+def test_transition_unaggregated():
+    'test that discrete transition successors are explored with the unaggregated strategy'
+
+    ha = HybridAutomaton()
+
+    # x' = 1 in m1 and m2, guard x >= 1 from m1 to m2, and x >= 2 from m2 to error
+    m1 = ha.new_mode('m1')
+    m1.set_dynamics([[0, 1], [0, 0]])
+    m1.set_invariant([[1, 0]], [1])
+
+    m2 = ha.new_mode('m2')
+    m2.set_dynamics([[0, 1], [0, 0]])
+
+    ha.new_transition(m1, m2).set_guard([[-1, 0]], [-1])
+    ha.new_transition(m2, ha.new_mode('error')).set_guard([[-1, 0]], [-2])
+
+    # two initial states, whose successors in m2 are not aggregated
+    init_list = [StateSet(lputil.from_box([[0, 0.1], [1, 1]], m1), m1),
+                 StateSet(lputil.from_box([[0.3, 0.4], [1, 1]], m1), m1)]
+
+    settings = HylaaSettings(0.25, 3.0)
+    settings.stdout = HylaaSettings.STDOUT_NONE
+    settings.plot.plot_mode = PlotSettings.PLOT_NONE
+    settings.plot.store_plot_result = True
+    settings.aggstrat = aggstrat.Unaggregated()
+    settings.stop_on_concrete_error = False
+
+    result = Core(ha, settings).run(init_list)
+
+    assert result.has_concrete_error and not result.has_aggregated_error
+    assert [seg.mode.name for seg in result.counterexample] == ['m1', 'm2']
+
+    # each initial state has its own successor in m2, which is explored until the time bound
+    assert len(result.plot_data.mode_to_obj_list[0]['m2']) > 2 * 4
+
 def test_time_triggered():
     'test to make sure exact time-triggered guards only have a single sucessor state'
 
@@ -534,6 +573,396 @@ def test_inputs_reset():
         assert len(i) == 1
         assert abs(i[0] - 2) < 1e-9
 
+def test_compress_inputs():
+    'test periodic input effects compression in a mode with inputs'
+
+    # x' = u, u in [1, 2], y' = 1 (affine variable)
+    ha = HybridAutomaton()
+    mode = ha.new_mode('mode')
+    mode.set_dynamics([[0, 1], [0, 0]])
+    mode.set_inputs([[1], [0]], [[1], [-1]], [2, -1])
+
+    error = ha.new_mode('error')
+    trans = ha.new_transition(mode, error)
+    trans.set_guard([[-1, 0]], [-25]) # x >= 25
+
+    settings = HylaaSettings(1.0, 10.0)
+    settings.stdout = HylaaSettings.STDOUT_NONE
+    settings.plot.store_plot_result = True
+    settings.compress_inputs_steps = 3
+
+    # otherwise, compression is skipped since the mode can reach an error mode
+    settings.stop_on_concrete_error = False
+    settings.make_counterexample = False
+
+    result = Core(ha, settings).run([StateSet(lputil.from_box([[0, 0], [1, 1]], mode), mode)])
+
+    # x at step k is in [2k, 3k], since the affine variable adds k
+    polys = [obj[0] for obj in result.plot_data.mode_to_obj_list[0]['mode']]
+    assert len(polys) == 11
+
+    for step, poly in enumerate(polys):
+        assert_verts_is_box(poly, [[2 * step, 3 * step], [1, 1]])
+
+    # lp size stays bounded, and the error is only reachable from compressed (overapproximated) states
+    assert result.timer_stats['compress lp cols (before)'] == [9, 11, 11]
+    assert result.timer_stats['compress lp cols (after)'] == [8, 8, 8]
+    assert result.has_aggregated_error and not result.has_concrete_error
+
+def test_compress_inputs_verdict():
+    'test that input effects compression does not change the verdict when a concrete error is needed'
+
+    # x' = 1 + u, u in [1, 2] (using affine variable y), mode a goes to mode b at x >= 5, b has an error at x >= 25
+    ha = HybridAutomaton()
+    mode_a = ha.new_mode('a')
+    mode_a.set_dynamics([[0, 1], [0, 0]])
+    mode_a.set_inputs([[1], [0]], [[1], [-1]], [2, -1])
+    mode_a.set_invariant([[1, 0]], [8])
+
+    mode_b = ha.new_mode('b')
+    mode_b.set_dynamics([[0, 1], [0, 0]])
+    mode_b.set_inputs([[1], [0]], [[1], [-1]], [2, -1])
+
+    # mode c cannot reach the error, so it's compressed
+    mode_c = ha.new_mode('c')
+    mode_c.set_dynamics([[0, 1], [0, 0]])
+    mode_c.set_inputs([[1], [0]], [[1], [-1]], [2, -1])
+
+    error = ha.new_mode('error')
+    ha.new_transition(mode_a, mode_b).set_guard([[-1, 0]], [-5])
+    ha.new_transition(mode_b, error).set_guard([[-1, 0]], [-25])
+
+    results = []
+
+    for compress_steps in [0, 3]:
+        settings = HylaaSettings(1.0, 20.0)
+        settings.stdout = HylaaSettings.STDOUT_NONE
+        settings.compress_inputs_steps = compress_steps
+        settings.aggstrat = aggstrat.Unaggregated()
+
+        init_list = [StateSet(lputil.from_box([[0, 0], [1, 1]], mode), mode) for mode in [mode_a, mode_c]]
+        results.append(Core(ha, settings).run(init_list))
+
+    for result in results:
+        assert result.has_concrete_error and not result.has_aggregated_error
+        assert [segment.mode.name for segment in result.counterexample] == ['a', 'b']
+
+    assert 'compress lp cols (before)' not in results[0].timer_stats
+    assert results[1].timer_counters['skipped input effects compressions'] > 0
+    assert results[1].timer_stats['compress lp cols (before)'] # mode c
+
+    # the counterexamples are the same
+    for seg0, seg1 in zip(results[0].counterexample, results[1].counterexample):
+        assert np.allclose(seg0.start, seg1.start) and np.allclose(seg0.end, seg1.end)
+
+def test_skip_event_free_steps():
+    'test skipping steps where no guard or invariant can become active'
+
+    # x' = 1 (using affine variable y), mode a has invariant x <= 6 and guard x >= 5 to mode b, b has error at x >= 9
+    ha = HybridAutomaton()
+
+    mode_a = ha.new_mode('a')
+    mode_a.set_dynamics([[0, 1], [0, 0]])
+    mode_a.set_invariant([[1, 0]], [6])
+
+    mode_b = ha.new_mode('b')
+    mode_b.set_dynamics([[0, 1], [0, 0]])
+
+    error = ha.new_mode('error')
+    ha.new_transition(mode_a, mode_b).set_guard([[-1, 0]], [-5])
+    ha.new_transition(mode_b, error).set_guard([[-1, 0]], [-9])
+
+    results = []
+
+    for skip in [False, True]:
+        settings = HylaaSettings(0.1, 10.0)
+        settings.stdout = HylaaSettings.STDOUT_NONE
+        settings.plot.store_plot_result = True
+        settings.skip_event_free_steps = skip
+
+        init_lpi = lputil.from_box([[0, 1], [1, 1]], mode_a)
+        results.append(Core(ha, settings).run([StateSet(init_lpi, mode_a), ]))
+
+    no_skip_result, skip_result = results
+
+    assert 'skipped event-free steps' not in no_skip_result.timer_stats
+    assert sum(skip_result.timer_stats['skipped event-free steps']) > 50
+
+    # same verdict, and the same sets at the last step in mode a and when entering mode b
+    assert no_skip_result.has_aggregated_error and skip_result.has_aggregated_error
+
+    for mode_name, index in [('a', -1), ('b', 0)]:
+        polys = [result.plot_data.mode_to_obj_list[0][mode_name][index][0] for result in results]
+        assert np.allclose(polys[0], polys[1])
+
+    assert len(skip_result.plot_data.mode_to_obj_list[0]['a']) < len(no_skip_result.plot_data.mode_to_obj_list[0]['a'])
+
+def test_skip_event_free_steps_output_space():
+    'test that skipping event-free steps with output-space basis matrices still finds the error'
+
+    # x0' = x1, x1' = -0.01 * x1, error at 9 <= x0 <= 12 (the output space is only the x0 direction)
+    ha = HybridAutomaton()
+    mode = ha.new_mode('mode')
+    mode.set_dynamics([[0, 1], [0, -0.01]])
+
+    error = ha.new_mode('error')
+    ha.new_transition(mode, error).set_guard([[-1, 0], [1, 0]], [-9, 12])
+
+    for skip in [False, True]:
+        for output_space in [False, True]:
+            settings = HylaaSettings(0.1, 5.0)
+            settings.stdout = HylaaSettings.STDOUT_NONE
+            settings.skip_event_free_steps = skip
+            settings.time_elapse.output_space = output_space
+
+            init_lpi = lputil.from_box([[0, 0.1], [10, 10.1]], mode)
+            result = Core(ha, settings).run([StateSet(init_lpi, mode)])
+
+            assert (mode.time_elapse.output_space_mat is not None) == output_space
+            assert result.has_concrete_error
+
+def test_parallel_waiting_list():
+    'test exploring independent waiting-list states in worker processes, which should match the serial result'
+
+    # x' = 1 (using affine variable y) in modes a and b, a has a guard at x >= 2 to mode c, and b at x >= 3 to error
+    ha = HybridAutomaton()
+
+    mode_a = ha.new_mode('a')
+    mode_a.set_dynamics([[0, 1], [0, 0]])
+    mode_a.set_invariant([[1, 0]], [3])
+
+    mode_b = ha.new_mode('b')
+    mode_b.set_dynamics([[0, 1], [0, 0]])
+    mode_b.set_invariant([[1, 0]], [4])
+
+    mode_c = ha.new_mode('c')
+    mode_c.set_dynamics([[0, -1], [0, 0]])
+
+    error = ha.new_mode('error')
+    ha.new_transition(mode_a, mode_c).set_guard([[-1, 0]], [-2])
+    ha.new_transition(mode_b, error).set_guard([[-1, 0]], [-3])
+
+    results = []
+
+    for workers in [1, 2]:
+        settings = HylaaSettings(0.5, 5.0)
+        settings.stdout = HylaaSettings.STDOUT_NONE
+        settings.plot.store_plot_result = True
+        settings.aggstrat = aggstrat.Unaggregated()
+        settings.waiting_list_workers = workers
+        settings.stop_on_concrete_error = False
+
+        init_list = [StateSet(lputil.from_box([[0, 1], [1, 1]], mode_a), mode_a),
+                     StateSet(lputil.from_box([[0, 1], [1, 1]], mode_b), mode_b)]
+
+        results.append(Core(ha, settings).run(init_list))
+
+    # the initial states in modes a and b are explored in parallel
+    assert not results[0].top_level_timer.get_children_recursive('explore_batch')
+    assert results[1].top_level_timer.get_children_recursive('explore_batch')
+
+    for result in results:
+        assert result.has_concrete_error
+        assert result.counterexample[-1].mode is mode_b
+
+    for mode_name in ['a', 'b', 'c']:
+        polys = [[obj[0] for obj in result.plot_data.mode_to_obj_list[0][mode_name]] for result in results]
+        assert polys[0] and len(polys[0]) == len(polys[1])
+
+        for poly_serial, poly_parallel in zip(*polys):
+            assert np.allclose(poly_serial, poly_parallel)
+
+def test_parallel_waiting_list_batches():
+    'test parallel exploration over several batches, in a branching model with inputs, against the serial result'
+
+    # x' = 1 + u, u in [0, 1] (using affine variable y), mode a branches to modes b and c at x >= 1, and leaves its
+    # invariant at x >= 2. Mode b goes back to mode a at x >= 3, and mode c goes to an error mode at x >= 6
+    ha = HybridAutomaton()
+    modes = {}
+
+    for name, inv_rhs in [('a', 2), ('b', 4), ('c', 8)]:
+        mode = modes[name] = ha.new_mode(name)
+        mode.set_dynamics([[0, 1], [0, 0]])
+        mode.set_inputs([[1], [0]], [[1], [-1]], [1, 0])
+        mode.set_invariant([[1, 0]], [inv_rhs])
+
+    error = ha.new_mode('error')
+    ha.new_transition(modes['a'], modes['b']).set_guard([[-1, 0]], [-1])
+    ha.new_transition(modes['a'], modes['c']).set_guard([[-1, 0]], [-1])
+    ha.new_transition(modes['b'], modes['a']).set_guard([[-1, 0]], [-3])
+    ha.new_transition(modes['c'], error).set_guard([[-1, 0]], [-6])
+
+    results = []
+
+    for workers in [1, 3]:
+        settings = HylaaSettings(0.5, 6.0)
+        settings.stdout = HylaaSettings.STDOUT_NONE
+        settings.plot.store_plot_result = True
+        settings.aggstrat = aggstrat.Unaggregated()
+        settings.waiting_list_workers = workers
+        settings.stop_on_concrete_error = False
+
+        init_lpi = lputil.from_box([[0, 0.5], [1, 1]], modes['a'])
+        results.append(Core(ha, settings).run([StateSet(init_lpi, modes['a'])]))
+
+    serial_result, parallel_result = results
+
+    assert not serial_result.top_level_timer.get_children_recursive('explore_batch')
+    assert parallel_result.top_level_timer.get_children_recursive('explore_batch')[0].num_calls > 1
+
+    assert serial_result.has_concrete_error and parallel_result.has_concrete_error
+    assert [seg.mode.name for seg in serial_result.counterexample] == ['a', 'c']
+    assert [seg.mode.name for seg in parallel_result.counterexample] == ['a', 'c']
+
+    # the states may be explored in a different order, so compare the sorted plotted sets in each mode
+    for name in ['a', 'b', 'c']:
+        polys = [sorted([np.round(obj[0], 6).tolist() for obj in result.plot_data.mode_to_obj_list[0][name]]) \
+                 for result in results]
+
+        assert polys[0] and np.allclose(polys[0], polys[1])
+
+def test_checkpoint_resume(tmp_path):
+    'test resuming a computation from a checkpoint, after the original computation was stopped'
+
+    def make_ha():
+        'make the hybrid automaton: x grows in mode a, with guards at x >= 2 to mode b and x >= 3.5 to error'
+
+        ha = HybridAutomaton()
+
+        mode_a = ha.new_mode('a')
+        mode_a.set_dynamics([[0, 1], [0, 0]])
+        mode_a.set_invariant([[1, 0]], [3])
+
+        mode_b = ha.new_mode('b')
+        mode_b.set_dynamics([[0, 1], [0, 0]])
+
+        error = ha.new_mode('error')
+        ha.new_transition(mode_a, mode_b).set_guard([[-1, 0]], [-2])
+        ha.new_transition(mode_b, error).set_guard([[-1, 0]], [-3.5])
+
+        return ha
+
+    def make_settings():
+        'make the settings, with a checkpoint at every step'
+
+        settings = HylaaSettings(0.25, 5.0)
+        settings.stdout = HylaaSettings.STDOUT_NONE
+        settings.plot.store_plot_result = True
+        settings.checkpoint_path = str(tmp_path / 'checkpoint.dat')
+        settings.checkpoint_interval = 0
+
+        return settings
+
+    def init_states(ha):
+        'get the initial states'
+
+        mode = ha.modes['a']
+
+        return [StateSet(lputil.from_box([[0, 1], [1, 1]], mode), mode)]
+
+    ha = make_ha()
+    expected = Core(ha, make_settings()).run(init_states(ha))
+
+    # stop the computation after some continuous-post steps in mode b
+    ha = make_ha()
+    core = Core(ha, make_settings())
+    orig_do_step_continuous_post = core.do_step_continuous_post
+
+    def stopping_do_step_continuous_post():
+        'do a continuous post step, stopping the computation after 14 steps (in mode b)'
+
+        if core.continuous_steps == 14:
+            raise KeyboardInterrupt()
+
+        orig_do_step_continuous_post()
+
+    core.do_step_continuous_post = stopping_do_step_continuous_post
+
+    try:
+        core.run(init_states(ha))
+        assert False, "computation was not stopped"
+    except KeyboardInterrupt:
+        pass
+
+    # the checkpoint file is closed even though the computation raised
+    assert core.checkpointer is None
+
+    # a checkpoint file which is interrupted while it's first written is removed
+    orig_get_state = checkpoint.get_state
+    interrupted_settings = make_settings()
+    interrupted_settings.checkpoint_path = str(tmp_path / 'interrupted.dat')
+
+    def interrupted_get_state(_):
+        'raise while writing the checkpoint'
+
+        raise KeyboardInterrupt()
+
+    checkpoint.get_state = interrupted_get_state
+
+    try:
+        Core(make_ha(), interrupted_settings).run(init_states(ha))
+        assert False, "computation was not stopped"
+    except KeyboardInterrupt:
+        pass
+    finally:
+        checkpoint.get_state = orig_get_state
+
+    assert not os.path.exists(interrupted_settings.checkpoint_path + '.tmp')
+
+    ha = make_ha()
+    result = Core(ha, make_settings()).resume(make_settings().checkpoint_path)
+
+    assert result.has_aggregated_error and expected.has_aggregated_error
+    assert not result.has_concrete_error and not expected.has_concrete_error
+    assert result.last_cur_state.mode is ha.modes['error']
+
+    for mode_name in ['a', 'b']:
+        polys = [[obj[0] for obj in r.plot_data.mode_to_obj_list[0][mode_name]] for r in [expected, result]]
+        assert polys[0] and len(polys[0]) == len(polys[1])
+
+        for poly_expected, poly_resumed in zip(*polys):
+            assert np.allclose(poly_expected, poly_resumed)
+
+def test_lp_backend_highs():
+    'test running with the highs lp backend, which should give the same result as glpk'
+
+    # x' = 1 (using affine variable y), with guard x >= 5 to an error mode
+    ha = HybridAutomaton()
+
+    mode = ha.new_mode('mode')
+    mode.set_dynamics([[0, 1], [0, 0]])
+    mode.set_invariant([[1, 0]], [6])
+
+    error = ha.new_mode('error')
+    ha.new_transition(mode, error).set_guard([[-1, 0]], [-5])
+
+    results = []
+
+    for lp_backend in [HylaaSettings.LP_GLPK, HylaaSettings.LP_HIGHS]:
+        settings = HylaaSettings(0.5, 10.0)
+        settings.stdout = HylaaSettings.STDOUT_NONE
+        settings.plot.store_plot_result = True
+        settings.lp_backend = lp_backend
+
+        init_lpi = lputil.from_box([[0, 1], [1, 1]], mode)
+        results.append(Core(ha, settings).run([StateSet(init_lpi, mode)]))
+
+        expected_class = HighsLpInstance if lp_backend == HylaaSettings.LP_HIGHS else GlpkLpInstance
+        assert isinstance(results[-1].last_cur_state.lpi, expected_class)
+
+        # the backend is only used during the run
+        assert LpInstance.backend_class is GlpkLpInstance
+        assert isinstance(LpInstance(), GlpkLpInstance)
+
+    for result in results:
+        assert result.has_concrete_error
+
+    polys = [[obj[0] for obj in result.plot_data.mode_to_obj_list[0]['mode']] for result in results]
+    assert len(polys[0]) == len(polys[1])
+
+    for poly_glpk, poly_highs in zip(*polys):
+        assert np.allclose(poly_glpk, poly_highs)
+
 def test_init_unsat():
     'initial region unsat with multiple invariant conditions'
 
@@ -851,3 +1280,204 @@ def test_tt_09():
     mode2_list = result.plot_data.mode_to_obj_list[0]['mode2']
     assert len(mode2_list) == 3, f"mode2_list len was {len(mode2_list)}, expected 3 (0.9, 0.95, 1.0)"
 
+
+def test_compact_transition_lps():
+    'test replacing the lp after each transition by an lp over only the successor mode variables'
+
+    # x' = 1 (using affine variable y) in a chain of modes, with a guard at x >= 1 to the next mode and reset x := x - 1
+    ha = HybridAutomaton()
+    modes = [ha.new_mode(f'm{i}') for i in range(4)]
+
+    for mode in modes:
+        mode.set_dynamics([[0, 1], [0, 0]])
+
+    for mode, next_mode in zip(modes[:-1], modes[1:]):
+        mode.set_invariant([[1, 0]], [1])
+        t = ha.new_transition(mode, next_mode)
+        t.set_guard([[-1, 0]], [-1])
+        t.set_reset([[1, -1], [0, 1]])
+
+    error = ha.new_mode('error')
+    ha.new_transition(modes[-1], error).set_guard([[-1, 0]], [-0.75])
+
+    results = []
+
+    for compact in [False, True]:
+        settings = HylaaSettings(0.25, 4.0)
+        settings.stdout = HylaaSettings.STDOUT_NONE
+        settings.plot.plot_mode = PlotSettings.PLOT_NONE
+        settings.aggstrat = aggstrat.Unaggregated()
+        settings.compact_transition_lps = compact
+        settings.compact_transition_min_cols_per_dim = 0
+        settings.make_counterexample = False
+
+        core = Core(ha, settings)
+        result = core.run([StateSet(lputil.from_box([[0, 0.25], [1, 1]], modes[0]), modes[0])])
+        results.append(result)
+        cols = result.timer_stats['transition lp cols (depth 3)']
+
+        if compact:
+            # the one-dimensional boxes are exact, so states stay concrete
+            assert result.timer_counters['compacted transition lps'] == \
+                   result.timer_counters['exact transition lp compactions'] > 0
+            assert max(cols) == 4
+        else:
+            assert min(cols) > 4 * 3
+
+    assert results[0].has_concrete_error and results[1].has_concrete_error
+    assert not results[0].has_aggregated_error and not results[1].has_aggregated_error
+
+def test_sim_batch():
+    'test vectorized simulation steps with guards, resets, invariants and the time bound'
+
+    # x' = 1 (using affine variable a), invariant x <= 3, guard x >= 2 to mode b with reset x := x - 10
+    ha = HybridAutomaton()
+
+    mode_a = ha.new_mode('a')
+    mode_a.set_dynamics([[0, 1], [0, 0]])
+    mode_a.set_invariant([[1, 0]], [3])
+
+    mode_b = ha.new_mode('b')
+    mode_b.set_dynamics([[0, 0], [0, 0]])
+
+    t = ha.new_transition(mode_a, mode_b)
+    t.set_guard([[-1, 0]], [-2])
+    t.set_reset([[1, -10], [0, 1]])
+
+    pts = np.array([[0, 1], [1.0, 1], [2.4, 1], [3.5, 1], [1.0, 1]])
+
+    # vectorized checks match the single-point versions
+    assert list(t.is_guard_true_for_points(pts)) == [t.is_guard_true_for_point(pt) for pt in pts]
+    assert list(mode_a.points_in_invariant(pts)) == [mode_a.point_in_invariant(pt) for pt in pts]
+    assert np.allclose(t.apply_reset_for_points(pts)[0], [t.apply_reset_for_point(pt)[0] for pt in pts])
+
+    basis_matrix = np.array([[1, 0.5], [0, 1]]) # step size 0.5
+    batch = SimBatch(mode_a, pts, np.array([0, 0, 0, 0, 9]))
+
+    # first step without guards: the point outside the invariant is finished, others advance (sim 4 to the bound)
+    successors, num_advanced = batch.step(basis_matrix, 10, False)
+    assert not successors and num_advanced == 4
+    assert list(batch.active) == [True, True, True, False, True]
+    assert np.allclose(batch.pts[:, 0], [0.5, 1.5, 2.9, 3.5, 1.5]) and list(batch.steps) == [1, 1, 1, 0, 10]
+
+    # second step: sim 2 takes the transition (at step 1) and sim 4 reached the time bound
+    successors, num_advanced = batch.step(basis_matrix, 10, True)
+    assert num_advanced == 2 and len(successors) == 1
+
+    transition, post_pts, steps, ids = successors[0]
+    assert transition is t and np.allclose(post_pts, [[-7.1, 1]]) and list(steps) == [1] and list(ids) == [2]
+    assert list(batch.active) == [True, True, True, False, False] and list(batch.took_transition) == [0, 0, 1, 0, 0]
+    assert np.allclose(batch.pts[:3, 0], [1.0, 2.0, -7.1])
+
+    # third step: sim 2 is finished, sim 1 takes the transition
+    successors, num_advanced = batch.step(basis_matrix, 10, True)
+    assert num_advanced == 1 and len(successors) == 1 and list(successors[0][2]) == [2]
+    assert list(batch.active) == [True, True, False, False, False]
+
+def test_sim_inputs():
+    'test simulation with sampled inputs (vertex and uniform sampling, box and non-box input sets)'
+
+    # x' = u1, y' = u2, with u in a box and in a triangle
+    ha = HybridAutomaton()
+
+    box_mode = ha.new_mode('box')
+    box_mode.set_dynamics(np.zeros((2, 2)))
+    box_mode.set_inputs(np.identity(2), [[1, 0], [-1, 0], [0, 1], [0, -1]], [2, -1, 1, 0])
+
+    tri_mode = ha.new_mode('triangle')
+    tri_mode.set_dynamics(np.zeros((2, 2)))
+    tri_mode.set_inputs(np.identity(2), [[-1, 0], [0, -1], [1, 1]], [0, 0, 1])
+
+    for mode in [box_mode, tri_mode]:
+        mode.init_time_elapse(0.5)
+
+        basis_matrix, ie_mat = mode.time_elapse.get_one_step_matrices()
+        assert np.allclose(basis_matrix, np.identity(2)) and np.allclose(ie_mat, 0.5 * np.identity(2))
+
+        for sample_mode in [HylaaSettings.SIM_INPUTS_VERTEX, HylaaSettings.SIM_INPUTS_UNIFORM]:
+            sampler = InputSampler(mode, sample_mode)
+            inputs = sampler.sample(1000)
+
+            assert inputs.shape == (1000, 2)
+            assert np.all(mode.u_constraints_csc * inputs.T <= mode.u_constraints_rhs[:, np.newaxis] + 1e-9)
+
+            if sample_mode == HylaaSettings.SIM_INPUTS_VERTEX:
+                verts = [(1, 0), (1, 1), (2, 0), (2, 1)] if mode is box_mode else [(0, 0), (1, 0), (0, 1)]
+                assert {tuple(u) for u in inputs} == set(verts)
+            else:
+                assert len({tuple(u) for u in inputs}) == 1000
+
+            # two steps of simulation from the origin, x increases by 0.5 * u1 each step
+            batch = SimBatch(mode, np.zeros((1000, 2)), np.zeros(1000, dtype=int))
+
+            for _ in range(2):
+                batch.step(basis_matrix, 10, True, ie_mat, sampler)
+
+            x_lower, x_upper = (1, 2) if mode is box_mode else (0, 1)
+            assert np.all(batch.pts[:, 0] >= x_lower - 1e-9) and np.all(batch.pts[:, 0] <= x_upper + 1e-9)
+            assert np.all(batch.steps == 2)
+
+def test_falsify():
+    'test the simulation-based falsification pre-pass, which finds a counter-example before reachability'
+
+    def make_ha(error_limit):
+        "x' = 1 + u (u in [0, 1]) in mode a, x' = 1 in mode b, x >= 3 goes to b and x >= error_limit to error"
+
+        ha = HybridAutomaton()
+
+        mode_a = ha.new_mode('a')
+        mode_a.set_dynamics([[0, 1], [0, 0]])
+        mode_a.set_inputs([[1], [0]], [[1], [-1]], [1, 0])
+
+        mode_b = ha.new_mode('b')
+        mode_b.set_dynamics([[0, 1], [0, 0]])
+
+        error = ha.new_mode('error')
+
+        ha.new_transition(mode_a, mode_b).set_guard([[-1, 0]], [-3])
+        ha.new_transition(mode_b, error).set_guard([[-1, 0]], [-error_limit])
+
+        return ha
+
+    for error_limit in [5, 100]:
+        ha = make_ha(error_limit)
+        mode_a = ha.modes['a']
+
+        settings = HylaaSettings(0.5, 10.0)
+        settings.stdout = HylaaSettings.STDOUT_VERBOSE
+        settings.plot.plot_mode = PlotSettings.PLOT_NONE
+        settings.falsify_sims = 100
+
+        init_list = [StateSet(lputil.from_box([(0, 1), (1, 1)], mode_a), mode_a)]
+        result = Core(ha, settings).run(init_list)
+
+        if error_limit == 100:
+            assert not result.has_concrete_error and not result.has_aggregated_error
+            continue
+
+        # the error was found without the reachability computation
+        assert result.has_concrete_error and result.last_cur_state is None
+
+        ce = result.counterexample
+        assert [seg.mode.name for seg in ce] == ['a', 'b']
+        assert 0 <= ce[0].start[0] <= 1 and np.isclose(ce[0].start[1], 1)
+
+        # replay the discrete-time counter-example
+        for seg in ce:
+            basis_matrix, ie_mat = seg.mode.time_elapse.get_one_step_matrices()
+            pt = np.array(seg.start)
+
+            assert len(seg.inputs) == (seg.steps if ie_mat is not None else 0)
+
+            for step in range(seg.steps):
+                pt = np.dot(basis_matrix, pt)
+
+                if ie_mat is not None:
+                    assert 0 <= seg.inputs[step][0] <= 1
+                    pt += np.dot(ie_mat, seg.inputs[step])
+
+            assert np.allclose(pt, seg.end)
+            assert seg.outgoing_transition.is_guard_true_for_point(pt)
+
+        assert np.allclose(ce[0].end, ce[1].start)
+        assert ce[1].outgoing_transition.to_mode.is_error()
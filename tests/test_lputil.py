@@ -12,10 +12,14 @@ from scipy.io import loadmat
 
 import swiglpk as glpk
 
-from hylaa import lputil, lpplot
+from hylaa import lputil, lptemplate, lpplot
 from hylaa.hybrid_automaton import HybridAutomaton, LinearConstraint
+from hylaa.stateset import StateSet
+from hylaa.settings import HylaaSettings
+from hylaa.lpinstance import SwigArray, GlpkLpInstance
+from hylaa.lpinstance_highs import HighsLpInstance
 
-from util import assert_verts_is_box, pair_almost_in
+from util import assert_verts_is_box, assert_verts_equals, pair_almost_in
 
 import matplotlib.pyplot as plt
 
@@ -85,6 +89,163 @@ def test_set_basis_matrix():
 
     assert np.allclose(mat.toarray(), expected_mat)
 
+def test_set_basis_matrix_bulk():
+    'tests repeated basis matrix updates using the persistent buffers in lpinstance'
+
+    mode = HybridAutomaton().new_mode('mode_name')
+    mode.set_dynamics([[0, 1], [-1, 0]])
+    mode.set_inputs([[1], [0]], [[1], [-1]], [1, 1])
+    lpi = lputil.from_box([[-5, -4], [0, 1]], mode)
+    lputil.add_input_effects_matrix(lpi, np.array([[1], [0]], dtype=float), mode)
+
+    bytes_before = SwigArray.bytes_allocated
+
+    for basis in [[[0, 1], [-1, 0]], [[0, 1], [-1, 0]], [[0, 1], [2, 3]], [[4, 5], [2, 3]]]:
+        basis = np.array(basis, dtype=float)
+        lputil.set_basis_matrix(lpi, basis)
+
+        assert np.allclose(lputil.get_basis_matrix(lpi), basis)
+
+    # the -I and input effects entries in the basis matrix rows are preserved
+    mat = lpi.get_full_constraints().toarray()
+    assert np.allclose(mat[0, lpi.cur_vars_offset:lpi.cur_vars_offset + 2], [-1, 0])
+    assert np.allclose(mat[0, lpi.input_effects_offsets[1]:lpi.input_effects_offsets[1] + 2], [1, 0])
+
+    # no swig memory is allocated on basis matrix updates
+    assert SwigArray.bytes_allocated == bytes_before
+
+    # modifying the basis matrix rows some other way forces a full update next time
+    lpi.set_constraints_csr(csr_matrix(np.array([[7, 7]], dtype=float)), offset=(lpi.basis_mat_pos[0], 0))
+    assert lpi.last_basis_matrix is None
+
+    basis = np.array([[4, 5], [2, 3]], dtype=float)
+    lputil.set_basis_matrix(lpi, basis)
+    assert np.allclose(lputil.get_basis_matrix(lpi), basis)
+
+    # clones keep working
+    lpi2 = lpi.clone()
+    basis = np.array([[1, 0], [2, 3]], dtype=float)
+    lputil.set_basis_matrix(lpi2, basis)
+    assert np.allclose(lputil.get_basis_matrix(lpi2), basis)
+
+def test_highs_backend():
+    'tests that the highs lp backend gives the same results as glpk, with and without highspy'
+
+    mode = HybridAutomaton().new_mode('mode_name')
+    mode.set_dynamics([[0, 1], [-1, 0]])
+    mode.set_inputs([[1], [0]], [[1], [-1]], [1, 1])
+
+    glpk_lpi = lputil.from_box([[-5, -4], [0, 1]], mode)
+    assert isinstance(glpk_lpi, GlpkLpInstance)
+
+    use_highspy = HighsLpInstance.use_highspy
+
+    try:
+        for highspy_setting in sorted(set([False, use_highspy])):
+            HighsLpInstance.use_highspy = highspy_setting
+            lpis = [glpk_lpi.clone(), glpk_lpi.convert(HighsLpInstance)]
+            assert isinstance(lpis[1], HighsLpInstance)
+
+            for lpi in lpis:
+                lputil.add_input_effects_matrix(lpi, np.array([[1], [0.5]], dtype=float), mode)
+                lputil.set_basis_matrix(lpi, np.array([[0, 1], [-1, 0]], dtype=float))
+                lpi.add_rows_less_equal([4.5])
+                lpi.set_constraints_csr(csr_matrix(np.array([[0, 0, 0, 1]], dtype=float)), \
+                                        offset=(lpi.get_num_rows() - 1, lpi.cur_vars_offset - 2))
+
+            assert lpis[0].get_types() == lpis[1].get_types()
+            assert np.allclose(lpis[0].get_rhs(), lpis[1].get_rhs())
+            assert np.allclose(lpis[0].get_full_constraints().toarray(), lpis[1].get_full_constraints().toarray())
+
+            for direction in [[1, 0], [-1, 0], [0, 1], [0, -1], [1, 1]]:
+                vals = [lpi.minimize(np.array(direction, dtype=float), columns=[lpi.cur_vars_offset, \
+                                                                                lpi.cur_vars_offset + 1]) \
+                        for lpi in lpis]
+                assert np.allclose(np.dot(vals[0], direction), np.dot(vals[1], direction))
+
+            # clones and deleting columns / rows
+            clones = [lpi.clone() for lpi in lpis]
+
+            for lpi in clones:
+                lpi.del_rows([lpi.get_num_rows() - 1])
+                lpi.del_cols([lpi.get_num_cols() - 1])
+                lpi.add_rows_less_equal([-10])
+                lpi.set_constraints_csr(csr_matrix(np.array([[1, 0]], dtype=float)), \
+                                        offset=(lpi.get_num_rows() - 1, lpi.cur_vars_offset))
+
+                assert not lpi.is_feasible()
+
+            assert clones[0].get_names() == clones[1].get_names()
+            assert np.allclose(clones[0].get_full_constraints().toarray(), clones[1].get_full_constraints().toarray())
+
+            # originals are unchanged
+            assert lpis[0].is_feasible() and lpis[1].is_feasible()
+    finally:
+        HighsLpInstance.use_highspy = use_highspy
+
+def test_support_batch():
+    'tests the batched support function on both lp backends, and the helpers built on it'
+
+    mode = HybridAutomaton().new_mode('mode_name')
+    glpk_lpi = lputil.from_box([[-5, -4], [0, 1]], mode)
+    lputil.set_basis_matrix(glpk_lpi, np.array([[0, 1], [-1, 0]], dtype=float)) # rotate by 90 degrees
+
+    dirs = np.array([[1, 0], [-1, 0], [0, 1], [0, -1], [1, 1], [0, 0]], dtype=float)
+    expected_optima = [1, 0, 5, -4, 6, 0]
+
+    for lpi in [glpk_lpi.clone(), glpk_lpi.convert(HighsLpInstance)]:
+        optima, points = lpi.support_batch(dirs)
+        assert np.allclose(optima, expected_optima)
+        assert points.shape == (len(dirs), lpi.get_num_cols())
+
+        cur_points = points[:, lpi.cur_vars_offset:lpi.cur_vars_offset + 2]
+        assert np.allclose(np.sum(dirs * cur_points, axis=1), expected_optima)
+        assert np.allclose(cur_points[4], [1, 5])
+
+        # requested columns and directions in terms of the initial variables
+        optima, points = lpi.support_batch(dirs[:4], columns=[0], offset=lpi.basis_mat_pos[1])
+        assert np.allclose(optima, [-4, 5, 1, 0])
+        assert points.shape == (4, 1) and np.allclose(points[:2, 0], [-4, -5])
+
+        assert np.allclose(lputil.get_init_box(lpi), ([-5, 0], [-4, 1]))
+        assert np.allclose(lputil.get_box_center(lpi), [0.5, 4.5])
+        assert np.allclose(lputil.compute_radius_inf(lpi), 5)
+        assert np.allclose(lpplot.bbox_widths(lpi, 0, 1), [1, 1])
+
+        # infeasible
+        lpi.add_rows_less_equal([-10])
+        lpi.set_constraints_csr(csr_matrix(np.array([[1, 0]], dtype=float)), \
+                                offset=(lpi.get_num_rows() - 1, lpi.cur_vars_offset))
+
+        assert lpi.support_batch(dirs, fail_on_unsat=False) is None
+
+def test_minimize_value():
+    'tests minimize_value and extracting subsets of the solution columns on both lp backends'
+
+    mode = HybridAutomaton().new_mode('mode_name')
+    glpk_lpi = lputil.from_box([[-5, -4], [0, 1], [2, 3]], mode)
+
+    for lpi in [glpk_lpi.clone(), glpk_lpi.convert(HighsLpInstance)]:
+        assert np.allclose(lpi.minimize_value([1, 0, 0]), -5)
+        assert np.allclose(lpi.minimize_value(csr_matrix([[0, -2, 1]]), is_csr=True), 0)
+
+        # direction in terms of the initial variables
+        assert np.allclose(lpi.minimize_value([0, 0, -1], offset=lpi.basis_mat_pos[1]), -3)
+
+        lpi.set_minimize_direction([1, -1, 1])
+        full = lpi.minimize()
+        assert len(full) == lpi.get_num_cols()
+
+        # small and large subsets (glpk copies every column at once for large subsets)
+        for columns in [[lpi.cur_vars_offset + 2], list(range(lpi.get_num_cols()))[::-1], []]:
+            assert np.allclose(lpi.minimize(columns=columns), full[columns])
+
+        lpi.add_rows_less_equal([-10])
+        lpi.set_constraints_csr(csr_matrix(np.array([[1, 0, 0]], dtype=float)), \
+                                offset=(lpi.get_num_rows() - 1, lpi.cur_vars_offset))
+
+        assert lpi.minimize_value([1, 0, 0], fail_on_unsat=False) is None
+
 def test_check_intersection():
     'tests check_intersection on the harmonic oscillator example'
 
@@ -103,6 +264,44 @@ def test_check_intersection():
     # now check if y >= 4.5 is possible (should be true)
     assert lputil.check_intersection(lpi, lc)
 
+def test_star_support():
+    'tests the closed-form star support functions of box and zonotope initial sets against the lp'
+
+    mode = HybridAutomaton().new_mode('mode_name')
+    mode.set_dynamics([[0, 1], [-1, 0]])
+    mode.init_time_elapse(math.pi / 8)
+
+    box_lpi = lputil.from_box([[-5, -4], [0, 1]], mode)
+    zono_lpi = lputil.from_zonotope([-4.5, 0.5], [[0.5, 0], [0.2, 0.5]], mode)
+
+    for lpi in [box_lpi, zono_lpi]:
+        ss = StateSet(lpi, mode)
+        assert ss.star is not None and ss.star.is_exact()
+
+        for _ in range(3):
+            ss.step()
+
+            dirs = np.array([[1, 0], [0, -1], [1, 1], [-0.5, 2]], dtype=float)
+            star_mins = ss.star.minimize_vals(dirs)
+
+            for direction, star_min in zip(dirs, star_mins):
+                lp_pt = lpi.minimize(direction, columns=[lpi.cur_vars_offset, lpi.cur_vars_offset + 1])
+                assert abs(np.dot(direction, lp_pt) - star_min) < 1e-9
+                assert abs(np.dot(direction, ss.star.minimize_point(direction)) - star_min) < 1e-9
+
+            for rhs in [star_mins[1] - 0.01, star_mins[1] + 0.01]:
+                lc = LinearConstraint([0, -1], rhs)
+                assert lputil.check_intersection(lpi, lc) == lputil.check_intersection(lpi, lc, star=ss.star)
+
+            assert_verts_equals(lpplot.get_verts(lpi), lpplot.get_verts(lpi, star=ss.star))
+
+    # adding a constraint makes the star an overapproximation
+    ss = StateSet(lputil.from_box([[-5, -4], [0, 1]], mode), mode)
+    lputil.add_init_constraint(ss.lpi, np.array([0, 1], dtype=float), 0.5)
+
+    assert not ss.star.is_exact()
+    assert not lputil.check_intersection(ss.lpi, LinearConstraint([0, -1], -0.75), star=ss.star)
+
 def test_verts():
     'tests verts'
 
@@ -682,6 +881,130 @@ def test_reject_constant_inputs():
     except AssertionError:
         pass
 
+def test_compress_input_effects():
+    'tests replacing the input effects variables with a template overapproximation'
+
+    # x' = u1, y' = u2, u1 in [0, 1], u2 in [-1, 1]
+    mode = HybridAutomaton().new_mode('mode_name')
+    mode.set_dynamics([[0, 0], [0, 0]])
+    mode.set_inputs([[1, 0], [0, 1]], [[1, 0], [-1, 0], [0, 1], [0, -1]], [1, 0, 1, 1])
+    mode.init_time_elapse(1.0)
+
+    assert np.allclose(lputil.get_input_box(mode.u_constraints_csc, mode.u_constraints_rhs), [[0, -1], [1, 1]])
+    assert lputil.get_input_box(csc_matrix([[1, 1], [-1, 0], [0, -1]], dtype=float), np.array([1, 0, 0.])) is None
+
+    ss = StateSet(lputil.from_box([[0, 0], [0, 0]], mode), mode)
+
+    for _ in range(3):
+        ss.step()
+
+    # invariant constraint x <= 2.5, which couples the initial variables and inputs
+    inv_row = lputil.add_init_constraint(ss.lpi, np.array([1, 0.]), 2.5, ss.basis_matrix, ss.input_effects_list)
+    assert_verts_is_box(lpplot.get_verts(ss.lpi), [[0, 2.5], [-3, 3]])
+
+    rows, cols = ss.lpi.get_num_rows(), ss.lpi.get_num_cols()
+    row_map = lputil.compress_input_effects(ss.lpi, np.identity(2), mode)
+
+    # 6 input variables and 12 input constraints were replaced by 2 variables and 4 constraints
+    assert len(row_map) == rows
+    assert row_map[inv_row] == inv_row - 12
+    assert row_map[inv_row - 1] is None
+    assert ss.lpi.get_num_cols() == cols - 4
+    assert ss.lpi.get_num_rows() == rows - 8
+
+    assert_verts_is_box(lpplot.get_verts(ss.lpi), [[0, 2.5], [-3, 3]])
+
+    # continue with the compressed lp
+    ss.input_effects_list = [np.identity(2)]
+    ss.step()
+    assert_verts_is_box(lpplot.get_verts(ss.lpi), [[0, 3.5], [-4, 4]])
+
+    row = lputil.add_init_constraint(ss.lpi, np.array([0, 1.]), -3.5, ss.basis_matrix, ss.input_effects_list)
+    assert row == ss.lpi.get_num_rows() - 1
+    assert_verts_is_box(lpplot.get_verts(ss.lpi), [[0, 3.5], [-4, -3.5]])
+
+def test_project_to_template():
+    'tests projecting an lp after a reset onto the variables of the successor mode'
+
+    ha = HybridAutomaton()
+    mode1 = ha.new_mode('mode1')
+    mode2 = ha.new_mode('mode2')
+    mode2.set_dynamics(np.identity(2))
+
+    lpi = lputil.from_box([[-5, -4], [0, 1]], mode1)
+    lputil.add_reset_variables(lpi, mode2.mode_id, 0, reset_csr=csr_matrix(2 * np.identity(2)))
+
+    # the projection is a box, which is detected as exact
+    new_lpi, is_exact = lptemplate.project_to_template(lpi, np.identity(2), mode2, exact_max_dims=2)
+
+    assert is_exact and new_lpi.init_zonotope is not None
+    assert new_lpi.get_num_cols() == 4 < lpi.get_num_cols()
+    assert new_lpi.get_names() == ["m1_i0", "m1_i1", "m1_c0", "m1_c1"]
+    assert_verts_is_box(lpplot.get_verts(new_lpi), [[-10, -8], [0, 2]])
+
+    assert not lptemplate.project_to_template(lpi, np.identity(2), mode2, exact_max_dims=1)[1]
+
+    # triangle x >= 0, y >= 0, x + y <= 1, with identity reset
+    lpi = lputil.from_constraints([[-1, 0], [0, -1], [1, 1]], [0, 0, 1], mode1)
+    lputil.add_reset_variables(lpi, mode2.mode_id, 0)
+
+    new_lpi, is_exact = lptemplate.project_to_template(lpi, np.array([[1, 1.], [0, 2.]]), mode2, exact_max_dims=2)
+
+    assert not is_exact
+    assert new_lpi.get_num_rows() == 2 + 2 * 3
+    assert_verts_equals(lpplot.get_verts(new_lpi), [[0, 0], [1, 0], [0, 1]])
+
+    # a diagonal line segment in 3-d, which is exactly a zonotope along its affine hull
+    mode3 = ha.new_mode('mode3')
+    mode3.set_dynamics(np.identity(3))
+
+    lpi = lputil.from_zonotope([0, 0, 1], [[1, 1, 0]], mode1)
+    lputil.add_reset_variables(lpi, mode3.mode_id, 0)
+
+    new_lpi, is_exact = lptemplate.project_to_template(lpi, np.identity(3), mode3, exact_max_dims=1)
+
+    assert is_exact and new_lpi.init_zonotope is not None
+    dirs = np.array([[1, 1, 0], [-1, -1, 0], [1, -1, 0], [-1, 1, 0], [0, 0, 1], [0, 0, -1]], dtype=float)
+    assert np.allclose(new_lpi.support_batch(dirs)[0], [2, 2, 0, 0, 1, -1])
+
+    # without the exactness check, the template still includes the directions orthogonal to the segment
+    new_lpi, is_exact = lptemplate.project_to_template(lpi, np.identity(3), mode3)
+
+    assert not is_exact
+    assert np.allclose(new_lpi.support_batch(dirs)[0], [2, 2, 0, 0, 1, -1])
+
+def test_invariant_ie_projections():
+    'tests that the running input effects projections give the same invariant constraints as input_effects_list'
+
+    # x' = u1, y' = u2, u1 in [0, 1], u2 in [-1, 1], invariant x + y <= 10
+    mode = HybridAutomaton().new_mode('mode_name')
+    mode.set_dynamics([[0, 0], [0, 0]])
+    mode.set_inputs([[1, 0], [0, 1]], [[1, 0], [-1, 0], [0, 1], [0, -1]], [1, 0, 1, 1])
+    mode.set_invariant([[1, 1]], [10])
+    mode.init_time_elapse(1.0)
+
+    ss = StateSet(lputil.from_box([[0, 0], [0, 0]], mode), mode)
+    vec = np.array([1, 1.])
+
+    for step in [1, 2, 40]: # more input effects columns than the initial buffer size
+        ss.step(step)
+
+        proj = ss.get_invariant_ie_projection(0)
+        assert np.allclose(proj, np.dot(vec, np.hstack(ss.input_effects_list)))
+
+        lpi = ss.lpi.clone()
+        row1 = lputil.add_init_constraint(ss.lpi, vec, 10, ss.basis_matrix, ss.input_effects_list)
+        row2 = lputil.add_init_constraint(lpi, vec, 10, ss.basis_matrix, input_effects_projection=proj)
+
+        assert row1 == row2
+        assert np.allclose(ss.lpi.get_row(row1).toarray(), lpi.get_row(row2).toarray())
+
+    ss.compress_input_effects(HylaaSettings.COMPRESS_BOX)
+    assert np.allclose(ss.get_invariant_ie_projection(0), [1, 1])
+
+    ss.step()
+    assert np.allclose(ss.get_invariant_ie_projection(0), [1, 1, 1, 1])
+
 def test_box_inputs():
     'tests from_box with a simple input effects matrix'
 
@@ -2,15 +2,24 @@
 tests for misc aspects of hylaa
 '''
 
+import os
+import sys
 import math
+import json
+import argparse
+import importlib.util
 import matplotlib.pyplot as plt
 
 import numpy as np
+from scipy.linalg import expm
+from scipy.sparse import csr_matrix
 
 from hylaa import symbolic, lputil, lpplot
 from hylaa.hybrid_automaton import HybridAutomaton
 from hylaa.stateset import StateSet
-from hylaa.settings import HylaaSettings
+from hylaa.settings import HylaaSettings, TimeElapseSettings
+from hylaa.timerutil import Timers
+from hylaa.core import Core
 
 from util import assert_verts_equals
 
@@ -38,6 +47,228 @@ def test_step_slow():
     assert np.allclose(basis_mat, slow_basis_mat)
     assert np.allclose(input_mat, slow_input_mat)
 
+def test_basis_matrix_cache():
+    'tests the step-indexed basis matrix cache with lru eviction'
+
+    mode = HybridAutomaton().new_mode('mode_name')
+    mode.set_dynamics([[0, 1], [-1, 0]])
+    mode.set_inputs([[1], [0]], [[1], [-1]], [1, 1])
+
+    settings = TimeElapseSettings()
+    mode.init_time_elapse(0.1, settings)
+    te = mode.time_elapse
+
+    expected = [te.get_basis_matrix(step) for step in range(6)]
+
+    # cache hits return the same matrices
+    for step in [3, 1, 4]:
+        bm, ie = te.get_basis_matrix(step)
+        assert bm is expected[step][0]
+        assert ie is expected[step][1]
+
+    # with a small memory budget, only the most-recently used steps are kept
+    settings.cache_max_mb = 5 * 48 / 1024 / 1024 # each step uses 48 bytes (4 + 2 floats)
+    other_mode = HybridAutomaton().new_mode('other_mode')
+    other_mode.set_dynamics([[0, 1], [-1, 0]])
+    other_mode.set_inputs([[1], [0]], [[1], [-1]], [1, 1])
+    other_mode.init_time_elapse(0.1, settings)
+    te = other_mode.time_elapse
+
+    for step in range(1, 11):
+        te.get_basis_matrix(step)
+
+    assert te.cached_steps == [6, 7, 8, 9, 10]
+    assert te.cache_bytes <= settings.cache_max_mb * 1024 * 1024
+
+    # uncached steps are computed by advancing from the nearest earlier cached step
+    te.get_basis_matrix(3)
+    bm, ie = te.get_basis_matrix(8)
+    assert np.allclose(bm, expm(np.array([[0, 1], [-1, 0]]) * 0.8))
+
+    for step in range(1, 6):
+        bm, ie = te.get_basis_matrix(step)
+
+        assert np.allclose(bm, expected[step][0])
+        assert np.allclose(ie, expected[step][1])
+
+def test_expm_disk_cache(tmp_path):
+    'tests the on-disk cache of one-step matrix exponentials, shared between modes with the same dynamics'
+
+    settings = TimeElapseSettings()
+    settings.disk_cache_dir = str(tmp_path)
+
+    def make_mode(a_mat, step_size=0.1):
+        'make a mode with the passed-in dynamics, and compute basis matrices for a few steps'
+
+        mode = HybridAutomaton().new_mode('mode_name')
+        mode.set_dynamics(a_mat)
+        mode.set_inputs([[1], [0]], [[1], [-1]], [1, 1])
+        mode.init_time_elapse(step_size, settings)
+
+        return mode, [mode.time_elapse.get_basis_matrix(step) for step in range(4)]
+
+    _, expected = make_mode([[0, 1], [-1, 0]])
+    assert len(list(tmp_path.iterdir())) == 2 # expm and input effects files
+
+    # the same dynamics are loaded from the cache, as read-only (memory-mapped) arrays
+    mode, mats = make_mode([[0, 1], [-1, 0]])
+    assert not mode.time_elapse.time_elapse_obj.one_step_matrix_exp.flags.writeable
+
+    for (bm, ie), (expected_bm, expected_ie) in zip(mats[1:], expected[1:]):
+        assert np.allclose(bm, expected_bm) and np.allclose(ie, expected_ie)
+
+    # different dynamics or step sizes are new entries, and old entries are evicted when over the size limit
+    settings.disk_cache_max_mb = 2.5 * 304 / 1024 / 1024 # each entry uses 304 bytes (48 + two .npy headers)
+
+    mode, _ = make_mode([[0, 1], [-1, 0]], step_size=0.2)
+    assert mode.time_elapse.time_elapse_obj.one_step_matrix_exp.flags.writeable
+    assert len(list(tmp_path.iterdir())) == 4
+
+    mode, mats = make_mode([[0, 2], [-1, 0]])
+    assert len(list(tmp_path.iterdir())) == 4
+    assert np.allclose(mats[1][0], expm(np.array([[0, 2], [-1, 0]]) * 0.1))
+
+def test_shared_time_elapse():
+    'tests that modes with identical dynamics share a TimeElapser'
+
+    ha = HybridAutomaton()
+
+    mode_a = ha.new_mode('a')
+    mode_a.set_dynamics([[0, 1], [-1, 0]])
+    mode_a.set_inputs([[1], [0]], [[1], [-1]], [1, 1])
+
+    # same dynamics, constructed differently (with an explicit zero in the sparse matrix)
+    mode_b = ha.new_mode('b')
+    mode_b.set_dynamics(csr_matrix(([0.0, 1.0, -1.0], [0, 1, 0], [0, 2, 3]), shape=(2, 2)))
+    mode_b.set_inputs(np.array([[1.0], [0]]), [[1], [-1]], [2, 2])
+
+    mode_c = ha.new_mode('c')
+    mode_c.set_dynamics([[0, 1], [-1, 0]])
+
+    error = ha.new_mode('error')
+
+    assert ha.init_time_elapse(0.1) == 2
+    assert mode_a.time_elapse is mode_b.time_elapse
+    assert mode_c.time_elapse is not mode_a.time_elapse
+    assert error.time_elapse is None
+
+    bm, _ = mode_b.time_elapse.get_basis_matrix(3)
+    assert np.allclose(bm, expm(np.array([[0, 1], [-1, 0]]) * 0.3))
+
+def test_output_space_basis_matrix():
+    'tests basis matrix computation along output directions only'
+
+    np.random.seed(0)
+    dims = 6
+    a_mat = np.random.rand(dims, dims) - 0.5
+    b_mat = np.random.rand(dims, 2)
+
+    full_mode = HybridAutomaton().new_mode('full')
+    full_mode.set_dynamics(a_mat)
+    full_mode.set_inputs(b_mat, [[1, 0], [-1, 0], [0, 1], [0, -1]], [1, 0, 1, 0])
+    full_mode.init_time_elapse(0.1)
+
+    mode = HybridAutomaton().new_mode('output')
+    mode.set_dynamics(a_mat)
+    mode.set_inputs(b_mat, [[1, 0], [-1, 0], [0, 1], [0, -1]], [1, 0, 1, 0])
+    mode.init_time_elapse(0.1)
+
+    output_dirs = np.array([[1, 0, 0, 0, 0, 0], [0, 1, 1, 0, 0, 0]], dtype=float)
+    assert mode.time_elapse.use_output_space(output_dirs)
+    assert mode.time_elapse.output_space_mat.shape == (dims, 2)
+
+    # consecutive steps, then out-of-order steps (computed using expm_multiply)
+    for step in [0, 1, 2, 3, 4, 10, 7]:
+        bm, ie = mode.time_elapse.get_basis_matrix(step)
+        full_bm, full_ie = full_mode.time_elapse.get_basis_matrix(step)
+
+        # only correct along the output directions (combinations of them)
+        check_dirs = np.concatenate([output_dirs, [[2, -1, -1, 0, 0, 0]]])
+        assert np.allclose(np.dot(check_dirs, bm), np.dot(check_dirs, full_bm))
+
+        if step > 0:
+            assert np.allclose(np.dot(check_dirs, ie), np.dot(check_dirs, full_ie))
+            assert not np.allclose(bm, full_bm)
+
+    # too many output directions
+    mode.init_time_elapse(0.1)
+    assert not mode.time_elapse.use_output_space(np.identity(dims))
+
+def test_output_space_no_star():
+    'tests that the closed-form star is not used with output-space basis matrices'
+
+    ha = HybridAutomaton()
+    mode = ha.new_mode('mode')
+    mode.set_dynamics([[0, 1, 0], [-1, 0, 0], [0, 0, -1]])
+    mode.init_time_elapse(0.1)
+
+    error = ha.new_mode('error')
+    ha.new_transition(mode, error).set_guard([[-1, 0, 0]], [-5])
+
+    # the initial state is usually constructed before the output space is set up (in Core.setup())
+    ss = StateSet(lputil.from_box([[0, 1], [0, 1], [0, 1]], mode), mode)
+    assert ss.star is not None and ss.interval_screen is None
+
+    assert mode.time_elapse.use_output_space(mode.get_output_directions())
+    ss.init_screens()
+
+    assert ss.uses_output_space()
+    assert ss.star is None and ss.interval_screen.box_indices is None
+
+    ss.step(5)
+    screen = ss.get_screen()
+    vals = screen.minimize_vals(np.array([[-1, 0, 0], [0, 1, 0]], dtype=float))
+
+    # exact along the output direction (x0 = cos(t) x0(0) + sin(t) x1(0)), no bound along the other direction
+    assert abs(vals[0] + math.cos(0.5) + math.sin(0.5)) < 1e-9
+    assert vals[1] == -np.inf
+
+def test_interval_screen():
+    'tests the interval overapproximation used to pre-screen guards and invariants'
+
+    ha = HybridAutomaton()
+    mode = ha.new_mode('mode')
+    mode.set_dynamics([[0, 1], [-1, 0]])
+    mode.set_inputs([[1], [0]], [[1], [-1]], [0.1, 0.1])
+    mode.set_invariant([[1, 1]], [10])
+
+    mode2 = ha.new_mode('mode2')
+    mode2.set_dynamics([[0, 0], [0, 0]])
+    trans = ha.new_transition(mode, mode2)
+    trans.set_guard([[-1, 0]], [-5]) # x >= 5
+    trans.set_reset([[2, 0], [0, 1]], [[1], [0]], [[1], [-1]], [1, 0])
+
+    mode.init_time_elapse(0.1)
+    ss = StateSet(lputil.from_box([[-1, 1], [-1, 1]], mode), mode)
+    assert ss.star is None # has inputs
+
+    np.random.seed(0)
+    dirs = np.concatenate([mode.get_template_directions(), np.random.rand(3, 2) - 0.5])
+
+    for _ in range(10):
+        ss.step()
+
+        screen = ss.get_screen()
+        lp_mins = [np.dot(d, ss.lpi.minimize(d)[ss.lpi.cur_vars_offset:ss.lpi.cur_vars_offset + 2]) for d in dirs]
+
+        # lower bounds, which are tight in the box directions
+        assert np.all(screen.minimize_vals(dirs) <= np.array(lp_mins) + 1e-9)
+        assert np.allclose(screen.minimize_vals(np.identity(2)), lp_mins[:2])
+
+    # guard is disjoint without solving lps
+    assert screen.minimize_vals(trans.guard_csr)[0] > trans.guard_rhs[0]
+    assert trans.get_guard_intersection(ss.lpi, screen) is None
+
+    # successor initial box: x := 2x + y_reset, y_reset in [0, 1]
+    x_lower, y_lower = screen.minimize_vals(np.identity(2))
+    x_upper, y_upper = -screen.minimize_vals(-np.identity(2))
+
+    lower, upper = ss.get_reset_box(trans)
+    assert np.allclose(lower, [2 * x_lower, y_lower])
+    assert np.allclose(upper, [2 * x_upper + 1, y_upper])
+
+    assert ss.get_screen(use_interval=False) is None
+
 def test_symbolic_amat():
     'test symbolic dynamics extraction'
 
@@ -190,3 +421,203 @@ def test_approx_lgg_inputs():
 
     # one more step should work without errors
     ss.step()
+
+def test_timers():
+    'tests timer handles, counters and histograms, and disabling the timers'
+
+    handle = Timers.register('child')
+
+    Timers.reset()
+    Timers.tic('total')
+
+    for _ in range(3):
+        handle.tic()
+        Timers.tic('grandchild')
+        Timers.toc('grandchild')
+        handle.toc()
+
+    Timers.tic('other')
+    handle.tic() # started from a different parent timer
+    handle.toc()
+    Timers.toc('other')
+
+    Timers.count('lp solves')
+    Timers.count('lp solves', 2)
+
+    for value in [0, 1, 3, 4, 100]:
+        Timers.record_histogram('lp rows', value)
+
+    Timers.toc('total')
+
+    top = Timers.top_level_timer
+    assert top.get_child('child').num_calls == 3
+    assert top.get_child('child').get_child('grandchild').num_calls == 3
+    assert top.get_child('other').get_child('child').num_calls == 1
+    assert top.total_secs >= top.get_child('child').total_secs > 0
+
+    assert Timers.counters == {'lp solves': 3}
+
+    histogram = Timers.histograms['lp rows']
+    assert histogram.num_values == 5 and histogram.min_value == 0 and histogram.max_value == 100
+    assert histogram.num_nonpositive == 1 and histogram.buckets == {1: 1, 2: 1, 3: 1, 7: 1} # [1,2) [2,4) [4,8) ...
+
+    # disabled timers do nothing
+    Timers.reset()
+    Timers.set_enabled(False)
+
+    try:
+        Timers.tic('total')
+        handle.tic()
+        Timers.count('lp solves')
+        Timers.record_histogram('lp rows', 5)
+        handle.toc()
+        Timers.toc('total')
+
+        assert Timers.top_level_timer is None and not Timers.counters and not Timers.histograms
+
+        # lp solves are not counted either
+        lpi = lputil.from_box([[-1, 1], [-1, 1]], HybridAutomaton().new_mode('mode'))
+        lpi.minimize([1, 0])
+
+        assert not Timers.counters and not Timers.histograms
+    finally:
+        Timers.set_enabled(True)
+
+    lpi.minimize([0, 1])
+    assert Timers.counters['lp solves'] == 1 and Timers.histograms['lp cols'].num_values == 1
+    Timers.reset()
+
+    # spans of timers started with a handle are traced, including when the handle skips the name lookup
+    trace = Timers.start_trace(['child'])
+    Timers.tic('total')
+
+    for _ in range(3):
+        handle.tic()
+        Timers.count('lp solves')
+        handle.toc()
+
+    Timers.toc('total')
+
+    assert [e['name'] for e in trace.events] == ['child'] * 3
+    assert all(e['args'] == {'lp solves': 1} for e in trace.events)
+    Timers.reset()
+
+    # with settings.timers = False, a computation runs without timers, and they are enabled again afterwards
+    ha = HybridAutomaton()
+    mode = ha.new_mode('mode')
+    mode.set_dynamics([[0, 1], [-1, 0]])
+
+    settings = HylaaSettings(0.1, 1.0)
+    settings.stdout = HylaaSettings.STDOUT_NONE
+    settings.timers = False
+
+    result = Core(ha, settings).run([StateSet(lputil.from_box([[-1, 1], [-1, 1]], mode), mode)])
+
+    assert result.top_level_timer is None and not result.timer_counters
+    assert Timers.enabled
+
+    # the timers are also enabled again if the computation raises
+    core = Core(ha, settings)
+
+    def raising_do_step_continuous_post():
+        'raise during the computation'
+
+        assert not Timers.enabled
+        raise KeyboardInterrupt()
+
+    core.do_step_continuous_post = raising_do_step_continuous_post
+
+    try:
+        core.run([StateSet(lputil.from_box([[-1, 1], [-1, 1]], mode), mode)])
+        assert False, "computation was not stopped"
+    except KeyboardInterrupt:
+        pass
+
+    assert Timers.enabled
+
+    settings.timers = True
+    result = Core(ha, settings).run([StateSet(lputil.from_box([[-1, 1], [-1, 1]], mode), mode)])
+
+    assert result.top_level_timer.get_children_recursive('minimize')
+    assert result.timer_counters['lp solves'] > 0 and result.timer_histograms['lp cols'].min_value > 0
+
+def test_timer_json_export(tmp_path):
+    'tests exporting the timers as json, and the trace_event timeline of a computation'
+
+    ha = HybridAutomaton()
+    mode = ha.new_mode('mode')
+    mode.set_dynamics([[0, 1], [-1, 0]])
+    mode.set_invariant([[1, 0]], [0.5])
+
+    settings = HylaaSettings(0.1, 1.0)
+    settings.stdout = HylaaSettings.STDOUT_NONE
+    settings.trace_filename = str(tmp_path / 'trace.json')
+
+    core = Core(ha, settings)
+    result = core.run([StateSet(lputil.from_box([[-1, 0], [-1, 0]], mode), mode)])
+    result.save_stats_json(str(tmp_path / 'stats.json'))
+
+    with open(tmp_path / 'stats.json') as f:
+        stats = json.load(f)
+
+    timers = stats['timers']
+    assert timers['name'] == 'total' and timers['num_calls'] == 1
+    assert timers['self_secs'] == timers['total_secs'] - sum(c['total_secs'] for c in timers['children'])
+    assert stats['counters']['lp solves'] == result.timer_counters['lp solves'] > 0
+    assert stats['histograms']['lp rows']['num_values'] == stats['counters']['lp solves']
+
+    with open(tmp_path / 'trace.json') as f:
+        events = json.load(f)['traceEvents']
+
+    names = [e['name'] for e in events]
+    assert names.count('do_step_pop') == 1 and names.count('do_step_continuous_post') == core.continuous_steps
+
+    for e in events:
+        assert e['ph'] == 'X' and e['ts'] >= 0 and e['dur'] >= 0
+
+    # lps solved during a span are included as its arguments
+    lp_events = [e for e in events if 'lp solves' in e['args']]
+    assert lp_events and all(e['args']['mean lp cols'] > 0 for e in lp_events)
+
+def test_benchmark_compare():
+    'tests the regression checks of the benchmark harness (benchmarks/regression.py) against a baseline'
+
+    # the benchmark scripts import their shared module from the benchmarks directory
+    benchmarks_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'benchmarks')
+    spec = importlib.util.spec_from_file_location('regression', os.path.join(benchmarks_dir, 'regression.py'))
+    regression = importlib.util.module_from_spec(spec)
+    sys.path.insert(0, benchmarks_dir)
+
+    try:
+        spec.loader.exec_module(regression)
+    finally:
+        sys.path.remove(benchmarks_dir)
+
+    args = argparse.Namespace(time_tolerance=0.25, min_secs=0.1, rss_tolerance=0.25, lp_tolerance=0.1)
+    base = {'verdicts': [[False, False]], 'wall_secs': 10.0, 'peak_rss_mb': 100.0, 'lp_solves': 1000}
+
+    assert not regression.compare(dict(base), base, args)
+
+    # within the tolerances, or slower by less than min_secs
+    cur = dict(base, wall_secs=12.0, peak_rss_mb=120.0, lp_solves=1100)
+    assert not regression.compare(cur, base, args)
+    assert not regression.compare(dict(base, wall_secs=0.15), dict(base, wall_secs=0.1), args)
+
+    cur = dict(base, verdicts=[[True, True]], wall_secs=20.0, peak_rss_mb=200.0, lp_solves=2000)
+    msgs = regression.compare(cur, base, args)
+    assert len(msgs) == 4 and all(is_regression for is_regression, _ in msgs)
+    assert 'verification result changed' in msgs[0][1] and '100% slower' in msgs[1][1]
+
+    # speedups are notes, not regressions
+    assert regression.compare(dict(base, wall_secs=5.0), base, args) == [(False, '50% faster (10.00 -> 5.00 sec)')]
+
+    # failed runs are regressions, but a failed baseline run has nothing to compare with
+    assert regression.compare({'error': 'timeout after 60 sec'}, base, args) == \
+        [(True, 'failed: timeout after 60 sec')]
+    assert not regression.compare(base, {'error': 'timeout after 60 sec'}, args)
+
+    # a baseline from a version of hylaa without timer counters has no lp count to compare with
+    counterless_base = dict(base, lp_solves=0)
+    assert not regression.compare(base, counterless_base, args)
+    assert not regression.compare(base, {k: v for k, v in base.items() if k != 'lp_solves'}, args)
+    assert regression.compare(dict(base, verdicts=[[True, False]]), counterless_base, args)[0][0]
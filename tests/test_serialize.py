@@ -0,0 +1,85 @@
+'''
+Tests for pickling hylaa computation state (hylaa.serialize)
+'''
+
+import pickle
+
+import numpy as np
+
+from hylaa.hybrid_automaton import HybridAutomaton
+from hylaa.stateset import StateSet
+from hylaa.settings import HylaaSettings
+from hylaa.core import Core
+from hylaa.lpinstance_highs import HighsLpInstance
+from hylaa.deaggregation import OpTransition
+from hylaa import lputil, serialize
+
+def test_pickle_lpi():
+    'test pickling lp instances, which should keep the constraints, reach vars and basis (for warm starting)'
+
+    mode = HybridAutomaton().new_mode('mode_name')
+    mode.set_dynamics(np.identity(3))
+    mode.set_inputs([[1], [0], [0]], [[1], [-1]], [0.5, 0.5])
+
+    glpk_lpi = lputil.from_box([[-1, 1], [0, 2], [3, 4]], mode)
+    lputil.set_basis_matrix(glpk_lpi, np.array([[0, 1, 0], [-1, 0, 0], [0, 0, 2.0]]))
+    lputil.add_input_effects_matrix(glpk_lpi, np.array([[1], [0.5], [0]]), mode)
+
+    for lpi in [glpk_lpi, glpk_lpi.convert(HighsLpInstance)]:
+        direction = np.array([1, -1, 0.5])
+        expected = lpi.minimize(direction)
+
+        lpi2 = pickle.loads(pickle.dumps(lpi))
+
+        assert type(lpi2) is type(lpi)
+        assert lpi2.names == lpi.names and lpi2.get_types() == lpi.get_types()
+        assert np.allclose(lpi2.get_rhs(), lpi.get_rhs())
+        assert np.allclose(lpi2.get_full_constraints().toarray(), lpi.get_full_constraints().toarray())
+        assert lpi2.basis_mat_pos == lpi.basis_mat_pos and lpi2.input_effects_offsets == lpi.input_effects_offsets
+        assert np.allclose(lpi2.init_zonotope.center, lpi.init_zonotope.center)
+
+        # warm started from the pickled basis, the same lp is solved without any iterations
+        assert np.allclose(lpi2.minimize(direction), expected)
+        assert lpi2.get_iterations() == 0
+
+        lputil.set_basis_matrix(lpi2, np.identity(3))
+        assert np.allclose(lputil.get_basis_matrix(lpi2), np.identity(3))
+
+def test_pickle_aggdag():
+    'test pickling the states and aggdag nodes after a computation, where modes are saved by id'
+
+    # x' = 1 (using affine variable y), with a guard at x >= 2 to mode b
+    ha = HybridAutomaton()
+
+    mode_a = ha.new_mode('a')
+    mode_a.set_dynamics([[0, 1], [0, 0]])
+    mode_a.set_invariant([[1, 0]], [3])
+
+    mode_b = ha.new_mode('b')
+    mode_b.set_dynamics([[0, -1], [0, 0]])
+
+    ha.new_transition(mode_a, mode_b).set_guard([[-1, 0]], [-2])
+
+    settings = HylaaSettings(0.5, 3.0)
+    settings.stdout = HylaaSettings.STDOUT_NONE
+
+    core = Core(ha, settings)
+    result = core.run([StateSet(lputil.from_box([[0, 1], [1, 1]], mode_a), mode_a)])
+
+    data = serialize.dumps([core.aggdag.roots, result.last_cur_state])
+    roots, state = serialize.loads(data, ha, core.aggdag)
+
+    assert state is not result.last_cur_state and state.mode is mode_b
+    assert state.cur_steps_since_start == result.last_cur_state.cur_steps_since_start
+    assert np.allclose(state.basis_matrix, result.last_cur_state.basis_matrix)
+    assert np.allclose(lputil.get_box_center(state.lpi), lputil.get_box_center(result.last_cur_state.lpi))
+
+    # the op lists of the nodes reference the transitions of the hybrid automaton, and the unpickled states
+    root = roots[0]
+    assert root.aggdag is core.aggdag
+    assert root.stateset.mode is mode_a
+
+    transition_ops = [op for op in root.op_list if isinstance(op, OpTransition)]
+    assert transition_ops and all(op.transition is mode_a.transitions[0] for op in transition_ops)
+    assert all(op.node is root for op in root.op_list if not isinstance(op, OpTransition))
+    assert state in [op.child_node.stateset for op in transition_ops]